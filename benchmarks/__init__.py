@@ -0,0 +1 @@
+"""Нагрузочные тесты и бенчмарки API расписания."""
@@ -0,0 +1,271 @@
+"""
+Бенчмарк эндпоинтов API с бюджетами запросов к БД и задержки.
+
+Каждый эндпоинт вызывается в процессе через тестовый клиент DRF (без сети)
+заданное число раз; фиксируются перцентили задержки, число SQL-запросов на
+запрос (по всем базам из DATABASES: чтения уходят на реплики, см.
+core.routers) и размер ответа. Всё выполняется в транзакции, которая в конце
+откатывается, поэтому бенчмарк не меняет данные и его можно запускать на копии
+боевой базы или на наборе manage.py generate_dataset.
+
+Проверки (код выхода 1 при нарушении):
+- budgets.json — жёсткие лимиты на эндпоинт: max_queries и p95_ms;
+- базовая линия (--baseline) — число запросов не должно расти, а p95 не
+  должен превышать базовый больше чем на --tolerance.
+
+Пример:
+    python manage.py generate_dataset --seed 42
+    python -m benchmarks.endpoints --save-baseline benchmarks/baseline.json
+    python -m benchmarks.endpoints --baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from datetime import datetime, time as dtime, timedelta
+from pathlib import Path
+
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .http_load import Stats
+
+BUDGETS_PATH = Path(__file__).with_name("budgets.json")
+DEFAULT_REPEAT = 20
+DEFAULT_TOLERANCE = 0.5
+
+
+@dataclass
+class Case:
+    name: str
+    method: str
+    path: str
+    user: str = "admin"
+    data: dict | None = None
+    expect: int = 200
+    # Ограничение повторов для тяжёлых эндпоинтов (например, полного списка)
+    repeat: int | None = None
+    # Подготовка перед каждым вызовом (в той же откатываемой транзакции),
+    # возвращает значения для подстановки в path
+    before: object = None
+
+
+@dataclass
+class Result:
+    name: str
+    status: int
+    requests: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    queries: int
+    bytes: int
+    errors: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if k != "errors"}
+
+
+class BenchmarkData:
+    """Объекты набора данных, на которых запускаются сценарии."""
+
+    def __init__(self):
+        from django.contrib.auth.models import Group, User
+
+        from core.models import Discipline, GroupModel, Lesson, Room, Teacher
+
+        self.teacher = (
+            Teacher.objects.filter(department__groups__isnull=False).select_related("user").order_by("id").first()
+        )
+        if self.teacher is None:
+            raise RuntimeError("Нет данных: создайте набор командой manage.py generate_dataset")
+        self.group = GroupModel.objects.filter(department_id=self.teacher.department_id).order_by("id").first()
+        lesson = Lesson.objects.filter(group=self.group).order_by("start_time").first()
+        self.room = lesson.room if lesson else Room.objects.order_by("id").first()
+        self.discipline = lesson.discipline if lesson else Discipline.objects.order_by("id").first()
+        self.busy_start = lesson.start_time if lesson else None
+        self.busy_end = lesson.end_time if lesson else None
+
+        self.admin, _ = User.objects.get_or_create(username="benchmark_admin")
+        self.admin.groups.add(Group.objects.get_or_create(name="ADMIN_DB")[0])
+
+        # Занятие в будущем (после всех существующих) — для сценариев с конфликтами
+        last = Lesson.objects.order_by("-end_time").values_list("end_time", flat=True).first()
+        base = timezone.localdate(max(timezone.now(), last or timezone.now())) + timedelta(days=7)
+        monday = base - timedelta(days=base.weekday())
+        self.slot_start = timezone.make_aware(datetime.combine(monday, dtime(8, 30)))
+        self.future_lesson = Lesson.objects.create(
+            group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+            start_time=self.slot_start, end_time=self.slot_start + timedelta(minutes=90),
+        )
+        if self.busy_start is None:
+            self.busy_start, self.busy_end = self.future_lesson.start_time, self.future_lesson.end_time
+
+    def lesson_payload(self, start: datetime) -> dict:
+        return {
+            "group_id": self.group.id,
+            "discipline_id": self.discipline.id,
+            "room_id": self.room.id,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=90)).isoformat(),
+        }
+
+
+def build_cases(data: BenchmarkData) -> list[Case]:
+    from urllib.parse import urlencode
+
+    free = urlencode({"start": data.busy_start.isoformat(), "end": data.busy_end.isoformat()})
+    later = data.slot_start + timedelta(hours=2)
+
+    def movable_lesson():
+        from core.models import Lesson
+
+        # Занятие, которое сценарий обновления пытается перенести на занятое время
+        lesson = Lesson.objects.create(
+            group=data.group, teacher=data.teacher, discipline=data.discipline, room=data.room,
+            start_time=later, end_time=later + timedelta(minutes=90),
+        )
+        return {"movable": lesson.pk}
+
+    return [
+        Case("lessons_list", "get", "/api/lessons/", repeat=2),
+        Case("lessons_by_group", "get", f"/api/lessons/by_group/?group_id={data.group.id}"),
+        Case("lessons_by_teacher", "get", f"/api/lessons/by_teacher/?teacher_id={data.teacher.id}"),
+        Case("lessons_by_room", "get", f"/api/lessons/by_room/?room_id={data.room.id}"),
+        Case("rooms_free", "get", f"/api/rooms/free/?{free}"),
+        Case("auth_me", "get", "/api/auth/me/", user="teacher"),
+        Case("lessons_create", "post", "/api/lessons/", user="teacher", expect=201,
+             data=data.lesson_payload(data.slot_start + timedelta(days=1))),
+        Case("lessons_create_conflict", "post", "/api/lessons/", user="teacher", expect=400,
+             data=data.lesson_payload(data.slot_start + timedelta(minutes=15))),
+        Case("lessons_update_conflict", "patch", "/api/lessons/{movable}/", user="teacher", expect=400,
+             data={"start_time": data.slot_start.isoformat(),
+                   "end_time": (data.slot_start + timedelta(minutes=90)).isoformat()},
+             before=movable_lesson),
+    ]
+
+
+def _client(user):
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    client = APIClient(HTTP_HOST="localhost")
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    return client
+
+
+def run_case(case: Case, client, repeat: int) -> Result:
+    stats, queries, size, status = Stats(), 0, 0, 0
+    errors = []
+    for _ in range(min(repeat, case.repeat or repeat)):
+        with transaction.atomic():
+            path = case.path.format(**(case.before() if case.before else {}))
+            with ExitStack() as stack:
+                captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+                started = time.perf_counter()
+                response = getattr(client, case.method)(path, case.data, format="json")
+                stats.latencies.append(time.perf_counter() - started)
+            transaction.set_rollback(True)
+        status = response.status_code
+        queries = max(queries, sum(len(c.captured_queries) for c in captured))
+        size = len(response.content)
+        if status != case.expect and not errors:
+            errors.append(f"{case.name}: ожидался статус {case.expect}, получен {status}: {response.content[:200]!r}")
+    return Result(
+        name=case.name,
+        status=status,
+        requests=len(stats.latencies),
+        p50_ms=round(stats.percentile(50) * 1000, 2),
+        p95_ms=round(stats.percentile(95) * 1000, 2),
+        p99_ms=round(stats.percentile(99) * 1000, 2),
+        mean_ms=round(statistics.fmean(stats.latencies) * 1000, 2),
+        queries=queries,
+        bytes=size,
+        errors=errors,
+    )
+
+
+def run_suite(repeat: int = DEFAULT_REPEAT, only: list[str] | None = None) -> list[Result]:
+    """Запускает сценарии в транзакции, которая откатывается в конце."""
+    results = []
+    with transaction.atomic():
+        data = BenchmarkData()
+        clients = {"admin": _client(data.admin), "teacher": _client(data.teacher.user)}
+        for case in build_cases(data):
+            if only and case.name not in only:
+                continue
+            if case.repeat is None:
+                # Прогрев: первый запрос заполняет кэши ContentType, сериализаторов и т. п.
+                run_case(case, clients[case.user], 1)
+            results.append(run_case(case, clients[case.user], repeat))
+        transaction.set_rollback(True)
+    return results
+
+
+def check(results: list[Result], budgets: dict, baseline: dict | None = None,
+          tolerance: float = DEFAULT_TOLERANCE, latency: bool = True) -> list[str]:
+    """Возвращает список нарушений бюджетов и регрессий относительно базовой линии."""
+    violations = []
+    for result in results:
+        violations.extend(result.errors)
+        budget = budgets.get(result.name, {})
+        if "max_queries" in budget and result.queries > budget["max_queries"]:
+            violations.append(f"{result.name}: {result.queries} запросов при бюджете {budget['max_queries']}")
+        if latency and "p95_ms" in budget and result.p95_ms > budget["p95_ms"]:
+            violations.append(f"{result.name}: p95 {result.p95_ms} мс при бюджете {budget['p95_ms']} мс")
+        base = (baseline or {}).get(result.name)
+        if not base:
+            continue
+        if result.queries > base["queries"]:
+            violations.append(f"{result.name}: запросов стало {result.queries}, было {base['queries']}")
+        if latency and result.p95_ms > base["p95_ms"] * (1 + tolerance):
+            violations.append(f"{result.name}: p95 {result.p95_ms} мс, базовый {base['p95_ms']} мс (+{tolerance:.0%} допустимо)")
+    return violations
+
+
+def load_budgets(path: Path = BUDGETS_PATH) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--settings", default=os.environ.get("DJANGO_SETTINGS_MODULE", "schedule.settings"))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="вызовов на эндпоинт")
+    parser.add_argument("--only", action="append", help="имя сценария, можно указать несколько раз")
+    parser.add_argument("--budgets", type=Path, default=BUDGETS_PATH)
+    parser.add_argument("--baseline", type=Path, help="сравнить с сохранённой базовой линией")
+    parser.add_argument("--save-baseline", type=Path, help="сохранить результаты как базовую линию")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="допустимый рост p95 (доля)")
+    args = parser.parse_args(argv)
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = args.settings
+    import django
+
+    django.setup()
+    results = run_suite(args.repeat, args.only)
+
+    print(f"{'endpoint':<26} {'status':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'KB':>9}")
+    for r in results:
+        print(f"{r.name:<26} {r.status:>6} {r.p50_ms:>8.1f} {r.p95_ms:>8.1f} {r.p99_ms:>8.1f} {r.queries:>7} {r.bytes / 1024:>9.1f}")
+
+    snapshot = {r.name: r.as_dict() for r in results}
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(snapshot, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Базовая линия сохранена: {args.save_baseline}")
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline else None
+    violations = check(results, load_budgets(args.budgets), baseline, args.tolerance)
+    for violation in violations:
+        print(f"FAIL {violation}", file=sys.stderr)
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Нагрузочный тест: синхронный WSGI против асинхронного ASGI.
+
+Открывает N одновременных keep-alive соединений (по умолчанию 1000), каждое
+в цикле отправляет GET-запросы в течение заданного времени, и печатает
+пропускную способность и перцентили задержки. Клиент написан на asyncio
+без внешних зависимостей.
+
+Пример (на одной машине, одинаковое число процессов):
+    gunicorn schedule.wsgi -w 4 --threads 8 -b 127.0.0.1:8000
+    uvicorn schedule.asgi:application --workers 4 --port 8001
+    python -m benchmarks.http_load --token <access> \\
+        --target sync=http://127.0.0.1:8000/api/lessons/by_group/?group_id=1 \\
+        --target async=http://127.0.0.1:8001/api/async/lessons/by_group/?group_id=1 \\
+        --concurrency 1000 --duration 30
+
+Для 1000 соединений может понадобиться поднять лимит дескрипторов: ulimit -n 4096.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.errors = 0
+        self.bytes = 0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple[int, int]:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("соединение закрыто сервером")
+    status = int(status_line.split()[1])
+    length, chunked = None, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value.lower():
+            chunked = True
+    if chunked:
+        size = 0
+        while True:
+            chunk_len = int((await reader.readline()).split(b";")[0], 16)
+            if chunk_len == 0:
+                await reader.readline()
+                return status, size
+            await reader.readexactly(chunk_len + 2)
+            size += chunk_len
+    body = await reader.readexactly(length) if length else b""
+    return status, len(body)
+
+
+async def _client(url, token: str, deadline: float, stats: Stats) -> None:
+    host, port = url.hostname, url.port or 80
+    path = url.path + (f"?{url.query}" if url.query else "")
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+        + (f"Authorization: Bearer {token}\r\n" if token else "")
+        + "Connection: keep-alive\r\n\r\n"
+    ).encode()
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, size = await _read_response(reader)
+            if status >= 400:
+                stats.errors += 1
+            else:
+                stats.latencies.append(time.perf_counter() - started)
+                stats.bytes += size
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            stats.errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def run_target(url: str, token: str, concurrency: int, duration: float) -> Stats:
+    stats = Stats()
+    parsed = urlsplit(url)
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(_client(parsed, token, deadline, stats) for _ in range(concurrency)))
+    return stats
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True, help="имя=URL, можно указать несколько раз")
+    parser.add_argument("--token", default="", help="access-токен JWT")
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30.0, help="секунд на каждую цель")
+    args = parser.parse_args(argv)
+
+    print(f"{'target':<10} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'KB/req':>7}")
+    for target in args.target:
+        name, _, url = target.partition("=")
+        stats = asyncio.run(run_target(url, args.token, args.concurrency, args.duration))
+        done = len(stats.latencies)
+        print(
+            f"{name:<10} {done / args.duration:>9.1f} "
+            f"{stats.percentile(50) * 1000:>8.1f} {stats.percentile(95) * 1000:>8.1f} "
+            f"{stats.percentile(99) * 1000:>8.1f} {stats.errors:>7} "
+            f"{(stats.bytes / done / 1024) if done else 0:>7.1f}"
+        )
+        if done:
+            print(f"{'':<10} mean {statistics.fmean(stats.latencies) * 1000:.1f} ms over {done} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Время сериализации занятий: LessonSerializer против быстрого пути core.lesson_rows.
+
+Берёт первые --limit занятий текущей базы (например, набора generate_dataset)
+и отдельно меряет чтение из БД и построение ответа, затем рендеринг в JSON.
+
+Пример:
+    python -m benchmarks.serialization --limit 10000
+"""
+import argparse
+import os
+import time
+
+
+def _best(func, repeat: int) -> tuple[float, object]:
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--settings", default=os.environ.get("DJANGO_SETTINGS_MODULE", "schedule.settings"))
+    parser.add_argument("--limit", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = args.settings
+    import django
+
+    django.setup()
+    from rest_framework.renderers import JSONRenderer
+
+    from core.lesson_rows import build_lessons, lesson_values
+    from core.models import Lesson
+    from core.queries import LESSON_RELATED
+    from core.serializers import LessonSerializer
+
+    qs = Lesson.objects.order_by("id")[:args.limit]
+    fetch_objects, lessons = _best(lambda: list(qs.select_related(*LESSON_RELATED)), args.repeat)
+    serialize, data = _best(lambda: LessonSerializer(lessons, many=True).data, args.repeat)
+    fetch_rows, rows = _best(lambda: list(lesson_values(qs)), args.repeat)
+    build, fast_data = _best(lambda: build_lessons(rows), args.repeat)
+    render, body = _best(lambda: JSONRenderer().render(fast_data), args.repeat)
+    if JSONRenderer().render(data) != body:
+        raise SystemExit("Ответы LessonSerializer и быстрого пути различаются")
+
+    print(f"{len(lessons)} занятий, лучшее из {args.repeat} повторов, мс:")
+    print(f"{'':<22} {'чтение':>9} {'сериализация':>13} {'итого':>9}")
+    print(f"{'LessonSerializer':<22} {fetch_objects * 1000:>9.1f} {serialize * 1000:>13.1f} {(fetch_objects + serialize) * 1000:>9.1f}")
+    print(f"{'lesson_rows':<22} {fetch_rows * 1000:>9.1f} {build * 1000:>13.1f} {(fetch_rows + build) * 1000:>9.1f}")
+    print(f"Ускорение сериализации: x{serialize / build:.1f}; рендеринг JSON: {render * 1000:.1f} мс, {len(body) / 1024:.0f} КБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,26 @@
 from django.contrib import admin
-from . import models
+from . import models, search
+from .admin_tools import LargeTableAdminMixin
+
+# Сколько совпадений поиска брать из индекса; если их больше — обычный поиск по таблице
+ADMIN_SEARCH_LIMIT = 1000
+
+
+class IndexedSearchMixin:
+    """
+    Поиск в списке через индекс core.search вместо icontains по таблице (та же семантика подстроки).
+    Список с ADMIN_SEARCH_LIMIT совпадениями и больше ищется по search_fields: иначе часть
+    совпадений пропала бы из списка без предупреждения.
+    """
+    search_type: str
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        found = search.index.search(search_term, types=[self.search_type], limit=ADMIN_SEARCH_LIMIT)
+        if len(found) >= ADMIN_SEARCH_LIMIT:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=[entry.id for entry in found]), False
 
 
 @admin.register(models.Department)
@@ -8,14 +29,16 @@ class DepartmentAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.GroupModel)
-class GroupAdmin(admin.ModelAdmin):
-    list_display = ["name", "department", "year"]
+class GroupAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_type = "group"
+    list_display = ["name", "department", "year", "student_count"]
     list_filter = ["department", "year"]
     search_fields = ["name"]
 
 
 @admin.register(models.Teacher)
-class TeacherAdmin(admin.ModelAdmin):
+class TeacherAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_type = "teacher"
     list_display = ["user", "department", "title"]
     list_filter = ["department"]
     search_fields = ["user__username", "user__first_name", "user__last_name"]
@@ -29,26 +52,105 @@ class StudentAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.Discipline)
-class DisciplineAdmin(admin.ModelAdmin):
+class DisciplineAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_type = "discipline"
     search_fields = ["name"]
 
 
 @admin.register(models.Room)
-class RoomAdmin(admin.ModelAdmin):
+class RoomAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_type = "room"
     list_display = ["name", "capacity", "room_type"]
     list_filter = ["room_type"]
     search_fields = ["name"]
 
 
+@admin.register(models.TimeSlot)
+class TimeSlotAdmin(admin.ModelAdmin):
+    list_display = ["number", "start", "end"]
+
+    def _reassign(self, request):
+        # Задачу ставит сигнал изменения TimeSlot (core.timeslots) в той же транзакции
+        self.message_user(request, "Номера пар у занятий будут пересчитаны фоновой задачей assign_slots.")
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._reassign(request)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._reassign(request)
+
+
+# Поля, которые выводят столбцы списка занятий (__str__ связанных моделей)
+LESSON_LIST_ONLY = [
+    "start_time", "end_time", "group__name", "discipline__name", "room__name",
+    "teacher__user__username", "teacher__user__first_name", "teacher__user__last_name",
+]
+
+
 @admin.register(models.Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ["discipline", "group", "teacher", "room", "start_time", "end_time"]
     list_filter = ["group", "teacher", "room"]
+    list_select_related = ["discipline", "group", "teacher__user", "room"]
+    list_only = LESSON_LIST_ONLY
+    keyset_field = "start_time"
+    date_hierarchy = "start_time"
+    autocomplete_fields = ["group", "teacher", "discipline", "room"]
     search_fields = ["discipline__name", "group__name", "teacher__user__last_name"]
 
 
+@admin.register(models.ArchivedLesson)
+class ArchivedLessonAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ["discipline", "group", "teacher", "room", "start_time", "end_time", "archived_at"]
+    list_filter = ["group", "teacher", "room"]
+    list_select_related = ["discipline", "group", "teacher__user", "room"]
+    list_only = [*LESSON_LIST_ONLY, "archived_at"]
+    keyset_field = "start_time"
+    date_hierarchy = "start_time"
+    search_fields = ["discipline__name", "group__name", "teacher__user__last_name"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(models.ChangeRequest)
 class ChangeRequestAdmin(admin.ModelAdmin):
-    list_display = ["id", "created_by", "state", "created_at"]
+    list_display = ["id", "created_by", "state", "created_at", "processed_at"]
     list_filter = ["state", "created_at"]
+    readonly_fields = ["processed_at", "result"]
+
+
+
+@admin.register(models.ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    list_display = ["id", "model", "object_id", "action", "group_id", "created_at"]
+    list_filter = ["model", "action"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(models.ScheduleSnapshot)
+class ScheduleSnapshotAdmin(admin.ModelAdmin):
+    list_display = ["id", "name", "department", "date_from", "date_to", "lesson_count", "created_by", "created_at"]
+    list_filter = ["department"]
+    readonly_fields = ["department", "date_from", "date_to", "lesson_count", "digest", "created_by"]
+
+    def has_add_permission(self, request):
+        # Снимок собирается из текущего расписания: POST /api/snapshots/
+        return False
+
 
+@admin.register(models.Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["id", "kind", "state", "progress", "attempts", "created_by", "created_at", "finished_at"]
+    list_filter = ["state", "kind"]
+    readonly_fields = ["progress", "message", "result", "error", "attempts", "worker", "started_at", "heartbeat_at", "finished_at"]
@@ -0,0 +1,251 @@
+"""
+Режим админки для больших таблиц (миллион занятий и больше).
+
+Стандартный список модели на такой таблице неработоспособен: фильтры по
+связям выводят в боковую панель весь справочник, каждая страница
+начинается с точного COUNT(*), а переход на дальние страницы — это
+OFFSET, который просматривает все пропущенные строки. Здесь:
+
+- AutocompleteFilter — фильтр по внешнему ключу с полем автодополнения
+  (тот же select2 и autocomplete-view, что у autocomplete_fields);
+- EstimatedCountPaginator — оценка числа строк по статистике планировщика:
+  без фильтров — pg_class.reltuples / information_schema.tables.table_rows,
+  с фильтрами — ожидаемое число строк из EXPLAIN (core.index_advisor).
+  Небольшие результаты и SQLite, где оценок нет, считаются точно;
+- KeysetChangeList — постраничный просмотр по ключу: следующая страница
+  продолжает с (keyset_field, pk) последней строки, а не с OFFSET.
+  При сортировке по другому столбцу список листается по номерам страниц;
+- date_hierarchy строит годы, месяцы и дни по календарю между Min и Max,
+  а не SELECT DISTINCT по всем строкам.
+
+Режим включается настройкой ADMIN_PERFORMANCE_MODE (по умолчанию включён).
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.functional import cached_property
+
+from . import index_advisor
+
+CURSOR_VAR = "after"
+# Результаты меньше этого размера считаются точно: COUNT(*) по ним дешёвый
+EXACT_COUNT_BELOW = 10000
+
+
+def performance_mode() -> bool:
+    return getattr(settings, "ADMIN_PERFORMANCE_MODE", True)
+
+
+# ---------- Оценка числа строк ----------
+
+def table_estimate(queryset) -> int | None:
+    """Число строк таблицы по статистике БД или None, если статистики нет."""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [connection.ops.quote_name(table)])
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples = -1 у таблицы, для которой ещё не было ANALYZE
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def plan_estimate(queryset) -> int | None:
+    """Ожидаемое планировщиком число строк таблицы модели в запросе."""
+    try:
+        _raw, plan = index_advisor.explain(queryset)
+    except index_advisor.UnsupportedBackend:
+        return None
+    rows = [node.rows for node in plan if node.table == queryset.model._meta.db_table and node.rows is not None]
+    return int(max(rows)) if rows else None
+
+
+def estimated_count(queryset, exact_below: int = EXACT_COUNT_BELOW) -> tuple[int, bool]:
+    """(число строк, является ли оно оценкой)."""
+    estimate = plan_estimate(queryset) if queryset.query.where else table_estimate(queryset)
+    if estimate is None or estimate < exact_below:
+        return queryset.count(), False
+    return estimate, True
+
+
+class EstimatedCountPaginator(Paginator):
+    estimated = False
+
+    @cached_property
+    def count(self):
+        count, self.estimated = estimated_count(self.object_list)
+        return count
+
+
+# ---------- Фильтры ----------
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """Фильтр по внешнему ключу: в панели только выбранный объект, остальные подгружаются по мере ввода."""
+    template = "admin/core/autocomplete_filter.html"
+    field_name: str
+
+    def __init__(self, request, params, model, model_admin):
+        self.field = model._meta.get_field(self.field_name)
+        self.title = self.field.verbose_name
+        self.autocomplete_url = reverse(f"{model_admin.admin_site.name}:autocomplete")
+        self.app_label, self.model_name = model._meta.app_label, model._meta.model_name
+        super().__init__(request, params, model, model_admin)
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if value is None:
+            return []
+        try:
+            pk = self.field.target_field.to_python(value)
+        except ValidationError:
+            return []
+        obj = self.field.related_model._default_manager.filter(pk=pk).first()
+        return [(value, str(obj))] if obj is not None else []
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value() is not None:
+            return queryset.filter(**{self.field.attname: self.value()})
+        return queryset
+
+
+def autocomplete_filter(field_name: str) -> type[AutocompleteFilter]:
+    return type(f"{field_name.title()}AutocompleteFilter", (AutocompleteFilter,), {
+        "field_name": field_name,
+        "parameter_name": f"{field_name}__id__exact",
+    })
+
+
+# ---------- Список ----------
+
+class KeysetChangeList(ChangeList):
+    keyset = False
+    cursor = None
+    next_cursor = None
+    count_estimated = False
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Смена фильтра, поиска или сортировки начинает список сначала
+        if not new_params or CURSOR_VAR not in new_params:
+            remove = [*(remove or ()), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def apply_select_related(self, qs):
+        qs = super().apply_select_related(qs)
+        list_only = getattr(self.model_admin, "list_only", None)
+        return qs.only(*list_only) if list_only else qs
+
+    def _parse_cursor(self, raw: str):
+        value, _, pk = raw.rpartition(",")
+        try:
+            return (
+                self.opts.get_field(self.model_admin.keyset_field).to_python(value),
+                self.opts.pk.to_python(pk),
+            )
+        except ValidationError as e:
+            raise IncorrectLookupParameters(e)
+
+    def _format_cursor(self, obj) -> str:
+        value = getattr(obj, self.model_admin.keyset_field)
+        return f"{value.isoformat() if hasattr(value, 'isoformat') else value},{obj.pk}"
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params or self.show_all:
+            super().get_results(request)
+            self.count_estimated = self.paginator.estimated
+            return
+
+        field = self.model_admin.keyset_field
+        queryset = self.queryset
+        if CURSOR_VAR in self.params:
+            self.cursor = self.params[CURSOR_VAR]
+            value, pk = self._parse_cursor(self.cursor)
+            queryset = queryset.filter(Q(**{f"{field}__lt": value}) | Q(**{field: value, "pk__lt": pk}))
+        rows = list(queryset[:self.list_per_page + 1])
+        if len(rows) > self.list_per_page:
+            rows = rows[:self.list_per_page]
+            self.next_cursor = self._format_cursor(rows[-1])
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.count_estimated = self.paginator.estimated
+        self.keyset = True
+        self.result_list = rows
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = bool(self.cursor or self.next_cursor)
+
+    @property
+    def next_page_url(self) -> str:
+        return self.get_query_string({CURSOR_VAR: self.next_cursor})
+
+    @property
+    def first_page_url(self) -> str:
+        return self.get_query_string()
+
+
+class LargeTableAdminMixin:
+    """
+    Админка таблицы, которая не помещается в обычный список: фильтры по внешним
+    ключам с автодополнением, оценка числа строк и постраничный просмотр по
+    ключу. keyset_field — столбец сортировки по убыванию (вместе с pk), обычно
+    индексированное время; list_only — поля, которые нужны столбцам списка.
+    """
+    keyset_field: str
+    list_only: list[str] | None = None
+    show_full_result_count = False
+    # date_hierarchy по календарю между Min и Max (core/templatetags/admin_tools.py)
+    change_list_template = "admin/core/large_table_change_list.html"
+
+    def get_ordering(self, request):
+        return (f"-{self.keyset_field}", "-pk")
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if not performance_mode():
+            return list_filter
+        return [
+            autocomplete_filter(f) if isinstance(f, str) and self.opts.get_field(f).many_to_one else f
+            for f in list_filter
+        ]
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList if performance_mode() else super().get_changelist(request, **kwargs)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        if not performance_mode():
+            return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+        return EstimatedCountPaginator(queryset, per_page, orphans, allow_empty_first_page)
+
+    @property
+    def media(self):
+        media = super().media
+        related = [f for f in self.list_filter if isinstance(f, str) and self.opts.get_field(f).many_to_one]
+        if performance_mode() and related:
+            media += AutocompleteSelect(self.opts.get_field(related[0]), self.admin_site).media
+        return media
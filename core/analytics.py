@@ -0,0 +1,284 @@
+"""
+Недельная аналитика по расписанию: загрузка аудиторий, нагрузка преподавателей
+и тепловая карта занятости здания.
+
+Все показатели считаются за один проход по плоским кортежам из values_list(),
+без создания модельных объектов и без вложенных сериализаторов.
+Результаты кэшируются на неделю расписания (см. core.caching).
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .archive import with_archive
+from .caching import cached_weeks, week_monday
+from .models import Discipline, GroupModel, Room, Teacher
+
+# Число учебных часов в неделе, относительно которого считается занятость аудитории:
+# 5 пар по 1,5 часа, 5 рабочих дней
+DEFAULT_WEEK_HOURS = 37.5
+DEFAULT_HEATMAP_BIN_MINUTES = 30
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+
+def week_bounds(day: date) -> tuple[datetime, datetime]:
+    """Границы недели (Пн 00:00 — следующий Пн 00:00) в текущем часовом поясе."""
+    monday = day - timedelta(days=day.weekday())
+    start = timezone.make_aware(datetime.combine(monday, time.min))
+    return start, start + timedelta(days=7)
+
+
+def _week_lessons(week_start: datetime, week_end: datetime):
+    return with_archive(lambda model: model.objects.filter(start_time__lt=week_end, end_time__gt=week_start).values_list(
+        "room_id", "group_id", "teacher_id", "discipline_id", "start_time", "end_time"
+    ), since=week_start)
+
+
+def group_sizes() -> dict[int, int]:
+    return dict(GroupModel.objects.values_list("id", "student_count"))
+
+
+def _hours(start: datetime, end: datetime) -> float:
+    return (end - start).total_seconds() / 3600
+
+
+def compute_room_utilization(day: date) -> dict:
+    week_start, week_end = week_bounds(day)
+    week_hours = getattr(settings, "ANALYTICS_WEEK_HOURS", DEFAULT_WEEK_HOURS)
+    sizes = group_sizes()
+
+    occupied = defaultdict(float)
+    seat_hours = defaultdict(float)
+    lessons = defaultdict(int)
+    by_hour = defaultdict(lambda: defaultdict(float))
+
+    for room_id, group_id, _teacher_id, _discipline_id, start, end in _week_lessons(week_start, week_end):
+        start, end = max(start, week_start), min(end, week_end)
+        duration = _hours(start, end)
+        occupied[room_id] += duration
+        seat_hours[room_id] += duration * sizes.get(group_id, 0)
+        lessons[room_id] += 1
+
+        # Раскладываем занятие по часам суток (локальное время)
+        cursor = timezone.localtime(start)
+        local_end = timezone.localtime(end)
+        while cursor < local_end:
+            next_hour = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            chunk_end = min(next_hour, local_end)
+            by_hour[room_id][cursor.hour] += _hours(cursor, chunk_end)
+            cursor = chunk_end
+
+    rooms = []
+    for room_id, name, capacity, room_type in Room.objects.order_by("name").values_list(
+        "id", "name", "capacity", "room_type"
+    ):
+        hours = occupied.get(room_id, 0.0)
+        hist = by_hour.get(room_id, {})
+        peak = max(hist.values(), default=0)
+        rooms.append({
+            "id": room_id,
+            "name": name,
+            "capacity": capacity,
+            "room_type": room_type,
+            "lessons": lessons.get(room_id, 0),
+            "occupied_hours": round(hours, 2),
+            "occupancy_percent": round(100 * hours / week_hours, 1) if week_hours else None,
+            # Средняя доля занятых мест, взвешенная по длительности занятий
+            "seat_utilization_percent": (
+                round(100 * seat_hours[room_id] / (hours * capacity), 1) if hours and capacity else None
+            ),
+            "peak_hours": sorted(h for h, v in hist.items() if peak and v == peak),
+        })
+
+    return {
+        "week_start": week_start.isoformat(),
+        "week_end": week_end.isoformat(),
+        "week_hours": week_hours,
+        "rooms": rooms,
+    }
+
+
+def compute_teacher_workload(day: date) -> dict:
+    week_start, week_end = week_bounds(day)
+
+    total = defaultdict(float)
+    lessons = defaultdict(int)
+    per_discipline = defaultdict(lambda: defaultdict(float))
+
+    for _room_id, _group_id, teacher_id, discipline_id, start, end in _week_lessons(week_start, week_end):
+        duration = _hours(max(start, week_start), min(end, week_end))
+        total[teacher_id] += duration
+        lessons[teacher_id] += 1
+        per_discipline[teacher_id][discipline_id] += duration
+
+    discipline_names = dict(
+        Discipline.objects.filter(
+            id__in={d for disc in per_discipline.values() for d in disc}
+        ).values_list("id", "name")
+    )
+
+    teachers = []
+    for teacher_id, username, first_name, last_name in Teacher.objects.order_by(
+        "user__last_name", "user__first_name"
+    ).values_list("id", "user__username", "user__first_name", "user__last_name"):
+        teachers.append({
+            "id": teacher_id,
+            "name": f"{first_name} {last_name}".strip() or username,
+            "lessons": lessons.get(teacher_id, 0),
+            "hours": round(total.get(teacher_id, 0.0), 2),
+            "disciplines": [
+                {"id": d_id, "name": discipline_names.get(d_id), "hours": round(h, 2)}
+                for d_id, h in sorted(per_discipline.get(teacher_id, {}).items(), key=lambda kv: -kv[1])
+            ],
+        })
+
+    return {
+        "week_start": week_start.isoformat(),
+        "week_end": week_end.isoformat(),
+        "teachers": teachers,
+    }
+
+
+def room_utilization(day: date) -> dict:
+    monday = week_monday(day)
+    return cached_weeks("utilization", [monday], compute_room_utilization)[monday]
+
+
+def teacher_workload(day: date) -> dict:
+    monday = week_monday(day)
+    return cached_weeks("workload", [monday], compute_teacher_workload)[monday]
+
+
+def heatmap_bin_minutes() -> int:
+    return getattr(settings, "ANALYTICS_HEATMAP_BIN_MINUTES", DEFAULT_HEATMAP_BIN_MINUTES)
+
+
+def compute_week_heatmap(day: date) -> dict:
+    """
+    Тепловая карта одной недели, разложенная по срезам (тип аудитории, кафедра).
+
+    Каждый срез — пара плоских массивов длины 7 * bins_per_day
+    (занятые аудитории, студенты на занятиях). Ячейки заполняются через
+    разностный массив: занятие даёт +1 в начальный интервал и -1 после
+    конечного, затем один проход префиксных сумм по каждому дню.
+    Так любой фильтр запроса сводится к сложению готовых срезов.
+    """
+    week_start, week_end = week_bounds(day)
+    bin_minutes = heatmap_bin_minutes()
+    bins = 24 * 60 // bin_minutes
+    sizes = group_sizes()
+    tz = timezone.get_current_timezone()
+
+    diffs: dict[tuple, tuple[list, list]] = {}
+    rows = with_archive(lambda model: model.objects.filter(start_time__lt=week_end, end_time__gt=week_start).values_list(
+        "room__room_type", "group__department_id", "group_id", "start_time", "end_time"
+    ), since=week_start)
+    for room_type, department_id, group_id, start, end in rows:
+        start = max(start, week_start).astimezone(tz)
+        end = min(end, week_end).astimezone(tz)
+        first = start.hour * 60 + start.minute
+        # Занятие, переходящее через полночь, обрезаем концом дня
+        last = end.hour * 60 + end.minute if end.date() == start.date() else 24 * 60
+        if last <= first:
+            continue
+        offset = start.weekday() * (bins + 1)
+        rooms_diff, students_diff = diffs.get((room_type, department_id)) or diffs.setdefault(
+            (room_type, department_id), ([0] * (7 * (bins + 1)), [0] * (7 * (bins + 1)))
+        )
+        lo = offset + first // bin_minutes
+        hi = offset + -(-last // bin_minutes)
+        size = sizes.get(group_id, 0)
+        rooms_diff[lo] += 1
+        rooms_diff[hi] -= 1
+        students_diff[lo] += size
+        students_diff[hi] -= size
+
+    slices = {}
+    for slice_key, (rooms_diff, students_diff) in diffs.items():
+        rooms_cells, students_cells = [], []
+        for weekday in range(7):
+            offset = weekday * (bins + 1)
+            rooms_acc = students_acc = 0
+            for i in range(offset, offset + bins):
+                rooms_acc += rooms_diff[i]
+                students_acc += students_diff[i]
+                rooms_cells.append(rooms_acc)
+                students_cells.append(students_acc)
+        slices[slice_key] = (rooms_cells, students_cells)
+    return {"bin_minutes": bin_minutes, "slices": slices}
+
+
+def heatmap(date_from: date, date_to: date, room_type: str | None = None, department_id: int | None = None) -> dict:
+    """
+    Средняя занятость по дням недели и интервалам времени за период [date_from, date_to].
+
+    Недельные срезы берутся из кэша (или строятся и кэшируются), поэтому
+    повторный запрос за год данных сводится к сложению ~50 готовых массивов.
+    """
+    bin_minutes = heatmap_bin_minutes()
+    bins = 24 * 60 // bin_minutes
+    mondays = []
+    monday = week_monday(date_from)
+    while monday <= date_to:
+        mondays.append(monday)
+        monday += timedelta(days=7)
+    weeks = cached_weeks("heatmap", mondays, compute_week_heatmap, bin_minutes)
+
+    rooms_total = [0] * (7 * bins)
+    students_total = [0] * (7 * bins)
+    day_counts = [0] * 7
+    for monday, week in weeks.items():
+        # Для неполных недель на краях периода учитываем только попавшие в него дни
+        days = [d for d in range(7) if date_from <= monday + timedelta(days=d) <= date_to]
+        for d in days:
+            day_counts[d] += 1
+        full_week = len(days) == 7
+        for (s_room_type, s_department_id), (rooms_cells, students_cells) in week["slices"].items():
+            if room_type and s_room_type != room_type:
+                continue
+            if department_id and s_department_id != department_id:
+                continue
+            if full_week:
+                rooms_total = [a + b for a, b in zip(rooms_total, rooms_cells)]
+                students_total = [a + b for a, b in zip(students_total, students_cells)]
+                continue
+            for d in days:
+                lo, hi = d * bins, (d + 1) * bins
+                rooms_total[lo:hi] = [a + b for a, b in zip(rooms_total[lo:hi], rooms_cells[lo:hi])]
+                students_total[lo:hi] = [a + b for a, b in zip(students_total[lo:hi], students_cells[lo:hi])]
+
+    def to_matrix(flat: list) -> list[list[float]]:
+        return [
+            [round(v / day_counts[d], 2) if day_counts[d] else 0 for v in flat[d * bins:(d + 1) * bins]]
+            for d in range(7)
+        ]
+
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "bin_minutes": bin_minutes,
+        "bins": [f"{(i * bin_minutes) // 60:02d}:{(i * bin_minutes) % 60:02d}" for i in range(bins)],
+        "weekdays": WEEKDAYS,
+        "days": day_counts,
+        # Средние значения на один календарный день соответствующего дня недели
+        "occupied_rooms": to_matrix(rooms_total),
+        "students": to_matrix(students_total),
+    }
+
+
+def precompute(date_from: date, date_to: date, progress=None) -> int:
+    """Заполняет кэш аналитики за период; progress(percent, message) вызывается после каждой недели."""
+    heatmap(date_from, date_to)
+    mondays = []
+    monday = week_monday(date_from)
+    while monday <= date_to:
+        mondays.append(monday)
+        monday += timedelta(days=7)
+    for i, monday in enumerate(mondays, 1):
+        room_utilization(monday)
+        teacher_workload(monday)
+        if progress:
+            progress(100 * i / len(mondays), f"Неделя {monday.isoformat()}")
+    return len(mondays)
@@ -6,3 +6,5 @@ class CoreConfig(AppConfig):
     name = "core"
     verbose_name = "Расписание"
 
+    def ready(self):
+        from . import capacity, search, signals, timeslots  # noqa: F401
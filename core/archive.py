@@ -0,0 +1,136 @@
+"""
+Архив занятий прошедших семестров.
+
+Таблица core_lesson только растёт, а диапазонные запросы, индексы и
+резервные копии платят за семестры, которые никто не открывает. Команда
+archive_semester пачками переносит завершившиеся занятия в ArchivedLesson,
+так что в рабочей таблице остаются текущий и предыдущий семестры и её
+размер не растёт из года в год.
+
+Это вариант для MySQL (основная БД проекта): нативного секционирования с
+внешними ключами там нет. На PostgreSQL то же можно сделать декларативным
+секционированием по start_time, но тогда меняется первичный ключ core_lesson
+(он должен включать ключ секционирования) — такая миграция не переносима.
+
+Эндпоинты чтения обращаются к архиву, только если запрошенный период
+начинается раньше границы архива — максимального end_time архивных занятий.
+Граница читается из БД (MAX по индексу end_time) и запоминается в процессе
+не дольше BOUNDARY_TTL секунд: команда переноса работает в другом процессе,
+и сброс общего кэша (LocMemCache по умолчанию — у каждого процесса свой) до
+веб-процессов не дошёл бы. Async-представления обновляют границу через
+aarchive_boundary() до синхронной сборки запроса.
+
+Перенос не пишет журнал изменений: для клиентов занятия не удаляются,
+а переезжают в архив и по-прежнему отдаются по запросу за прошлый период.
+"""
+from datetime import date, datetime, time, timedelta
+from time import monotonic
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .caching import bump_schedule_version
+from .models import ArchivedLesson, Lesson
+
+DEFAULT_BATCH_SIZE = 5000
+BOUNDARY_TTL = 30
+# Рабочая таблица хранит текущий и предыдущий семестры
+DEFAULT_KEEP_SEMESTERS = 2
+FIELDS = ("id", "group_id", "teacher_id", "discipline_id", "room_id", "start_time", "end_time", "week", "date", "slot")
+
+
+def semester_start(day: date) -> date:
+    """Осенний семестр — с 1 сентября (включая январскую сессию), весенний — с 1 февраля."""
+    if day.month >= 9:
+        return date(day.year, 9, 1)
+    if day.month >= 2:
+        return date(day.year, 2, 1)
+    return date(day.year - 1, 9, 1)
+
+
+def default_cutoff(today: date | None = None, keep: int = DEFAULT_KEEP_SEMESTERS) -> datetime:
+    """Начало самого старого из keep последних семестров: всё, что закончилось раньше, уходит в архив."""
+    start = semester_start(today or timezone.localdate())
+    for _ in range(keep - 1):
+        start = semester_start(start - timedelta(days=1))
+    return timezone.make_aware(datetime.combine(start, time.min))
+
+
+# (момент чтения по monotonic(), граница)
+_boundary: tuple[float, datetime | None] | None = None
+
+
+def _remember(boundary: datetime | None) -> datetime | None:
+    global _boundary
+    _boundary = (monotonic(), boundary)
+    return boundary
+
+
+def _forget() -> None:
+    global _boundary
+    _boundary = None
+
+
+def _fresh(margin: float = 0) -> bool:
+    return _boundary is not None and monotonic() - _boundary[0] < BOUNDARY_TTL - margin
+
+
+def archive_boundary() -> datetime | None:
+    if _fresh():
+        return _boundary[1]
+    return _remember(ArchivedLesson.objects.aggregate(b=Max("end_time"))["b"])
+
+
+async def aarchive_boundary() -> datetime | None:
+    # С запасом: граница не должна устареть до синхронного archive_boundary() в том же запросе
+    if _fresh(margin=BOUNDARY_TTL / 2):
+        return _boundary[1]
+    return _remember((await ArchivedLesson.objects.aaggregate(b=Max("end_time")))["b"])
+
+
+def needs_archive(since: datetime | None) -> bool:
+    """Нужен ли архив для периода, начинающегося с since (None — без нижней границы)."""
+    boundary = archive_boundary()
+    if boundary is None:
+        return False
+    if since is None:
+        return True
+    # Наивное время ORM трактует в текущем часовом поясе — так же и здесь
+    return (timezone.make_aware(since) if timezone.is_naive(since) else since) < boundary
+
+
+def with_archive(build, since: datetime | None):
+    """
+    build(model) -> values/values_list-queryset; для периода, заходящего
+    в архив, к строкам Lesson добавляются (UNION ALL) те же строки ArchivedLesson.
+    Сортировку нужно задавать после объединения.
+    """
+    qs = build(Lesson)
+    if needs_archive(since):
+        qs = qs.union(build(ArchivedLesson), all=True)
+    return qs
+
+
+def archive_lessons(before: datetime, batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False, progress=None) -> int:
+    """Переносит в архив занятия, закончившиеся до before. Каждая пачка — отдельная транзакция."""
+    qs = Lesson.objects.filter(end_time__lte=before)
+    if dry_run:
+        return qs.count()
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(qs.select_for_update().order_by("id").values(*FIELDS)[:batch_size])
+            if not rows:
+                break
+            ArchivedLesson.objects.bulk_create([ArchivedLesson(**row) for row in rows])
+            # Без сигналов post_delete: перенос в архив — не удаление для журнала изменений
+            Lesson.objects.filter(id__in=[row["id"] for row in rows])._raw_delete(Lesson.objects.db)
+        total += len(rows)
+        if progress:
+            progress(total)
+    if total:
+        # Другие процессы увидят новую границу через BOUNDARY_TTL, этот — сразу
+        _forget()
+        bump_schedule_version()
+    return total
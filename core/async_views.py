@@ -0,0 +1,145 @@
+"""
+Асинхронные версии «горячих» эндпоинтов чтения для запуска под ASGI.
+
+DRF-представления синхронны: под ASGI каждый запрос занимает поток из пула
+sync_to_async, и число одновременных чтений ограничено числом потоков.
+Здесь те же ответы формируются нативными async-представлениями Django
+с асинхронным ORM (aget/afirst/async for), поэтому ожидание БД не держит поток.
+
+Ответы совпадают с синхронными аналогами в core.views; занятия читаются
+через values() и собираются build_lessons (core.lesson_rows) без обращений к БД.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import timeslots
+from .archive import aarchive_boundary
+from .models import Discipline, GroupModel, Lesson, Room, Teacher
+from .queries import (
+    QueryParamError,
+    current_user_payload,
+    free_rooms_query,
+    lesson_values_in_range,
+)
+from .lesson_rows import build_lessons
+from .renderers import dumps
+from .serializers import RoomSerializer
+
+
+async def authenticate(request):
+    """JWT из заголовка Authorization или параметра ?token=, либо сессия. Возвращает пользователя или None."""
+    header = request.headers.get("Authorization", "")
+    raw_token = header[7:] if header.startswith("Bearer ") else request.GET.get("token")
+    if raw_token:
+        try:
+            token = AccessToken(raw_token)
+        except TokenError:
+            return None
+        user_id = token.get(settings.SIMPLE_JWT.get("USER_ID_CLAIM", "user_id"))
+        return await get_user_model().objects.filter(pk=user_id, is_active=True).afirst()
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def _json(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(dumps(data), status=status_code, content_type="application/json")
+
+
+def async_read_view(view):
+    """Только GET, обязательная аутентификация, ошибки параметров -> {"detail": ...}."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return _json({"detail": f'Метод "{request.method}" не разрешен.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+        user = await authenticate(request)
+        if user is None:
+            return _json({"detail": "Учетные данные не были предоставлены."}, status.HTTP_401_UNAUTHORIZED)
+        request.user = user
+        try:
+            return await view(request, *args, **kwargs)
+        except QueryParamError as e:
+            return _json({"detail": e.detail}, e.status_code)
+    return wrapper
+
+
+async def _lessons(params, **filters) -> list[dict]:
+    await aarchive_boundary()
+    return build_lessons([row async for row in lesson_values_in_range(params, **filters)])
+
+
+@async_read_view
+async def lessons_by_group(request):
+    group_id = request.GET.get("group_id")
+    if not group_id:
+        raise QueryParamError("Параметр group_id обязателен")
+    group = await GroupModel.objects.filter(id=group_id).afirst()
+    if group is None:
+        raise QueryParamError(f"Группа с ID {group_id} не найдена", status.HTTP_404_NOT_FOUND)
+    lessons = await _lessons(request.GET, group_id=group_id)
+    return _json({"group": {"id": group.id, "name": group.name}, "count": len(lessons), "lessons": lessons})
+
+
+@async_read_view
+async def lessons_by_teacher(request):
+    teacher_id = request.GET.get("teacher_id")
+    if not teacher_id:
+        raise QueryParamError("Параметр teacher_id обязателен")
+    teacher = await Teacher.objects.select_related("user").filter(id=teacher_id).afirst()
+    if teacher is None:
+        raise QueryParamError(f"Преподаватель с ID {teacher_id} не найден", status.HTTP_404_NOT_FOUND)
+    lessons = await _lessons(request.GET, teacher_id=teacher_id)
+    return _json({
+        "teacher": {"id": teacher.id, "name": teacher.user.get_full_name() or teacher.user.username},
+        "count": len(lessons),
+        "lessons": lessons,
+    })
+
+
+@async_read_view
+async def lessons_by_room(request):
+    room_id = request.GET.get("room_id")
+    if not room_id:
+        raise QueryParamError("Параметр room_id обязателен")
+    room = await Room.objects.filter(id=room_id).afirst()
+    if room is None:
+        raise QueryParamError(f"Аудитория с ID {room_id} не найдена", status.HTTP_404_NOT_FOUND)
+    lessons = await _lessons(request.GET, room_id=room_id)
+    return _json({
+        "room": {"id": room.id, "name": room.name, "capacity": room.capacity, "room_type": room.room_type},
+        "count": len(lessons),
+        "lessons": lessons,
+    })
+
+
+@async_read_view
+async def free_rooms(request):
+    start, end, qs = free_rooms_query(request.GET, await timeslots.agrid())
+    rooms = [room async for room in qs]
+    return _json({
+        "time_range": {"start": start.isoformat(), "end": end.isoformat()},
+        "count": len(rooms),
+        "rooms": RoomSerializer(rooms, many=True).data,
+    })
+
+
+@async_read_view
+async def current_user(request):
+    user = await get_user_model().objects.select_related("teacher__department", "student").aget(pk=request.user.pk)
+    groups = [name async for name in user.groups.values_list("name", flat=True)]
+    teacher = getattr(user, "teacher", None)
+    student = getattr(user, "student", None)
+    disciplines = []
+    if teacher:
+        disciplines = [
+            row async for row in Discipline.objects.filter(
+                Exists(Lesson.objects.filter(teacher=teacher, discipline=OuterRef("pk")))
+            ).values_list("id", "name")
+        ]
+    return _json(current_user_payload(user, groups, teacher, student, disciplines))
@@ -0,0 +1,106 @@
+"""
+Общий кэш производных данных расписания.
+
+Кэшированные представления (аналитика, сетки и т.п.) включают в ключ номер
+версии расписания. Версий две:
+
+- глобальная — меняется при изменении справочников (аудитории, студенты)
+  и при массовых операциях, которые не знают, какие недели затронуты;
+- недельная — меняется при изменении занятий конкретной недели.
+
+После увеличения версии старые записи становятся недостижимыми и
+вытесняются по таймауту.
+"""
+from datetime import date, datetime, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import metrics
+
+SCHEDULE_VERSION_KEY = "schedule:version"
+DEFAULT_TIMEOUT = 60 * 60
+
+
+def _incr(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
+
+
+def get_schedule_version() -> int:
+    version = cache.get(SCHEDULE_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(SCHEDULE_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def bump_schedule_version() -> None:
+    """Инвалидирует все кэшированные представления расписания."""
+    _incr(SCHEDULE_VERSION_KEY)
+
+
+def week_monday(value: date | datetime) -> date:
+    if isinstance(value, datetime):
+        value = timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value - timedelta(days=value.weekday())
+
+
+def _week_version_key(monday: date) -> str:
+    return f"schedule:week:{monday.isoformat()}:version"
+
+
+def bump_week_versions(values) -> None:
+    """Инвалидирует кэш недель, в которые попадают указанные даты/моменты времени."""
+    for monday in {week_monday(v) for v in values if v is not None}:
+        _incr(_week_version_key(monday))
+
+
+def week_cache_keys(prefix: str, mondays: list[date], *parts) -> dict[date, str]:
+    """Ключи кэша для набора недель (версии читаются одним запросом к кэшу)."""
+    version_keys = {m: _week_version_key(m) for m in mondays}
+    versions = cache.get_many(list(version_keys.values()))
+    suffix = ":".join(str(p) for p in parts)
+    schedule_version = get_schedule_version()
+    return {
+        m: f"schedule:{prefix}:v{schedule_version}.{versions.get(k, 1)}:{m.isoformat()}:{suffix}"
+        for m, k in version_keys.items()
+    }
+
+
+def schedule_cache_key(prefix: str, *parts) -> str:
+    suffix = ":".join(str(p) for p in parts)
+    return f"schedule:{prefix}:v{get_schedule_version()}:{suffix}"
+
+
+def cached(prefix: str, parts: tuple, builder, timeout: int = DEFAULT_TIMEOUT):
+    """Возвращает значение из кэша или строит его через builder()."""
+    key = schedule_cache_key(prefix, *parts)
+    value = cache.get(key)
+    metrics.cache_requests_total.inc(prefix=prefix, result="miss" if value is None else "hit")
+    if value is None:
+        value = builder()
+        cache.set(key, value, timeout=timeout)
+    return value
+
+
+def cached_weeks(prefix: str, mondays: list[date], builder, *parts, timeout: int = DEFAULT_TIMEOUT) -> dict:
+    """
+    Значения для набора недель: что есть в кэше — берём оттуда,
+    остальное строим через builder(monday) и сохраняем одним set_many().
+    """
+    keys = week_cache_keys(prefix, mondays, *parts)
+    found = cache.get_many(list(keys.values()))
+    result, missing = {}, {}
+    for monday, key in keys.items():
+        if key in found:
+            result[monday] = found[key]
+        else:
+            result[monday] = missing[key] = builder(monday)
+    metrics.cache_requests_total.inc(len(keys) - len(missing), prefix=prefix, result="hit")
+    metrics.cache_requests_total.inc(len(missing), prefix=prefix, result="miss")
+    if missing:
+        cache.set_many(missing, timeout=timeout)
+    return result
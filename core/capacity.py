@@ -0,0 +1,88 @@
+"""
+Численность групп и вместимость аудиторий.
+
+GroupModel.student_count — число студентов группы, которое поддерживают
+сигналы Student (создание, перевод в другую группу, удаление) через
+UPDATE … SET student_count = student_count ± 1, без чтения группы.
+Массовые пути, минующие сигналы (bulk_create, QuerySet.update/delete),
+после себя вызывают recount(); он же — manage.py recount_students для
+сверки с таблицей студентов. Загрузка фикстур (loaddata, raw=True) счётчик
+не меняет: он приходит в фикстуре вместе с группой.
+
+Проверка вместимости (занятие группы в аудитории, где мест меньше, чем
+студентов) сравнивает два уже загруженных числа: Room.capacity и
+GroupModel.student_count — без агрегатных запросов на запрос API.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .models import GroupModel, Student
+
+
+def enabled() -> bool:
+    return getattr(settings, "LESSON_CAPACITY_CHECK", True)
+
+
+def capacity_error(room_name: str, capacity: int, group_name: str, size: int) -> str | None:
+    """Сообщение об ошибке, если группа не помещается в аудиторию."""
+    if not enabled() or size <= capacity:
+        return None
+    return f"В аудитории {room_name} {capacity} мест, а в группе {group_name} {size} студентов."
+
+
+def recount(group_ids=None) -> int:
+    """Сверяет student_count с таблицей студентов; возвращает число исправленных групп."""
+    groups = GroupModel._base_manager.all()
+    students = Student.objects.all()
+    if group_ids is not None:
+        groups, students = groups.filter(id__in=group_ids), students.filter(group_id__in=group_ids)
+    actual = dict(students.values("group_id").annotate(n=Count("id")).values_list("group_id", "n"))
+    stale = defaultdict(list)
+    for group_id, stored in groups.values_list("id", "student_count"):
+        size = actual.get(group_id, 0)
+        if size != stored:
+            stale[size].append(group_id)
+    # Одно UPDATE на значение, а не на группу; без журнала изменений — имя и кафедра те же
+    for size, ids in stale.items():
+        GroupModel._base_manager.filter(id__in=ids).update(student_count=size)
+    return sum(len(ids) for ids in stale.values())
+
+
+def _shift(group_id, delta: int) -> None:
+    if group_id is not None:
+        GroupModel._base_manager.filter(pk=group_id).update(student_count=F("student_count") + delta)
+
+
+def _remember_group(sender, instance, raw=False, **kwargs):
+    # Прежняя группа нужна только при изменении существующего студента
+    if raw or instance._state.adding or instance.pk is None:
+        instance._previous_group_id = None
+        return
+    instance._previous_group_id = (
+        Student.objects.filter(pk=instance.pk).values_list("group_id", flat=True).first()
+    )
+
+
+def _student_saved(sender, instance, created, raw=False, **kwargs):
+    # loaddata: student_count группы уже восстановлен из той же фикстуры
+    if raw:
+        return
+    if created:
+        _shift(instance.group_id, 1)
+        return
+    previous = getattr(instance, "_previous_group_id", None)
+    if previous is not None and previous != instance.group_id:
+        _shift(previous, -1)
+        _shift(instance.group_id, 1)
+
+
+def _student_deleted(sender, instance, **kwargs):
+    _shift(instance.group_id, -1)
+
+
+pre_save.connect(_remember_group, sender=Student, dispatch_uid="capacity_student_pre_save")
+post_save.connect(_student_saved, sender=Student, dispatch_uid="capacity_student_save")
+post_delete.connect(_student_deleted, sender=Student, dispatch_uid="capacity_student_delete")
@@ -0,0 +1,287 @@
+"""
+Пакетная обработка заявок на изменение расписания (ChangeRequest).
+
+Обработчик в одной транзакции:
+1) захватывает пачку новых заявок через select_for_update(skip_locked=True) —
+   параллельные обработчики берут разные пачки и не обрабатывают заявку дважды;
+2) блокирует (select_for_update) затронутые аудитории, преподавателей и
+   группы — параллельная пачка с теми же объектами ждёт фиксации этой и
+   видит её занятия — и одним запросом загружает занятия, пересекающиеся с
+   окном пачки по этим объектам;
+3) проверяет заявки по порядку на модели расписания в памяти: принятые
+   заявки сразу учитываются при проверке следующих; вместимость аудиторий —
+   по GroupModel.student_count, загруженному для всей пачки (core.capacity);
+4) применяет принятые изменения массовыми операциями и записывает
+   результат (id занятия или причины отказа) в заявки.
+"""
+from datetime import datetime
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import capacity, timeslots
+from .models import ChangeRequest, Discipline, GroupModel, Lesson, Room, Teacher
+
+CREATE, UPDATE, DELETE = "create", "update", "delete"
+LESSON_FIELDS = ("group_id", "teacher_id", "discipline_id", "room_id", "start_time", "end_time")
+DEFAULT_BATCH_SIZE = 100
+
+
+class RequestError(Exception):
+    def __init__(self, errors: dict[str, list[str]]):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _error(field: str, message: str) -> RequestError:
+    return RequestError({field: [message]})
+
+
+def _parse_time(value, field: str) -> datetime:
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise _error(field, "Неверный формат даты и времени. Используйте ISO format (например: 2024-01-01T09:00:00)")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_payload(payload) -> tuple[str, int | None, dict]:
+    """Разбор payload заявки: (действие, id занятия, новые значения полей)."""
+    if not isinstance(payload, dict):
+        raise _error("payload", "Ожидается объект")
+    action = payload.get("action")
+    if action not in (CREATE, UPDATE, DELETE):
+        raise _error("action", f"Допустимые значения: {CREATE}, {UPDATE}, {DELETE}")
+
+    lesson_id = payload.get("lesson_id")
+    if action in (UPDATE, DELETE) and not isinstance(lesson_id, int):
+        raise _error("lesson_id", "Обязательное поле для изменения и удаления")
+
+    data = payload.get("lesson") or {}
+    if not isinstance(data, dict):
+        raise _error("lesson", "Ожидается объект")
+    values = {}
+    for field in LESSON_FIELDS:
+        if field not in data:
+            continue
+        if field in ("start_time", "end_time"):
+            values[field] = _parse_time(data[field], field)
+        elif isinstance(data[field], int):
+            values[field] = data[field]
+        else:
+            raise _error(field, "Ожидается целое число")
+    if action == CREATE:
+        missing = [f for f in LESSON_FIELDS if f not in values]
+        if missing:
+            raise RequestError({f: ["Обязательное поле."] for f in missing})
+    return action, lesson_id, values
+
+
+class ScheduleWindow:
+    """Занятость аудиторий, преподавателей и групп в окне времени пачки заявок."""
+
+    KINDS = (("room_id", "Аудитория"), ("teacher_id", "Преподаватель"), ("group_id", "Группа"))
+
+    def __init__(self):
+        self.lessons: dict[int, dict] = {}
+        self.by_key: dict[tuple[str, int], set[int]] = {}
+
+    def add(self, lesson_id: int, values: dict) -> None:
+        self.lessons[lesson_id] = values
+        for kind, _ in self.KINDS:
+            self.by_key.setdefault((kind, values[kind]), set()).add(lesson_id)
+
+    def remove(self, lesson_id: int) -> None:
+        values = self.lessons.pop(lesson_id, None)
+        if values is None:
+            return
+        for kind, _ in self.KINDS:
+            self.by_key.get((kind, values[kind]), set()).discard(lesson_id)
+
+    def conflicts(self, values: dict, names: dict, exclude: int | None = None) -> dict[str, list[str]]:
+        start, end = values["start_time"], values["end_time"]
+        errors = {}
+        for kind, label in self.KINDS:
+            for other_id in self.by_key.get((kind, values[kind]), ()):
+                other = self.lessons[other_id]
+                if other_id != exclude and other["start_time"] < end and other["end_time"] > start:
+                    name = names[kind].get(values[kind], values[kind])
+                    errors[kind] = [
+                        f"{label} {name} уже занят(а) в интервале "
+                        f"{timezone.localtime(start):%d.%m.%Y %H:%M} - {timezone.localtime(end):%d.%m.%Y %H:%M}."
+                    ]
+                    break
+        return errors
+
+
+def _load_names(parsed) -> dict[str, dict]:
+    ids = {field: set() for field in ("group_id", "teacher_id", "discipline_id", "room_id")}
+    for _req, (_action, _lesson_id, values) in parsed:
+        for field in ids:
+            if field in values:
+                ids[field].add(values[field])
+    teachers = Teacher.objects.filter(id__in=ids["teacher_id"]).values_list(
+        "id", "user__first_name", "user__last_name", "user__username"
+    )
+    return {
+        "group_id": dict(GroupModel.objects.filter(id__in=ids["group_id"]).values_list("id", "name")),
+        "teacher_id": {t_id: f"{first} {last}".strip() or username for t_id, first, last, username in teachers},
+        "discipline_id": dict(Discipline.objects.filter(id__in=ids["discipline_id"]).values_list("id", "name")),
+        "room_id": dict(Room.objects.filter(id__in=ids["room_id"]).values_list("id", "name")),
+    }
+
+
+def _load_limits(finals) -> dict[str, dict]:
+    """id -> (название, вместимость аудитории / число студентов группы) для проверки вместимости."""
+    rooms = {v["room_id"] for v in finals if "room_id" in v}
+    groups = {v["group_id"] for v in finals if "group_id" in v}
+    return {
+        "room_id": {i: (n, c) for i, n, c in Room.objects.filter(id__in=rooms).values_list("id", "name", "capacity")},
+        "group_id": {
+            i: (n, c) for i, n, c in GroupModel.objects.filter(id__in=groups).values_list("id", "name", "student_count")
+        },
+    }
+
+
+def _lock_scope(finals) -> None:
+    """
+    Блокирует строки аудиторий, преподавателей и групп пачки (всегда в одном порядке —
+    без взаимных блокировок). Вызывается до первого чтения без блокировки: на MySQL
+    (REPEATABLE READ) снимок транзакции создаётся этим чтением и должен включать
+    занятия, записанные пачкой, которую мы ждали.
+    """
+    for model, field in ((Room, "room_id"), (Teacher, "teacher_id"), (GroupModel, "group_id")):
+        ids = sorted({v[field] for v in finals if field in v})
+        if ids:
+            list(model.objects.select_for_update().filter(id__in=ids).order_by("id").values_list("id", flat=True))
+
+
+def process_batch(batch_size: int = DEFAULT_BATCH_SIZE) -> dict[str, int]:
+    """Обрабатывает одну пачку заявок. Возвращает число применённых и отклонённых."""
+    with transaction.atomic():
+        requests = list(
+            ChangeRequest.objects.select_for_update(skip_locked=True)
+            .filter(state=ChangeRequest.NEW)
+            .order_by("created_at", "id")[:batch_size]
+        )
+        if not requests:
+            return {"applied": 0, "rejected": 0}
+
+        parsed, results = [], {}
+        for req in requests:
+            try:
+                parsed.append((req, parse_payload(req.payload)))
+            except RequestError as e:
+                results[req.pk] = (ChangeRequest.REJECTED, {"errors": e.errors})
+
+        existing = {
+            lesson.pk: lesson
+            for lesson in Lesson.objects.select_for_update().filter(
+                pk__in={lesson_id for _req, (_a, lesson_id, _v) in parsed if lesson_id}
+            )
+        }
+        # Итоговые значения полей для каждой заявки — чтобы построить окно времени
+        states = {pk: {f: getattr(lesson, f) for f in LESSON_FIELDS} for pk, lesson in existing.items()}
+        finals = [{**states.get(lesson_id, {}), **values} for _req, (_a, lesson_id, values) in parsed]
+        _lock_scope(finals)
+
+        names = _load_names(parsed)
+        window = ScheduleWindow()
+        intervals = [v for v in finals if "start_time" in v and "end_time" in v]
+        if intervals:
+            window_start = min(v["start_time"] for v in intervals)
+            window_end = max(v["end_time"] for v in intervals)
+            scope = Q()
+            for kind, _ in ScheduleWindow.KINDS:
+                scope |= Q(**{f"{kind}__in": {v[kind] for v in intervals if kind in v}})
+            rows = Lesson.objects.filter(scope, start_time__lt=window_end, end_time__gt=window_start).values(
+                "id", *LESSON_FIELDS
+            )
+            for row in rows:
+                window.add(row.pop("id"), row)
+
+        limits = _load_limits(finals)
+
+        grid = timeslots.grid()
+        creates: list[tuple[ChangeRequest, Lesson]] = []
+        updated: dict[int, Lesson] = {}
+        deleted: set[int] = set()
+        for req, (action, lesson_id, values) in parsed:
+            try:
+                if action != CREATE and (lesson_id not in existing or lesson_id in deleted):
+                    raise _error("lesson_id", f"Занятие с ID {lesson_id} не найдено")
+                if action == DELETE:
+                    deleted.add(lesson_id)
+                    updated.pop(lesson_id, None)
+                    window.remove(lesson_id)
+                    results[req.pk] = (ChangeRequest.DONE, {"lesson_id": lesson_id})
+                    continue
+
+                final = {**states.get(lesson_id, {}), **values}
+                missing = {
+                    field: [f"Объект с ID {final[field]} не существует."]
+                    for field in names if final[field] not in names[field]
+                    and (action == CREATE or field in values)
+                }
+                if missing:
+                    raise RequestError(missing)
+                if final["end_time"] <= final["start_time"]:
+                    raise _error("end_time", "Время окончания должно быть больше времени начала")
+                if action == CREATE or {"room_id", "group_id"} & values.keys():
+                    error = capacity.capacity_error(*limits["room_id"][final["room_id"]],
+                                                    *limits["group_id"][final["group_id"]])
+                    if error:
+                        raise _error("room_id", error)
+                errors = window.conflicts(final, names, exclude=lesson_id)
+                if errors:
+                    raise RequestError(errors)
+            except RequestError as e:
+                results[req.pk] = (ChangeRequest.REJECTED, {"errors": e.errors})
+                continue
+
+            if action == CREATE:
+                lesson = Lesson(**final)
+                lesson.fill_week()
+                lesson.fill_slot(grid)
+                creates.append((req, lesson))
+                # Временный отрицательный id, чтобы учесть занятие при проверке следующих заявок
+                window.add(-len(creates), final)
+            else:
+                lesson = existing[lesson_id]
+                for field, value in final.items():
+                    setattr(lesson, field, value)
+                lesson.week = None
+                lesson.fill_week()
+                lesson.fill_slot(grid)
+                states[lesson_id] = final
+                updated[lesson_id] = lesson
+                window.remove(lesson_id)
+                window.add(lesson_id, final)
+                results[req.pk] = (ChangeRequest.DONE, {"lesson_id": lesson_id})
+
+        if deleted:
+            Lesson.objects.filter(pk__in=deleted).delete()
+        if updated:
+            Lesson.objects.bulk_update(list(updated.values()), [*LESSON_FIELDS, "week", "date", "slot"])
+        if creates:
+            if connections[router.db_for_write(Lesson)].features.can_return_rows_from_bulk_insert:
+                Lesson.objects.bulk_create([lesson for _req, lesson in creates])
+            else:
+                # MySQL не возвращает id из bulk_create: без них в заявке не будет id занятия,
+                # а журнал изменений — только полная пересинхронизация для всех клиентов
+                for _req, lesson in creates:
+                    lesson.save()
+            for req, lesson in creates:
+                results[req.pk] = (ChangeRequest.DONE, {"lesson_id": lesson.pk})
+
+        now = timezone.now()
+        for req in requests:
+            req.state, req.result = results[req.pk]
+            req.processed_at = now
+        ChangeRequest.objects.bulk_update(requests, ["state", "result", "processed_at"])
+
+    applied = sum(1 for state, _ in results.values() if state == ChangeRequest.DONE)
+    return {"applied": applied, "rejected": len(requests) - applied}
@@ -0,0 +1,212 @@
+"""
+Журнал изменений расписания и дельта-синхронизация.
+
+Каждое создание, изменение и удаление занятий и справочников (кафедры,
+группы, преподаватели, дисциплины, аудитории) добавляет строку в ChangeLog
+в той же транзакции, что и само изменение:
+- одиночные save()/delete() (API, админка) — через сигналы (core.signals),
+  save() обёрнут в транзакцию в ChangeLoggedModel;
+- массовые bulk_create/bulk_update/update — в ChangeLoggedQuerySet.
+
+Токен синхронизации — id последней прочитанной записи журнала.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+from .caching import bump_schedule_version, bump_week_versions
+from .models import ChangeLog, Department, Discipline, GroupModel, Lesson, Room, Teacher
+
+SCOPE_FIELDS = ("group_id", "teacher_id", "room_id")
+DEFAULT_SYNC_PAGE_SIZE = 1000
+DEFAULT_RETENTION_DAYS = 90
+
+
+def _lesson_data(lesson: Lesson) -> dict:
+    return {
+        "group_id": lesson.group_id,
+        "teacher_id": lesson.teacher_id,
+        "discipline_id": lesson.discipline_id,
+        "room_id": lesson.room_id,
+        "start_time": lesson.start_time.isoformat() if lesson.start_time else None,
+        "end_time": lesson.end_time.isoformat() if lesson.end_time else None,
+    }
+
+
+def _teacher_data(teacher: Teacher) -> dict:
+    return {"name": str(teacher), "department_id": teacher.department_id, "title": teacher.title}
+
+
+# Метка модели в журнале -> (модель, функция снимка строки)
+LOGGED_MODELS = {
+    "lesson": (Lesson, _lesson_data),
+    "department": (Department, lambda d: {"name": d.name}),
+    "group": (GroupModel, lambda g: {"name": g.name, "department_id": g.department_id, "year": g.year}),
+    "teacher": (Teacher, _teacher_data),
+    "discipline": (Discipline, lambda d: {"name": d.name}),
+    "room": (Room, lambda r: {"name": r.name, "capacity": r.capacity, "room_type": r.room_type}),
+}
+MODEL_LABELS = {model: label for label, (model, _) in LOGGED_MODELS.items()}
+
+
+def _entries(instance, action: str, previous_scope: dict | None = None) -> list[ChangeLog]:
+    label = MODEL_LABELS[type(instance)]
+    data = LOGGED_MODELS[label][1](instance)
+    scope = {name: getattr(instance, name, None) for name in SCOPE_FIELDS}
+    entries = [ChangeLog(model=label, object_id=instance.pk, action=action, data=data, **scope)]
+    # Занятие перенесли в другую группу/аудиторию/к другому преподавателю:
+    # отдельная запись с прежними ссылками, чтобы её увидели прежние подписчики
+    if previous_scope and any(previous_scope.get(n) is not None and previous_scope[n] != scope[n] for n in SCOPE_FIELDS):
+        entries.append(ChangeLog(model=label, object_id=instance.pk, action=action, data=data, **previous_scope))
+    return entries
+
+
+def record(instance, action: str) -> None:
+    """Запись журнала для одиночного изменения (вызывается из сигналов)."""
+    previous_scope = getattr(instance, "_loaded_scope", None)
+    ChangeLog.objects.bulk_create(_entries(instance, action, previous_scope))
+    if isinstance(instance, Lesson):
+        instance._loaded_scope = {name: getattr(instance, name) for name in SCOPE_FIELDS}
+
+
+def scope_snapshot(queryset) -> dict:
+    """pk -> ссылки группы/преподавателя/аудитории до массового изменения."""
+    if queryset.model is Lesson:
+        return {row[0]: dict(zip(SCOPE_FIELDS, row[1:])) for row in queryset.values_list("pk", *SCOPE_FIELDS)}
+    return {pk: None for pk in queryset.values_list("pk", flat=True)}
+
+
+def record_bulk(model, objs, action: str, using: str | None = None, previous=None) -> None:
+    """
+    Запись журнала для массовой операции.
+
+    previous — словарь pk -> прежние ссылки (для update()) или True, если их
+    нужно взять из _loaded_scope объектов (для bulk_update()).
+    """
+    if model not in MODEL_LABELS:
+        return
+    objs = list(objs)
+    label = MODEL_LABELS[model]
+    if any(obj.pk is None for obj in objs):
+        # Бэкенд не вернул id созданных строк — просим клиентов пересинхронизировать модель
+        entries = [ChangeLog(model=label, object_id=0, action=ChangeLog.RESET)]
+    else:
+        entries = []
+        for obj in objs:
+            if previous is True:
+                previous_scope = getattr(obj, "_loaded_scope", None)
+            else:
+                previous_scope = (previous or {}).get(obj.pk)
+            entries.extend(_entries(obj, action, previous_scope))
+    ChangeLog.objects.using(using).bulk_create(entries, batch_size=1000)
+
+    if model is Lesson:
+        if previous is None:
+            bump_week_versions(obj.start_time for obj in objs)
+        else:
+            # Прежние недели изменённых занятий неизвестны — сбрасываем весь кэш
+            bump_schedule_version()
+    else:
+        bump_schedule_version()
+
+
+def current_token() -> str:
+    return str(ChangeLog.objects.aggregate(last=Max("id"))["last"] or 0)
+
+
+def compaction_watermark() -> int:
+    """Записи журнала с id не больше этого значения удалены — более старые токены недействительны."""
+    return ChangeLog.objects.filter(action=ChangeLog.COMPACTED).aggregate(w=Max("object_id"))["w"] or 0
+
+
+def changes_since(since: int, group_id: int | None = None, limit: int | None = None) -> dict:
+    """
+    Изменения после токена since: актуальное состояние изменённых строк и id удалённых.
+
+    С фильтром group_id занятия других групп не возвращаются, а занятие,
+    перенесённое из этой группы, отдаётся как удалённое.
+    """
+    limit = limit or getattr(settings, "SYNC_PAGE_SIZE", DEFAULT_SYNC_PAGE_SIZE)
+    if since < compaction_watermark():
+        return {"reset": True, "token": current_token()}
+
+    qs = ChangeLog.objects.filter(id__gt=since).exclude(action=ChangeLog.COMPACTED)
+    if group_id is not None:
+        # Справочники нужны всем клиентам, занятия — только своей группы
+        qs = qs.filter(~Q(model="lesson") | Q(group_id=group_id))
+    rows = list(qs.order_by("id").values_list("id", "model", "object_id", "action", "data")[:limit])
+
+    # Для каждого объекта важна только последняя запись
+    latest: dict[tuple[str, int], tuple[str, dict]] = {}
+    resets = set()
+    for _id, label, object_id, action, data in rows:
+        if action == ChangeLog.RESET:
+            resets.add(label)
+            continue
+        latest[(label, object_id)] = (action, data)
+
+    changed: dict[str, list] = {}
+    deleted: dict[str, list] = {}
+    for (label, object_id), (action, data) in latest.items():
+        moved_away = label == "lesson" and group_id is not None and data.get("group_id") != group_id
+        if action == ChangeLog.DELETED or moved_away:
+            deleted.setdefault(label, []).append(object_id)
+        else:
+            changed.setdefault(label, []).append({"id": object_id, **data})
+
+    response = {
+        "token": str(rows[-1][0]) if rows else str(since),
+        "changed": changed,
+        "deleted": deleted,
+        "more": len(rows) == limit,
+    }
+    if resets:
+        response["reset_models"] = sorted(resets)
+    return response
+
+
+def compact(retention_days: int | None = None, batch_size: int = 5000) -> dict:
+    """
+    Сжатие журнала:
+    1) удаляет записи, перекрытые более поздней записью того же объекта
+       (в рамках той же группы) — токены при этом остаются действительными;
+    2) удаляет записи старше retention_days и фиксирует watermark:
+       клиенты с более старым токеном получат reset и выполнят полную загрузку.
+    """
+    retention_days = retention_days if retention_days is not None else getattr(
+        settings, "CHANGELOG_RETENTION_DAYS", DEFAULT_RETENTION_DAYS
+    )
+    later = ChangeLog.objects.filter(model=OuterRef("model"), object_id=OuterRef("object_id"), id__gt=OuterRef("id"))
+    superseded_qs = ChangeLog.objects.exclude(action=ChangeLog.COMPACTED).alias(
+        has_later=Exists(later.filter(group_id=OuterRef("group_id"))),
+        has_later_any=Exists(later),
+    ).filter(
+        # Записи о занятиях перекрываются только в рамках той же группы,
+        # записи справочников (group_id IS NULL) — любой более поздней записью объекта
+        Q(group_id__isnull=False, has_later=True) | Q(group_id__isnull=True, has_later_any=True)
+    )
+    superseded = _delete_in_batches(superseded_qs, batch_size)
+
+    expired = 0
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    expired_qs = ChangeLog.objects.exclude(action=ChangeLog.COMPACTED).filter(created_at__lt=cutoff)
+    watermark = expired_qs.aggregate(last=Max("id"))["last"]
+    if watermark:
+        with transaction.atomic():
+            ChangeLog.objects.create(model="changelog", object_id=watermark, action=ChangeLog.COMPACTED)
+            expired = _delete_in_batches(expired_qs.filter(id__lte=watermark), batch_size)
+        ChangeLog.objects.filter(action=ChangeLog.COMPACTED, object_id__lt=watermark).delete()
+    return {"superseded": superseded, "expired": expired}
+
+
+def _delete_in_batches(queryset, batch_size: int) -> int:
+    total = 0
+    while True:
+        # MySQL не позволяет удалять с подзапросом к той же таблице — сначала выбираем id
+        ids = list(queryset.order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += ChangeLog.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,37 @@
+"""
+Сжатие ответов gzip.
+
+Обёртка над GZipMiddleware Django: сжимаются ответы не короче
+REST_FRAMEWORK["GZIP_MIN_LENGTH"] байт (None отключает сжатие), потоковые
+ответы сжимаются по мере отдачи. Vary: Accept-Encoding ставится на каждый
+ответ, который мог быть сжат, — и когда клиент gzip не принимает, иначе
+промежуточный кэш отдаст сжатую копию клиенту без поддержки gzip.
+
+Поток событий (text/event-stream) не сжимается: gzip буферизует данные,
+и события доходили бы до клиента с задержкой.
+"""
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware.gzip import GZipMiddleware
+
+DEFAULT_MIN_LENGTH = 1024
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+def gzip_min_length() -> int | None:
+    return getattr(settings, "REST_FRAMEWORK", {}).get("GZIP_MIN_LENGTH", DEFAULT_MIN_LENGTH)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def __init__(self, get_response):
+        self.min_length = gzip_min_length()
+        if self.min_length is None:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        if response.get("Content-Type", "").startswith(UNCOMPRESSED_TYPES):
+            return response
+        if not response.streaming and len(response.content) < self.min_length:
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,189 @@
+"""
+Проверка всего расписания на пересечения (manage.py check_schedule).
+
+Проверки при записи есть не на всех путях (админка, фикстуры, скрипты,
+запись администратора через API), поэтому в таблице могут оказаться
+двойные бронирования. Здесь занятия каждой аудитории, преподавателя и
+группы читаются по возрастанию start_time — пачками по ключу
+(start_time, id) через индексы (объект, start_time) — и проверяются
+заметающей прямой: куча по времени окончания хранит занятия, ещё идущие
+к началу текущего; все они с ним пересекаются. Время O(n log n + k) для
+k пересечений, память — одна пачка и занятия, идущие одновременно,
+независимо от числа строк в таблице.
+
+Виды объектов проверяются параллельно в отдельных процессах; каждый пишет
+свою часть отчёта, которые затем склеиваются в один файл JSON Lines или CSV.
+"""
+import csv
+import heapq
+import json
+import multiprocessing
+import os
+from dataclasses import dataclass
+
+import django
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from . import timeslots
+from .models import ChangeRequest, GroupModel, Lesson, Room, Teacher
+
+KINDS = ("room", "teacher", "group")
+FORMATS = ("json", "csv")
+DEFAULT_BATCH_SIZE = 5000
+FIELDS = ["kind", "object_id", "object", "lesson_id", "start_time", "end_time",
+          "other_id", "other_start_time", "other_end_time"]
+
+
+@dataclass(frozen=True)
+class Overlap:
+    kind: str
+    object_id: int
+    object: str
+    lesson_id: int
+    start_time: str
+    end_time: str
+    other_id: int
+    other_start_time: str
+    other_end_time: str
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in FIELDS}
+
+
+def _names(kind: str) -> dict[int, str]:
+    if kind == "teacher":
+        return {
+            t_id: f"{first} {last}".strip() or username
+            for t_id, username, first, last in Teacher.objects.values_list(
+                "id", "user__username", "user__first_name", "user__last_name"
+            )
+        }
+    model = {"room": Room, "group": GroupModel}[kind]
+    return dict(model.objects.values_list("id", "name"))
+
+
+def _lessons(kind: str, object_id: int, batch_size: int):
+    """Занятия объекта по (start_time, id) пачками по ключу — без OFFSET и без всей выборки в памяти."""
+    qs = Lesson.objects.filter(**{f"{kind}_id": object_id}).order_by("start_time", "id")
+    last = None
+    while True:
+        page = qs
+        if last is not None:
+            page = qs.filter(Q(start_time__gt=last[0]) | Q(start_time=last[0], id__gt=last[1]))
+        rows = list(page.values_list("start_time", "id", "end_time")[:batch_size])
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1][:2]
+
+
+def sweep(rows):
+    """
+    rows — (начало, id, конец) по возрастанию начала; выдаёт пары
+    пересекающихся занятий ((начало, id, конец) раньше начавшегося, текущее).
+    """
+    running = []  # куча (конец, начало, id) занятий, которые ещё идут
+    for start, lesson_id, end in rows:
+        while running and running[0][0] <= start:
+            heapq.heappop(running)
+        for other_end, other_start, other_id in running:
+            yield (other_start, other_id, other_end), (start, lesson_id, end)
+        heapq.heappush(running, (end, start, lesson_id))
+
+
+def scan(kind: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Все пересечения по виду объектов: Overlap по возрастанию объекта и времени."""
+    iso = lambda value: timezone.localtime(value).isoformat()
+    for object_id, name in sorted(_names(kind).items()):
+        for (o_start, o_id, o_end), (start, lesson_id, end) in sweep(_lessons(kind, object_id, batch_size)):
+            yield Overlap(kind, object_id, name, lesson_id, iso(start), iso(end), o_id, iso(o_start), iso(o_end))
+
+
+def _writer(out, fmt: str):
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        return writer.writerow
+    return lambda row: out.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def write_part(kind: str, path: str, fmt: str, batch_size: int) -> int:
+    """Пишет пересечения одного вида в файл (без заголовка CSV); возвращает их число."""
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as out:
+        write = _writer(out, fmt)
+        for overlap in scan(kind, batch_size):
+            write(overlap.as_dict())
+            count += 1
+    return count
+
+
+def check(output: str, fmt: str = "json", kinds=KINDS, processes: int = len(KINDS),
+          batch_size: int = DEFAULT_BATCH_SIZE) -> dict[str, int]:
+    """Проверяет расписание и пишет отчёт в output; возвращает число пересечений по видам."""
+    parts = {kind: f"{output}.{kind}.part" for kind in kinds}
+    if processes > 1 and len(kinds) > 1:
+        connections.close_all()
+        # Процессы запускаются через spawn, как обработчики run_workers: Django настраивается
+        # заново (initializer) до того, как процесс получит задачу и импортирует этот модуль
+        with multiprocessing.get_context("spawn").Pool(min(processes, len(kinds)), initializer=django.setup) as pool:
+            results = {kind: pool.apply_async(write_part, (kind, parts[kind], fmt, batch_size)) for kind in kinds}
+            counts = {kind: result.get() for kind, result in results.items()}
+    else:
+        counts = {kind: write_part(kind, parts[kind], fmt, batch_size) for kind in kinds}
+
+    with open(output, "w", encoding="utf-8", newline="") as out:
+        if fmt == "csv":
+            csv.DictWriter(out, fieldnames=FIELDS).writeheader()
+        for kind in kinds:
+            with open(parts[kind], encoding="utf-8", newline="") as part:
+                for line in part:
+                    out.write(line)
+            os.remove(parts[kind])
+    return counts
+
+
+def read_report(path: str, fmt: str = "json"):
+    with open(path, encoding="utf-8", newline="") as report:
+        if fmt == "csv":
+            for row in csv.DictReader(report):
+                yield {**row, "object_id": int(row["object_id"]), "lesson_id": int(row["lesson_id"]),
+                       "other_id": int(row["other_id"])}
+        else:
+            for line in report:
+                yield json.loads(line)
+
+
+def _free_room(lesson: Lesson) -> Room | None:
+    """Свободная в то же время аудитория того же типа, где помещается группа."""
+    busy = Lesson.objects.filter(timeslots.busy_q(
+        lesson.start_time, lesson.end_time, *timeslots.date_and_slot(lesson.start_time, lesson.end_time)
+    )).values("room_id")
+    return (
+        Room.objects.filter(room_type=lesson.room.room_type, capacity__gte=lesson.group.student_count)
+        .exclude(id__in=busy).order_by("capacity", "name").first()
+    )
+
+
+def open_change_requests(report, user) -> tuple[int, int]:
+    """
+    Заявки на перенос в свободную аудиторию для пересечений по аудиториям
+    (позже начавшееся занятие). Пересечения преподавателей и групп требуют
+    решения человека и только попадают в отчёт. Возвращает (открыто, без свободной аудитории).
+    """
+    opened, skipped, seen = 0, 0, set()
+    for row in report:
+        if row["kind"] != "room" or row["lesson_id"] in seen:
+            continue
+        seen.add(row["lesson_id"])
+        lesson = Lesson.objects.select_related("room", "group").filter(pk=row["lesson_id"]).first()
+        room = _free_room(lesson) if lesson is not None else None
+        if room is None:
+            skipped += 1
+            continue
+        ChangeRequest.objects.create(created_by=user, payload={
+            "action": "update", "lesson_id": lesson.id, "lesson": {"room_id": room.id},
+        })
+        opened += 1
+    return opened, skipped
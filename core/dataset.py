@@ -0,0 +1,281 @@
+"""
+Генератор синтетического набора данных масштаба университета.
+
+Набор детерминирован: одинаковые параметры и seed дают одинаковые данные,
+поэтому замеры производительности воспроизводимы (manage.py generate_dataset).
+
+Расписание строится по двум недельным шаблонам («числитель» и «знаменатель»),
+которые чередуются по неделям семестра. Каждая группа получает учебный план
+из дисциплин своей кафедры с закреплёнными преподавателями; занятия
+раскладываются по слотам так, что группа, преподаватель и аудитория в одном
+слоте заняты не более одного раза, а вместимость аудитории не меньше группы.
+Все объекты создаются через bulk_create пачками.
+"""
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dtime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.utils import timezone
+
+from . import capacity, timeslots
+from .models import Department, Discipline, GroupModel, Lesson, Room, Student, Teacher
+
+# Пары, как в create_test_data.py, плюс вечерняя; занятия с понедельника по субботу
+SLOTS = ((8, 30, 10, 0), (10, 20, 11, 50), (12, 10, 13, 40), (14, 0, 15, 30), (15, 50, 17, 20), (17, 30, 19, 0))
+DAYS_PER_WEEK = 6
+LAB_SHARE = 0.3
+
+DISCIPLINES = (
+    "Базы данных", "Программирование", "Веб-разработка", "Алгоритмы", "Операционные системы",
+    "Компьютерные сети", "Математический анализ", "Линейная алгебра", "Дискретная математика",
+    "Теория вероятностей", "Физика", "Иностранный язык", "Экономика", "Философия",
+    "Электротехника", "Инженерная графика", "Теоретическая механика", "Химия",
+)
+FIRST_NAMES = (
+    "Иван", "Пётр", "Сергей", "Анна", "Мария", "Елена", "Алексей", "Ольга", "Дмитрий", "Наталья",
+    "Андрей", "Татьяна", "Михаил", "Ирина", "Николай", "Светлана",
+)
+LAST_NAMES = (
+    "Иванов", "Петров", "Сергеев", "Смирнов", "Кузнецов", "Попов", "Васильев", "Соколов",
+    "Михайлов", "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов",
+)
+
+
+@dataclass
+class DatasetSpec:
+    departments: int = 30
+    groups: int = 600
+    teachers: int = 1500
+    rooms: int = 300
+    weeks: int = 36
+    students_per_group: int = 25
+    lessons_per_week: int = 12
+    disciplines_per_department: int = 8
+    start: date = date(2024, 9, 2)
+    seed: int = 42
+    password: str = "dataset123"
+    batch_size: int = 5000
+
+
+@dataclass
+class DatasetReport:
+    counts: dict = field(default_factory=dict)
+    timings: dict = field(default_factory=dict)
+    unplaced: int = 0
+
+
+class _Timer:
+    def __init__(self, report: DatasetReport, progress):
+        self.report = report
+        self.progress = progress
+
+    def __call__(self, phase: str, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.report.timings[phase] = time.perf_counter() - started
+        if self.progress:
+            self.progress(phase, self.report.timings[phase])
+        return result
+
+
+def _bulk_create(model, objs: list, key: str, batch_size: int) -> list:
+    """bulk_create с id у созданных объектов — MySQL их не возвращает, тогда дочитываем по уникальному полю."""
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    if objs and objs[0].pk is None:
+        ids = {}
+        values = [getattr(obj, key) for obj in objs]
+        for i in range(0, len(values), batch_size):
+            ids.update(model.objects.filter(**{f"{key}__in": values[i:i + batch_size]}).values_list(key, "id"))
+        for obj in objs:
+            obj.pk = ids[getattr(obj, key)]
+    return objs
+
+
+class DatasetGenerator:
+    def __init__(self, spec: DatasetSpec):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self.password = make_password(spec.password)
+
+    def _users(self, prefix: str, count: int, width: int) -> list[User]:
+        rng = self.rng
+        users = [
+            User(
+                username=f"{prefix}{n:0{width}d}",
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                email=f"{prefix}{n:0{width}d}@example.com",
+                password=self.password,
+            )
+            for n in range(1, count + 1)
+        ]
+        return _bulk_create(User, users, "username", self.spec.batch_size)
+
+    def _add_role(self, users: list[User], role: str) -> None:
+        group, _ = Group.objects.get_or_create(name=role)
+        Membership = User.groups.through
+        Membership.objects.bulk_create(
+            [Membership(user_id=user.pk, group_id=group.pk) for user in users], batch_size=self.spec.batch_size
+        )
+
+    def create_references(self) -> None:
+        spec, rng = self.spec, self.rng
+        size = spec.batch_size
+        self.departments = _bulk_create(
+            Department, [Department(name=f"Кафедра {d + 1:02d}") for d in range(spec.departments)], "name", size
+        )
+
+        groups = []
+        for g in range(spec.groups):
+            d, k = g % spec.departments, g // spec.departments
+            year, number = k % 4 + 1, k // 4 + 1
+            groups.append(GroupModel(name=f"К{d + 1:02d}-{year}{number:02d}", department=self.departments[d], year=year))
+        self.groups = _bulk_create(GroupModel, groups, "name", size)
+
+        teacher_users = self._users("teacher", spec.teachers, 5)
+        self._add_role(teacher_users, "TEACHER")
+        self.teachers = _bulk_create(Teacher, [
+            Teacher(user=user, department=self.departments[t % spec.departments], title=rng.choice(("Доцент", "Профессор", "Старший преподаватель")))
+            for t, user in enumerate(teacher_users)
+        ], "user_id", size)
+
+        total = spec.departments * spec.disciplines_per_department
+        self.disciplines = _bulk_create(Discipline, [
+            Discipline(name=f"{DISCIPLINES[i % len(DISCIPLINES)]} {i // len(DISCIPLINES) + 1}") for i in range(total)
+        ], "name", size)
+
+        rooms = []
+        for r in range(spec.rooms):
+            if rng.random() < LAB_SHARE:
+                rooms.append(Room(name=f"Л-{r + 1:03d}", capacity=rng.choice((20, 25, 30, 35)), room_type=Room.LAB))
+            else:
+                rooms.append(Room(name=f"А-{r + 1:03d}", capacity=rng.choice((30, 40, 60, 90, 120, 150)), room_type=Room.LECTURE))
+        self.rooms = _bulk_create(Room, rooms, "name", size)
+
+        # Численность групп — для проверки вместимости аудиторий
+        self.group_sizes = [
+            max(1, spec.students_per_group + rng.randint(-5, 5)) if spec.students_per_group else 25
+            for _ in self.groups
+        ]
+
+    def create_students(self) -> None:
+        spec = self.spec
+        if not spec.students_per_group:
+            self.students = []
+            return
+        owners = [g for g, size in enumerate(self.group_sizes) for _ in range(size)]
+        users = self._users("student", len(owners), 6)
+        self._add_role(users, "STUDENT")
+        self.students = Student.objects.bulk_create(
+            [Student(user=user, group=self.groups[g]) for user, g in zip(users, owners)], batch_size=spec.batch_size
+        )
+        # bulk_create не вызывает сигналы, которые ведут GroupModel.student_count
+        capacity.recount([group.id for group in self.groups])
+
+    def _curricula(self) -> list[list[tuple[int, int, bool]]]:
+        """Для каждой группы: список (дисциплина, преподаватель, лабораторная) на неделю."""
+        spec, rng = self.spec, self.rng
+        teachers_by_dept = [[] for _ in range(spec.departments)]
+        for t in range(len(self.teachers)):
+            teachers_by_dept[t % spec.departments].append(t)
+        curricula = []
+        for g in range(len(self.groups)):
+            d = g % spec.departments
+            first = d * spec.disciplines_per_department
+            subjects = rng.sample(range(first, first + spec.disciplines_per_department), min(6, spec.disciplines_per_department))
+            staff = teachers_by_dept[d] or range(len(self.teachers))
+            assigned = {s: (rng.choice(staff), rng.random() < LAB_SHARE) for s in subjects}
+            curricula.append([(s, *assigned[s]) for s in (subjects * spec.lessons_per_week)[:spec.lessons_per_week]])
+        return curricula
+
+    def build_template(self, curricula) -> list[tuple[int, int, int, int, int]]:
+        """Недельный шаблон: (слот, группа, дисциплина, преподаватель, аудитория)."""
+        rng = self.rng
+        slot_count = DAYS_PER_WEEK * len(SLOTS)
+        rooms_by_type = {
+            kind: [r for r, room in enumerate(self.rooms) if room.room_type == kind] for kind in (Room.LECTURE, Room.LAB)
+        }
+        busy_teachers = [set() for _ in range(slot_count)]
+        busy_rooms = [set() for _ in range(slot_count)]
+        template = []
+        order = list(range(len(self.groups)))
+        rng.shuffle(order)
+        for g in order:
+            size = self.group_sizes[g]
+            free_slots = list(range(slot_count))
+            rng.shuffle(free_slots)
+            for discipline, teacher, lab in curricula[g]:
+                candidates = rooms_by_type[Room.LAB if lab else Room.LECTURE] or list(range(len(self.rooms)))
+                for slot in free_slots:
+                    if teacher in busy_teachers[slot]:
+                        continue
+                    offset = rng.randrange(len(candidates))
+                    room = next((
+                        r for r in candidates[offset:] + candidates[:offset]
+                        if r not in busy_rooms[slot] and self.rooms[r].capacity >= size
+                    ), None)
+                    if room is None:
+                        continue
+                    busy_teachers[slot].add(teacher)
+                    busy_rooms[slot].add(room)
+                    free_slots.remove(slot)
+                    template.append((slot, g, discipline, teacher, room))
+                    break
+                else:
+                    self.report.unplaced += 1
+        template.sort()
+        return template
+
+    def create_lessons(self, templates) -> int:
+        spec = self.spec
+        grid = timeslots.grid()
+        created = 0
+        for week in range(spec.weeks):
+            monday = spec.start + timedelta(weeks=week)
+            times = []
+            for slot in range(DAYS_PER_WEEK * len(SLOTS)):
+                day = monday + timedelta(days=slot // len(SLOTS))
+                sh, sm, eh, em = SLOTS[slot % len(SLOTS)]
+                start = timezone.make_aware(datetime.combine(day, dtime(sh, sm)))
+                end = timezone.make_aware(datetime.combine(day, dtime(eh, em)))
+                # Дата и номер пары по сетке TimeSlot (пусто, если сетка в БД другая)
+                times.append((start, end, *grid.date_and_slot(start, end)))
+            lessons = []
+            for slot, g, discipline, teacher, room in templates[week % len(templates)]:
+                start, end, day, number = times[slot]
+                lessons.append(Lesson(
+                    group=self.groups[g], teacher=self.teachers[teacher], discipline=self.disciplines[discipline],
+                    room=self.rooms[room], start_time=start, end_time=end, week=start.isocalendar().week,
+                    date=day, slot=number,
+                ))
+            Lesson.objects.bulk_create(lessons, batch_size=spec.batch_size)
+            created += len(lessons)
+        return created
+
+    def run(self, progress=None) -> DatasetReport:
+        self.report = DatasetReport()
+        timed = _Timer(self.report, progress)
+        with transaction.atomic():
+            timed("Справочники", self.create_references)
+            timed("Студенты", self.create_students)
+            curricula = timed("Учебные планы", self._curricula)
+            templates = [timed(f"Шаблон недели {n + 1}", self.build_template, curricula) for n in range(2)]
+            lessons = timed("Занятия", self.create_lessons, templates)
+        self.report.counts = {
+            "departments": len(self.departments),
+            "groups": len(self.groups),
+            "teachers": len(self.teachers),
+            "students": len(self.students),
+            "disciplines": len(self.disciplines),
+            "rooms": len(self.rooms),
+            "lessons": lessons,
+        }
+        return self.report
+
+
+def generate(spec: DatasetSpec, progress=None) -> DatasetReport:
+    return DatasetGenerator(spec).run(progress)
@@ -0,0 +1,189 @@
+"""
+Сетка расписания для табло и печати: строки — группы, аудитории или
+преподаватели, столбцы — пары дня или недели.
+
+Сетка недели строится за один проход по занятиям, отсортированным по
+времени начала: ячейка занятия в паре — Grid.position(дата, пара, понедельник)
+в плотном массиве строки (core.timeslots), занятия вне сетки пар
+складываются в extra[строка][день]. Ячейки хранят номер занятия в списке
+lessons, а имена групп, преподавателей, аудиторий и дисциплин передаются
+один раз в словаре names.
+
+Сетка недели целиком кэшируется по (вид, набор строк, неделя) с недельной
+версией расписания (core.caching); сетка дня вырезается из недельной.
+HTML для киосков кэшируется так же, отдельным ключом.
+"""
+import hashlib
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import timeslots
+from .archive import with_archive
+from .caching import cached_weeks, week_cache_keys, week_monday
+from .models import Discipline, GroupModel, Room, Teacher
+
+DAYS = 7
+MAX_ROWS = 1000
+SPANS = ("day", "week")
+LESSON_FIELDS = ["id", "discipline_id", "group_id", "teacher_id", "room_id", "start", "end"]
+
+
+def _teacher_names(ids=None) -> dict[int, str]:
+    qs = Teacher.objects.order_by("user__last_name", "user__first_name")
+    if ids is not None:
+        qs = qs.filter(id__in=ids)
+    return {
+        teacher_id: f"{first} {last}".strip() or username
+        for teacher_id, username, first, last in qs.values_list(
+            "id", "user__username", "user__first_name", "user__last_name"
+        )
+    }
+
+
+def _named(model):
+    def names(ids=None) -> dict[int, str]:
+        qs = model.objects.order_by("name")
+        if ids is not None:
+            qs = qs.filter(id__in=ids)
+        return dict(qs.values_list("id", "name"))
+    return names
+
+
+# Вид строк -> имена объектов (все, если ids=None, — в порядке вывода)
+KINDS = {"group": _named(GroupModel), "room": _named(Room), "teacher": _teacher_names}
+NAMES = {**KINDS, "discipline": _named(Discipline)}
+
+
+def scope_key(ids: list[int] | None) -> str:
+    if ids is None:
+        return "all"
+    return hashlib.sha1(",".join(map(str, ids)).encode()).hexdigest()[:16]
+
+
+def build_week(kind: str, ids: list[int] | None, monday: date) -> dict:
+    grid = timeslots.grid()
+    slots = len(grid)
+    days = [monday + timedelta(days=i) for i in range(DAYS)]
+    week_start = timezone.make_aware(datetime.combine(monday, time.min))
+    week_end = week_start + timedelta(days=DAYS)
+
+    owners = list(KINDS[kind]())[:MAX_ROWS] if ids is None else ids
+    row_of = {owner: i for i, owner in enumerate(owners)}
+    cells = [[None] * (DAYS * slots) for _ in row_of]
+    extra = [[[] for _ in days] for _ in row_of]
+    lessons = []
+    referenced = {"group": set(), "teacher": set(), "room": set(), "discipline": set()}
+
+    filters = {"start_time__gte": week_start, "start_time__lt": week_end}
+    if ids is not None:
+        filters[f"{kind}_id__in"] = ids
+    rows = with_archive(lambda model: model.objects.filter(**filters).values_list(
+        "id", "discipline_id", "group_id", "teacher_id", "room_id", "start_time", "end_time", "date", "slot"
+    ), since=week_start).order_by("start_time")
+    owner_at = {"group": 2, "teacher": 3, "room": 4}[kind]
+
+    for row in rows:
+        lesson_id, discipline_id, group_id, teacher_id, room_id, start, end, day, slot = row
+        index = row_of.get(row[owner_at])
+        if index is None:
+            continue
+        start, end = timezone.localtime(start), timezone.localtime(end)
+        if grid.pending:
+            # Сохранённые номера пар могут относиться к прежней сетке
+            day, slot = grid.match(start, end)
+        day = day or start.date()
+        number = len(lessons)
+        lessons.append([lesson_id, discipline_id, group_id, teacher_id, room_id,
+                        f"{start:%H:%M}", f"{end:%H:%M}"])
+        for name, value in (("group", group_id), ("teacher", teacher_id), ("room", room_id),
+                            ("discipline", discipline_id)):
+            referenced[name].add(value)
+        if slot in grid.column:
+            position = grid.position(day, slot, monday)
+            if cells[index][position] is None:
+                cells[index][position] = number
+                continue
+        extra[index][(day - monday).days].append(number)
+
+    referenced[kind].update(row_of)
+    names = {name: NAMES[name](values) for name, values in referenced.items()}
+    return {
+        "kind": kind,
+        "days": [d.isoformat() for d in days],
+        "slots": [{"number": s.number, "start": f"{s.start:%H:%M}", "end": f"{s.end:%H:%M}"} for s in grid.slots],
+        "rows": [{"id": owner, "name": names[kind].get(owner)} for owner in owners],
+        "cells": cells,
+        "extra": extra,
+        "lesson_fields": LESSON_FIELDS,
+        "lessons": lessons,
+        "names": names,
+    }
+
+
+def day_view(week: dict, day: date) -> dict:
+    """Сетка одного дня из недельной: те же строки, пары дня и только его занятия."""
+    d = (day - date.fromisoformat(week["days"][0])).days
+    slots = len(week["slots"])
+    renumber = {}
+
+    def take(number):
+        if number is None:
+            return None
+        if number not in renumber:
+            renumber[number] = len(renumber)
+        return renumber[number]
+
+    cells = [[take(n) for n in row[d * slots:(d + 1) * slots]] for row in week["cells"]]
+    extra = [[[take(n) for n in row[d]]] for row in week["extra"]]
+    lessons = [None] * len(renumber)
+    for old, new in renumber.items():
+        lessons[new] = week["lessons"][old]
+    return {**week, "days": [week["days"][d]], "cells": cells, "extra": extra, "lessons": lessons}
+
+
+def week_grid(kind: str, ids: list[int] | None, day: date, span: str = "week") -> dict:
+    monday = week_monday(day)
+    week = cached_weeks("grid", [monday], lambda m: build_week(kind, ids, m), kind, scope_key(ids))[monday]
+    return week if span == "week" else day_view(week, day)
+
+
+def _table(grid: dict) -> dict:
+    """Строки HTML-таблицы: для каждой строки и пары — подписи занятия."""
+    names = grid["names"]
+    others = [k for k in ("discipline", "group", "teacher", "room") if k != grid["kind"]]
+    lessons = [
+        {
+            "time": f"{start}–{end}",
+            "lines": [names[k].get(lesson[LESSON_FIELDS.index(f"{k}_id")], "") for k in others],
+        }
+        for lesson in grid["lessons"]
+        for start, end in [lesson[5:7]]
+    ]
+    slots = len(grid["slots"])
+    # Столбец «вне сетки» — только у дней, где такие занятия есть
+    with_extra = [any(extra[d] for extra in grid["extra"]) for d in range(len(grid["days"]))]
+    rows = []
+    for row, cells, extra in zip(grid["rows"], grid["cells"], grid["extra"]):
+        days = []
+        for d in range(len(grid["days"])):
+            days.append({
+                "cells": [lessons[n] if n is not None else None for n in cells[d * slots:(d + 1) * slots]],
+                "extra": [lessons[n] for n in extra[d]] if with_extra[d] else None,
+            })
+        rows.append({"name": row["name"], "days": days})
+    days = [{"date": date.fromisoformat(d), "extra": e} for d, e in zip(grid["days"], with_extra)]
+    return {"days": days, "rows": rows}
+
+
+def render_html(kind: str, ids: list[int] | None, day: date, span: str) -> str:
+    monday = week_monday(day)
+    key = week_cache_keys("grid_html", [monday], kind, scope_key(ids), span, day.isoformat())[monday]
+    html = cache.get(key)
+    if html is None:
+        grid = week_grid(kind, ids, day, span)
+        html = render_to_string("grid.html", {"grid": grid, "table": _table(grid), "span": span})
+        cache.set(key, html, timeout=60 * 60)
+    return html
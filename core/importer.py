@@ -0,0 +1,238 @@
+"""
+Потоковый импорт расписания из CSV.
+
+Формат файла (первая строка — заголовок):
+    group,teacher,discipline,room,start_time,end_time
+    ИВТ-31,teacher1,Базы данных,А-101,2024-09-02T08:30,2024-09-02T10:00
+
+- teacher — логин, «Имя Фамилия» или «Фамилия Имя»;
+- время — ISO 8601, без часового пояса трактуется в TIME_ZONE проекта.
+
+Файл читается построчно, названия переводятся в id по словарям,
+загруженным один раз. Строки записываются пачками: занятие группы с тем же
+временем начала, уже записанное в БД, обновляется (bulk_update), остальные
+создаются (bulk_create) — повторный импорт того же файла обновляет занятия,
+а не дублирует их. Ключ (group, start_time) — только правило импорта, а не
+уникальный индекс таблицы: существующие занятия находятся тем же запросом,
+что и пересечения (ExistingLessons). Пересечения по аудитории,
+преподавателю и группе проверяются в том же проходе — с занятиями из БД
+и с уже принятыми строками файла, вместимость аудитории — по
+GroupModel.student_count (core.capacity). Отклонённые строки пишутся в отчёт
+в формате JSON Lines: {"line": N, "row": {...}, "errors": {поле: [сообщения]}}.
+"""
+import csv
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import capacity, timeslots
+from .models import Discipline, GroupModel, Lesson, Room, Teacher
+
+COLUMNS = ("group", "teacher", "discipline", "room", "start_time", "end_time")
+DEFAULT_CHUNK_SIZE = 5000
+KINDS = (("room_id", "Аудитория"), ("teacher_id", "Преподаватель"), ("group_id", "Группа"))
+
+
+def _key(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    imported: int = 0
+    rejected: int = 0
+    errors_by_field: dict = field(default_factory=lambda: defaultdict(int))
+
+
+class ScheduleImporter:
+    def __init__(
+        self, report=None, chunk_size: int = DEFAULT_CHUNK_SIZE, dry_run: bool = False, progress=None, delimiter: str = ","
+    ):
+        self.report = report
+        self.delimiter = delimiter
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.progress = progress
+        self.stats = ImportStats()
+        self.names = self._load_names()
+        # id -> (название, вместимость / число студентов) для проверки вместимости
+        self.rooms = {i: (n, c) for i, n, c in Room.objects.values_list("id", "name", "capacity")}
+        self.groups = {i: (n, c) for i, n, c in GroupModel.objects.values_list("id", "name", "student_count")}
+        self.grid = timeslots.grid()
+        # Принятые строки файла: (вид, id, дата) -> [(начало, конец, (группа, начало))]
+        self.accepted = defaultdict(list)
+        # Ключи (группа, начало) занятий из БД, которые перезапишутся принятыми строками
+        self.replaced = set()
+
+    @staticmethod
+    def _load_names() -> dict[str, dict[str, int]]:
+        teachers = {}
+        for t_id, username, first, last in Teacher.objects.values_list(
+            "id", "user__username", "user__first_name", "user__last_name"
+        ):
+            for name in (username, f"{first} {last}", f"{last} {first}"):
+                if name.strip():
+                    teachers.setdefault(_key(name), t_id)
+        return {
+            "group": {_key(n): i for i, n in GroupModel.objects.values_list("id", "name")},
+            "teacher": teachers,
+            "discipline": {_key(n): i for i, n in Discipline.objects.values_list("id", "name")},
+            "room": {_key(n): i for i, n in Room.objects.values_list("id", "name")},
+        }
+
+    def _parse_row(self, row: dict) -> tuple[dict, dict]:
+        values, errors = {}, {}
+        for column in ("group", "teacher", "discipline", "room"):
+            raw = (row.get(column) or "").strip()
+            object_id = self.names[column].get(_key(raw))
+            if object_id is None:
+                errors[f"{column}_id"] = [f"Не найдено: «{raw}»"]
+            values[f"{column}_id"] = object_id
+        for column in ("start_time", "end_time"):
+            raw = (row.get(column) or "").strip()
+            try:
+                parsed = parse_datetime(raw)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                errors[column] = [f"Неверный формат даты и времени: «{raw}»"]
+                continue
+            values[column] = timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+        if not errors and values["end_time"] <= values["start_time"]:
+            errors["end_time"] = ["Время окончания должно быть больше времени начала"]
+        if not errors:
+            error = capacity.capacity_error(*self.rooms[values["room_id"]], *self.groups[values["group_id"]])
+            if error:
+                errors["room_id"] = [error]
+        return values, errors
+
+    def _conflicts(self, values: dict, existing: "ExistingLessons") -> dict:
+        errors = {}
+        start, end = values["start_time"], values["end_time"]
+        upsert_key = (values["group_id"], start)
+        for kind, label in KINDS:
+            object_id = values[kind]
+            busy = any(
+                s < end and e > start and key != upsert_key
+                for s, e, key in self.accepted[(kind, object_id, timezone.localdate(start))]
+            ) or existing.overlaps(kind, object_id, start, end, upsert_key, self.replaced)
+            if busy:
+                errors[kind] = [
+                    f"{label} уже занят(а) в интервале "
+                    f"{timezone.localtime(start):%d.%m.%Y %H:%M} - {timezone.localtime(end):%d.%m.%Y %H:%M}"
+                ]
+        return errors
+
+    def _reject(self, line: int, row: dict, errors: dict) -> None:
+        self.stats.rejected += 1
+        for name in errors:
+            self.stats.errors_by_field[name] += 1
+        if self.report is not None:
+            self.report.write(json.dumps({"line": line, "row": row, "errors": errors}, ensure_ascii=False) + "\n")
+
+    def _flush(self, chunk: list[tuple[int, dict, dict]]) -> None:
+        existing = ExistingLessons.load([values for _line, _row, values in chunk])
+        # Ключ (группа, начало) -> занятие; повтор ключа в пачке заменяет предыдущую строку
+        lessons = {}
+        for line, row, values in chunk:
+            errors = self._conflicts(values, existing)
+            if errors:
+                self._reject(line, row, errors)
+                continue
+            upsert_key = (values["group_id"], values["start_time"])
+            self.replaced.add(upsert_key)
+            for kind, _ in KINDS:
+                self.accepted[(kind, values[kind], timezone.localdate(values["start_time"]))].append(
+                    (values["start_time"], values["end_time"], upsert_key)
+                )
+            lesson = Lesson(**values)
+            lesson.fill_week()
+            lesson.fill_slot(self.grid)
+            if upsert_key in existing.ids:
+                lesson.pk, lesson._loaded_scope = existing.ids[upsert_key]
+            lessons[upsert_key] = lesson
+            self.stats.imported += 1
+
+        if lessons and not self.dry_run:
+            updates = [lesson for lesson in lessons.values() if lesson.pk is not None]
+            creates = [lesson for lesson in lessons.values() if lesson.pk is None]
+            db = router.db_for_write(Lesson)
+            with transaction.atomic(using=db):
+                if updates:
+                    Lesson.objects.using(db).bulk_update(
+                        updates, ["teacher", "discipline", "room", "end_time", "week", "date", "slot"], batch_size=1000
+                    )
+                if creates:
+                    Lesson.objects.using(db).bulk_create(creates, batch_size=1000)
+
+    def run(self, lines) -> ImportStats:
+        reader = csv.DictReader(lines, delimiter=self.delimiter)
+        missing = [c for c in COLUMNS if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"В файле нет колонок: {', '.join(missing)}")
+
+        chunk = []
+        for row in reader:
+            self.stats.rows += 1
+            line = reader.line_num
+            values, errors = self._parse_row(row)
+            if errors:
+                self._reject(line, row, errors)
+                continue
+            chunk.append((line, row, values))
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk)
+                chunk = []
+                if self.progress:
+                    self.progress(self.stats)
+        if chunk:
+            self._flush(chunk)
+        if self.progress:
+            self.progress(self.stats)
+        return self.stats
+
+
+class ExistingLessons:
+    """
+    Занятия из БД, пересекающиеся с окном пачки, по затронутым аудиториям/преподавателям/группам.
+    ids — ключ (группа, начало) -> (id, прежние ссылки) для обновления этих занятий импортом.
+    """
+
+    def __init__(self):
+        self.by_key = defaultdict(list)
+        self.ids = {}
+
+    @classmethod
+    def load(cls, rows: list[dict]) -> "ExistingLessons":
+        existing = cls()
+        if not rows:
+            return existing
+        window_start = min(v["start_time"] for v in rows)
+        window_end = max(v["end_time"] for v in rows)
+        scope = Q()
+        for kind, _ in KINDS:
+            scope |= Q(**{f"{kind}__in": {v[kind] for v in rows}})
+        qs = Lesson.objects.filter(scope, start_time__lt=window_end, end_time__gt=window_start).values_list(
+            "id", "room_id", "teacher_id", "group_id", "start_time", "end_time"
+        ).order_by("id")
+        for lesson_id, room_id, teacher_id, group_id, start, end in qs:
+            upsert_key = (group_id, start)
+            # Если у ключа уже несколько занятий, обновляется последнее записанное
+            existing.ids[upsert_key] = (lesson_id, {"group_id": group_id, "teacher_id": teacher_id, "room_id": room_id})
+            for kind, object_id in (("room_id", room_id), ("teacher_id", teacher_id), ("group_id", group_id)):
+                existing.by_key[(kind, object_id)].append((start, end, upsert_key))
+        return existing
+
+    def overlaps(self, kind: str, object_id: int, start: datetime, end: datetime, upsert_key, replaced: set) -> bool:
+        # Занятия, которые перезапишутся строками файла (в том числе этой), — не конфликт
+        return any(
+            s < end and e > start and key != upsert_key and key not in replaced
+            for s, e, key in self.by_key.get((kind, object_id), ())
+        )
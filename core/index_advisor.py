@@ -0,0 +1,258 @@
+"""
+Советник по индексам для «горячих» запросов к занятиям.
+
+Строит канонические запросы проекта тем же кодом, что и эндпоинты
+(проверка конфликтов, свободные аудитории, by_*, недельная аналитика), на
+реальных id из текущей БД, выполняет для них EXPLAIN и разбирает план:
+какой доступ к таблице (полный просмотр или индекс), какой индекс, сколько
+строк ожидает планировщик.
+
+Для каждого запроса известен подходящий составной индекс: столбцы
+равенства, затем диапазона, например (room_id, start_time, end_time) для
+room = … AND start_time < … AND end_time > …. Достаточно индекса, который
+начинается со столбцов равенства и первого столбца диапазона (остальное
+отфильтруется по строкам таблицы); если такого нет, индекс предлагается;
+manage.py index_advisor --write-migration создаёт для предложений миграцию.
+
+Поддерживаются форматы планов PostgreSQL (EXPLAIN (FORMAT JSON)),
+MySQL/MariaDB (EXPLAIN FORMAT=JSON) и SQLite (EXPLAIN QUERY PLAN) для
+разработки.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.db import connection, migrations, models
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import GroupModel, Lesson, Room, Teacher
+from .queries import free_rooms_query, lesson_values_in_range
+
+FULL_SCANS = {"ALL", "Seq Scan", "SCAN"}
+_SQLITE_PLAN = re.compile(
+    r"\b(?P<access>SCAN|SEARCH) (?P<table>\w+)(?: AS \w+)?"
+    r"(?: USING (?:COVERING |AUTOMATIC (?:PARTIAL )?COVERING )?INDEX (?P<index>\w+)| USING (?P<pk>INTEGER PRIMARY KEY))?"
+)
+
+
+class UnsupportedBackend(Exception):
+    pass
+
+
+@dataclass
+class PlanNode:
+    table: str
+    access: str
+    index: str | None = None
+    rows: float | None = None
+
+    @property
+    def full_scan(self) -> bool:
+        return self.access in FULL_SCANS and not self.index
+
+
+@dataclass
+class CanonicalQuery:
+    name: str
+    description: str
+    queryset: object
+    # Индекс, который обслуживает запрос: столбцы равенства, затем диапазона
+    index: tuple[str, ...]
+
+
+@dataclass
+class Finding:
+    query: CanonicalQuery
+    plan: list[PlanNode]
+    covered_by: str | None
+    partial: bool = False
+    raw: str = field(repr=False, default="")
+
+    @property
+    def lesson_nodes(self) -> list[PlanNode]:
+        return [n for n in self.plan if n.table == Lesson._meta.db_table]
+
+    @property
+    def needs_index(self) -> bool:
+        return self.covered_by is None
+
+
+# ---------- Разбор планов ----------
+
+def _parse_postgresql(text: str) -> list[PlanNode]:
+    nodes = []
+
+    def walk(plan: dict):
+        if "Relation Name" in plan:
+            nodes.append(PlanNode(plan["Relation Name"], plan["Node Type"], plan.get("Index Name"), plan.get("Plan Rows")))
+        for child in plan.get("Plans", ()):
+            walk(child)
+
+    for entry in _load_json(text):
+        walk(entry["Plan"])
+    return nodes
+
+
+def _parse_mysql(text: str) -> list[PlanNode]:
+    nodes = []
+
+    def walk(value):
+        if isinstance(value, dict):
+            if "table_name" in value and "access_type" in value:
+                rows = value.get("rows_examined_per_scan", value.get("rows"))
+                nodes.append(PlanNode(value["table_name"], value["access_type"], value.get("key"),
+                                      float(rows) if rows is not None else None))
+            for child in value.values():
+                walk(child)
+        elif isinstance(value, list):
+            for child in value:
+                walk(child)
+
+    walk(_load_json(text))
+    return nodes
+
+
+def _parse_sqlite(text: str) -> list[PlanNode]:
+    nodes = []
+    for match in _SQLITE_PLAN.finditer(text):
+        index = match["index"] or ("PRIMARY KEY" if match["pk"] else None)
+        nodes.append(PlanNode(match["table"], match["access"], index))
+    return nodes
+
+
+def _load_json(text: str):
+    value = json.loads(text)
+    # MySQL отдаёт план строкой, которую Django ещё раз кодирует в JSON
+    return json.loads(value) if isinstance(value, str) else value
+
+
+PARSERS = {"postgresql": ("json", _parse_postgresql), "mysql": ("json", _parse_mysql), "sqlite": (None, _parse_sqlite)}
+
+
+def explain(queryset) -> tuple[str, list[PlanNode]]:
+    if connection.vendor not in PARSERS:
+        raise UnsupportedBackend(f"Разбор планов для {connection.vendor} не поддерживается")
+    plan_format, parse = PARSERS[connection.vendor]
+    text = queryset.explain(format=plan_format) if plan_format else queryset.explain()
+    return text, parse(text)
+
+
+# ---------- Канонические запросы ----------
+
+def canonical_queries() -> list[CanonicalQuery]:
+    """Запросы эндпоинтов на реальных id: группа/преподаватель/аудитория самого раннего занятия."""
+    sample = Lesson.objects.order_by("start_time").first()
+    if sample is not None:
+        group, teacher, room = sample.group_id, sample.teacher_id, sample.room_id
+        start, end = sample.start_time, sample.end_time
+    else:
+        group = GroupModel.objects.values_list("id", flat=True).first() or 0
+        teacher = Teacher.objects.values_list("id", flat=True).first() or 0
+        room = Room.objects.values_list("id", flat=True).first() or 0
+        start = timezone.now()
+        end = start + timedelta(minutes=90)
+    week = {"start_date": start.isoformat(), "end_date": (start + timedelta(days=7)).isoformat()}
+    overlap = Q(start_time__lt=end, end_time__gt=start)
+    _free_start, _free_end, free_rooms = free_rooms_query({"start": start.isoformat(), "end": end.isoformat()})
+
+    return [
+        CanonicalQuery("conflict_room", "Проверка конфликта: аудитория занята в интервале",
+                       Lesson.objects.filter(overlap, room=room)[:1], ("room_id", "start_time", "end_time")),
+        CanonicalQuery("conflict_teacher", "Проверка конфликта: преподаватель занят в интервале",
+                       Lesson.objects.filter(overlap, teacher=teacher)[:1], ("teacher_id", "start_time", "end_time")),
+        CanonicalQuery("conflict_group", "Проверка конфликта: группа занята в интервале",
+                       Lesson.objects.filter(overlap, group=group)[:1], ("group_id", "start_time", "end_time")),
+        CanonicalQuery("rooms_free", "Свободные аудитории (NOT EXISTS по занятиям аудитории)",
+                       free_rooms, ("room_id", "start_time", "end_time")),
+        CanonicalQuery("conflict_suggestions", "Подсказка свободных аудиторий при конфликте",
+                       Room.objects.annotate(is_busy=Exists(Lesson.objects.filter(overlap, room=OuterRef("pk"))))
+                       .filter(is_busy=False).order_by("name")[:5], ("room_id", "start_time", "end_time")),
+        CanonicalQuery("by_group", "Расписание группы за неделю",
+                       lesson_values_in_range(week, group_id=group), ("group_id", "start_time")),
+        CanonicalQuery("by_teacher", "Расписание преподавателя за неделю",
+                       lesson_values_in_range(week, teacher_id=teacher), ("teacher_id", "start_time")),
+        CanonicalQuery("by_room", "Расписание аудитории за неделю",
+                       lesson_values_in_range(week, room_id=room), ("room_id", "start_time")),
+        CanonicalQuery("week_analytics", "Занятия недели для аналитики",
+                       Lesson.objects.filter(start_time__lt=start + timedelta(days=7), end_time__gt=start)
+                       .values_list("room_id", "start_time"), ("start_time", "end_time")),
+    ]
+
+
+# ---------- Анализ ----------
+
+def existing_indexes(table: str) -> dict[str, list[str]]:
+    """Индексы таблицы в БД (включая уникальные ограничения): имя -> столбцы по порядку."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return {
+        name: info["columns"]
+        for name, info in constraints.items()
+        if (info["index"] or info["unique"] or info["primary_key"]) and info["columns"]
+    }
+
+
+def covering_index(columns: tuple[str, ...], indexes: dict[str, list[str]]) -> tuple[str | None, bool]:
+    """(имя индекса, покрывает ли он только часть столбцов) для лучшего подходящего индекса или (None, False)."""
+    partial = None
+    for name, index_columns in indexes.items():
+        if tuple(index_columns[:len(columns)]) == columns:
+            return name, False
+        # Столбцы равенства и первый столбец диапазона
+        if partial is None and len(columns) > 2 and tuple(index_columns[:2]) == columns[:2]:
+            partial = name
+    return partial, partial is not None
+
+
+def analyze() -> list[Finding]:
+    indexes = existing_indexes(Lesson._meta.db_table)
+    findings = []
+    for query in canonical_queries():
+        raw, plan = explain(query.queryset)
+        covered_by, partial = covering_index(query.index, indexes)
+        findings.append(Finding(query, plan, covered_by, partial, raw))
+    return findings
+
+
+def proposals(findings: list[Finding]) -> list[tuple[str, ...]]:
+    """Недостающие индексы; индекс, который начинается с другого предложенного, заменяет его."""
+    wanted = []
+    for finding in findings:
+        if finding.needs_index and finding.query.index not in wanted:
+            wanted.append(finding.query.index)
+    return [
+        columns for columns in wanted
+        if not any(other != columns and other[:len(columns)] == columns for other in wanted)
+    ]
+
+
+def _field_name(column: str) -> str:
+    for f in Lesson._meta.concrete_fields:
+        if f.column == column:
+            return f.name
+    raise ValueError(f"Нет поля для столбца {column}")
+
+
+def index_for(columns: tuple[str, ...]) -> models.Index:
+    fields = [_field_name(c) for c in columns]
+    name = "lesson_" + "_".join(f.split("_")[0] for f in fields) + "_idx"
+    return models.Index(fields=fields, name=name[:30])
+
+
+def write_migration(indexes: list[models.Index], directory=None) -> str:
+    """Миграция AddIndex после последней миграции приложения core; возвращает путь к файлу."""
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    leaf = loader.graph.leaf_nodes("core")[0]
+    number = int(leaf[1].split("_")[0]) + 1
+    migration = migrations.Migration(f"{number:04d}_lesson_advised_indexes", "core")
+    migration.dependencies = [leaf]
+    migration.operations = [migrations.AddIndex("lesson", index) for index in indexes]
+    writer = MigrationWriter(migration)
+    path = writer.path if directory is None else str(directory / writer.filename)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(writer.as_string())
+    return path
@@ -0,0 +1,305 @@
+"""
+Фоновые задачи на базе таблицы Job — без внешнего брокера.
+
+- enqueue() ставит задачу в очередь (API: POST /api/jobs/);
+- процессы manage.py run_workers захватывают задачи через
+  select_for_update(skip_locked=True) и выполняют обработчики;
+- обработчик получает JobContext и сообщает прогресс через ctx.progress();
+- при исключении задача возвращается в очередь с экспоненциальной
+  задержкой, пока не исчерпает max_attempts, затем помечается failed;
+- пока обработчик работает, отдельный поток раз в HEARTBEAT_INTERVAL
+  обновляет heartbeat задачи — независимо от того, сообщает ли он прогресс;
+- задачи процессов, переставших обновлять heartbeat, возвращаются в очередь
+  (зависший запуск — тоже попытка: после max_attempts задача failed);
+- итог сохраняется, только если задача всё ещё за этим обработчиком: запуск,
+  который сочли зависшим и перезапустили, не затирает результат нового.
+
+Новые виды задач регистрируются декоратором @register("kind"). Параметры
+задачи из API проверяются по сигнатуре обработчика и, если он передан,
+валидатором вида (check_params); файлы import_schedule — только внутри
+IMPORT_ROOT.
+"""
+import inspect
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics
+from .models import Job
+
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_STALE_TIMEOUT = timedelta(minutes=10)
+HEARTBEAT_INTERVAL = 60
+RETRY_BASE_DELAY = 10
+
+HANDLERS: dict[str, "callable"] = {}
+# Вид задачи -> проверка params, дополняющая проверку по сигнатуре обработчика
+VALIDATORS: dict[str, "callable"] = {}
+
+logger = logging.getLogger(__name__)
+
+
+def register(kind: str, validate=None):
+    def decorator(func):
+        HANDLERS[kind] = func
+        if validate is not None:
+            VALIDATORS[kind] = validate
+        return func
+    return decorator
+
+
+def check_params(kind: str, params) -> None:
+    """Проверяет params задачи: имена — по сигнатуре обработчика, значения — валидатором вида. ValueError при ошибке."""
+    if not isinstance(params, dict):
+        raise ValueError("params должен быть объектом")
+    accepted = dict(list(inspect.signature(HANDLERS[kind]).parameters.items())[1:])
+    unknown = sorted(set(params) - set(accepted))
+    if unknown:
+        raise ValueError(f"Неизвестные параметры: {', '.join(unknown)}")
+    missing = [name for name, p in accepted.items() if p.default is inspect.Parameter.empty and name not in params]
+    if missing:
+        raise ValueError(f"Не заданы параметры: {', '.join(missing)}")
+    if kind in VALIDATORS:
+        VALIDATORS[kind](params)
+
+
+class JobContext:
+    def __init__(self, job: Job):
+        self.job = job
+
+    def progress(self, percent: float, message: str = "") -> None:
+        """Сохраняет прогресс (0–100) и заодно обновляет heartbeat задачи."""
+        self.job.progress = max(0, min(100, int(percent)))
+        self.job.message = message[:255]
+        Job.objects.filter(pk=self.job.pk).update(
+            progress=self.job.progress, message=self.job.message, heartbeat_at=timezone.now()
+        )
+
+
+def enqueue(kind: str, params: dict | None = None, user=None, max_attempts: int = 3, run_after=None) -> Job:
+    if kind not in HANDLERS:
+        raise ValueError(f"Неизвестный вид задачи: {kind}")
+    return Job.objects.create(
+        kind=kind, params=params or {}, created_by=user, max_attempts=max_attempts, run_after=run_after or timezone.now()
+    )
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker: str) -> Job | None:
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(state=Job.QUEUED, run_after__lte=now)
+            .order_by("run_after", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.state = Job.RUNNING
+        job.worker = worker
+        job.attempts += 1
+        job.started_at = job.heartbeat_at = now
+        job.save(update_fields=["state", "worker", "attempts", "started_at", "heartbeat_at"])
+    return job
+
+
+class Heartbeat(threading.Thread):
+    """Обновляет heartbeat_at задачи, пока выполняется обработчик."""
+
+    def __init__(self, job: Job, interval: float = HEARTBEAT_INTERVAL):
+        super().__init__(name=f"job-heartbeat-{job.pk}", daemon=True)
+        self.job = job
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    _owned(self.job).update(heartbeat_at=timezone.now())
+                except DatabaseError:
+                    logger.exception("Не удалось обновить heartbeat задачи %s", self.job.pk)
+        finally:
+            # У потока своё подключение к БД
+            connections.close_all()
+
+    def __enter__(self) -> "Heartbeat":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stopped.set()
+        self.join()
+
+
+def _owned(job: Job):
+    """Строка задачи, если она всё ещё выполняется этим запуском (не возвращена в очередь и не захвачена снова)."""
+    return Job.objects.filter(pk=job.pk, state=Job.RUNNING, worker=job.worker, attempts=job.attempts)
+
+
+def _finish(job: Job, fields: list[str]) -> bool:
+    saved = _owned(job).update(**{name: getattr(job, name) for name in fields})
+    if not saved:
+        logger.warning("Задача %s больше не принадлежит обработчику %s, итог не сохранён", job.pk, job.worker)
+    return bool(saved)
+
+
+def run(job: Job) -> None:
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"Нет обработчика для задачи {job.kind}")
+        with Heartbeat(job):
+            result = handler(JobContext(job), **job.params)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts and handler is not None:
+            job.state = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.state = Job.FAILED
+            job.finished_at = timezone.now()
+        _finish(job, ["state", "error", "run_after", "finished_at"])
+        return
+    job.state = Job.DONE
+    job.progress = 100
+    job.result = result
+    job.finished_at = timezone.now()
+    _finish(job, ["state", "progress", "result", "finished_at"])
+
+
+def requeue_stale(timeout: timedelta = DEFAULT_STALE_TIMEOUT) -> int:
+    """
+    Возвращает в очередь задачи, чей процесс давно не обновлял heartbeat (упал или был убит).
+    Попытка уже засчитана при захвате: задачи, исчерпавшие max_attempts, помечаются failed,
+    чтобы задача, роняющая обработчик, не перезапускалась бесконечно.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(state=Job.RUNNING, heartbeat_at__lt=now - timeout)
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        state=Job.FAILED, worker="", finished_at=now, error="Обработчик перестал обновлять heartbeat"
+    )
+    return stale.filter(attempts__lt=F("max_attempts")).update(state=Job.QUEUED, worker="", run_after=now)
+
+
+def work(worker: str, should_stop=lambda: False, poll_interval: float = DEFAULT_POLL_INTERVAL, once: bool = False) -> int:
+    """Цикл обработчика: берёт и выполняет задачи, пока should_stop() не вернёт True."""
+    done = 0
+    while not should_stop():
+        job = claim(worker)
+        if job is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+        run(job)
+        done += 1
+        metrics.registry.maybe_flush()
+    return done
+
+
+# ---------- Обработчики ----------
+
+@register("precompute_analytics")
+def precompute_analytics(ctx: JobContext, date_from: str, date_to: str) -> dict:
+    from . import analytics
+
+    weeks = analytics.precompute(date.fromisoformat(date_from), date.fromisoformat(date_to), ctx.progress)
+    return {"weeks": weeks}
+
+
+@register("process_change_requests")
+def process_change_requests(ctx: JobContext, batch_size: int = 100) -> dict:
+    from .change_requests import process_batch
+
+    totals = {"applied": 0, "rejected": 0}
+    while True:
+        result = process_batch(batch_size)
+        if not (result["applied"] or result["rejected"]):
+            return totals
+        totals = {k: totals[k] + result[k] for k in totals}
+        ctx.progress(0, f"Применено: {totals['applied']}, отклонено: {totals['rejected']}")
+
+
+@register("compact_changelog")
+def compact_changelog(ctx: JobContext, retention_days: int | None = None) -> dict:
+    from . import changelog
+
+    return changelog.compact(retention_days)
+
+
+@register("archive_semester")
+def archive_semester(ctx: JobContext, before: str | None = None, batch_size: int = 5000) -> dict:
+    from . import archive
+
+    cutoff = timezone.make_aware(datetime.fromisoformat(before)) if before else archive.default_cutoff()
+    moved = archive.archive_lessons(
+        cutoff, batch_size=batch_size, progress=lambda total: ctx.progress(0, f"Перенесено: {total}")
+    )
+    return {"before": cutoff.isoformat(), "archived": moved}
+
+
+@register("assign_slots")
+def assign_slots(ctx: JobContext, batch_size: int = 5000) -> dict:
+    from . import timeslots
+
+    changed = timeslots.assign_slots(
+        batch_size=batch_size,
+        progress=lambda model, last_id, total: ctx.progress(0, f"{model._meta.verbose_name_plural}: id {last_id}, изменено {total}"),
+    )
+    return {"changed": changed}
+
+
+def import_path(name) -> Path:
+    """Файл внутри IMPORT_ROOT; ValueError для путей, ведущих наружу (абсолютных, с .., через ссылки)."""
+    if not isinstance(name, str) or not name:
+        raise ValueError("Путь к файлу должен быть непустой строкой")
+    root = Path(settings.IMPORT_ROOT).resolve()
+    path = (root / name).resolve()
+    if path == root or not path.is_relative_to(root):
+        raise ValueError(f"Файл {name} вне каталога импорта")
+    return path
+
+
+def _import_params(params: dict) -> None:
+    import_path(params["path"])
+    if params.get("report") is not None:
+        import_path(params["report"])
+    if not isinstance(params.get("dry_run", False), bool):
+        raise ValueError("dry_run должен быть true или false")
+
+
+@register("import_schedule", validate=_import_params)
+def import_schedule(ctx: JobContext, path: str, report: str | None = None, dry_run: bool = False) -> dict:
+    from .importer import ScheduleImporter
+
+    # Повторная проверка при запуске: задачу могли поставить в очередь не через API,
+    # а файл за время ожидания — заменить ссылкой наружу
+    source_path = import_path(path)
+    report_path = import_path(report or f"{path}.errors.jsonl")
+    with open(source_path, encoding="utf-8-sig", newline="") as source, \
+            open(report_path, "w", encoding="utf-8") as report_file:
+        importer = ScheduleImporter(
+            report=report_file,
+            dry_run=dry_run,
+            progress=lambda stats: ctx.progress(0, f"Обработано строк: {stats.rows}"),
+        )
+        stats = importer.run(source)
+    return {
+        "rows": stats.rows, "imported": stats.imported, "rejected": stats.rejected,
+        "report": str(report_path.relative_to(Path(settings.IMPORT_ROOT).resolve())),
+    }
@@ -0,0 +1,99 @@
+"""
+Быстрая сериализация занятий для эндпоинтов чтения.
+
+LessonSerializer на каждое занятие создаёт пять вложенных сериализаторов и
+проходит по полям DRF. Здесь занятия читаются через values_list() по
+столбцам из JOIN, а словари того же вида, что отдаёт LessonSerializer,
+собираются обычной функцией, которая распаковывает кортеж строки: никаких
+объектов моделей и полей DRF на каждую строку.
+
+Вид ответа обязан совпадать с LessonSerializer байт в байт — это проверяет
+тест; при изменении LessonSerializer нужно поправить LESSON_COLUMNS и _build.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Столбцы values_list() в порядке распаковки в _build
+LESSON_COLUMNS = [
+    "id",
+    "group_id", "group__name", "group__year", "group__department_id", "group__department__name",
+    "teacher_id", "teacher__user_id", "teacher__user__username", "teacher__user__first_name",
+    "teacher__user__last_name", "teacher__user__email",
+    "teacher__department_id", "teacher__department__name", "teacher__title",
+    "discipline_id", "discipline__name",
+    "room_id", "room__name", "room__capacity", "room__room_type",
+    "start_time", "end_time",
+]
+
+
+def _build(row, dt) -> dict:
+    """Строка LESSON_COLUMNS -> dict вида LessonSerializer (порядок полей как в сериализаторах)."""
+    (
+        lesson_id,
+        group_id, group_name, group_year, group_department_id, group_department_name,
+        teacher_id, user_id, username, first_name, last_name, email,
+        teacher_department_id, teacher_department_name, title,
+        discipline_id, discipline_name,
+        room_id, room_name, room_capacity, room_type,
+        start_time, end_time,
+    ) = row
+    return {
+        "id": lesson_id,
+        "group": {
+            "id": group_id,
+            "name": group_name,
+            "year": group_year,
+            "department": {"id": group_department_id, "name": group_department_name},
+        },
+        "teacher": {
+            "id": teacher_id,
+            "user": {
+                "id": user_id,
+                "username": username,
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": email,
+            },
+            "department": {"id": teacher_department_id, "name": teacher_department_name},
+            "title": title,
+        },
+        "discipline": {"id": discipline_id, "name": discipline_name},
+        "room": {"id": room_id, "name": room_name, "capacity": room_capacity, "room_type": room_type},
+        "start_time": dt(start_time),
+        "end_time": dt(end_time),
+    }
+
+
+def datetime_formatter():
+    """
+    То же, что DateTimeField.to_representation, но часовой пояс определяется
+    один раз на ответ, а не для каждого значения.
+    """
+    output_format = api_settings.DATETIME_FORMAT
+    if output_format is None:
+        return lambda value: value
+    if output_format.lower() != ISO_8601 or not settings.USE_TZ:
+        return serializers.DateTimeField().to_representation
+    tz = timezone.get_current_timezone()
+
+    def iso(value):
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+    return iso
+
+
+def lesson_values(qs):
+    """Queryset кортежей значений для build_lessons (сортировка и фильтры qs сохраняются)."""
+    return qs.values_list(*LESSON_COLUMNS)
+
+
+def build_lessons(rows) -> list[dict]:
+    """Кортежи из lesson_values() -> словари вида LessonSerializer."""
+    dt = datetime_formatter()
+    return [_build(row, dt) for row in rows]
+
+
+def lesson_rows(qs) -> list[dict]:
+    return build_lessons(lesson_values(qs))
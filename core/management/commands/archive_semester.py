@@ -0,0 +1,38 @@
+from datetime import date, datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит занятия прошедших семестров из core_lesson в архив (ArchivedLesson) пачками. "
+        "По умолчанию в рабочей таблице остаются текущий и предыдущий семестры."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", type=date.fromisoformat,
+                            help="Архивировать занятия, закончившиеся до этой даты (YYYY-MM-DD)")
+        parser.add_argument("--keep-semesters", type=int, default=archive.DEFAULT_KEEP_SEMESTERS,
+                            help="Сколько последних семестров оставить, если --before не задан")
+        parser.add_argument("--batch-size", type=int, default=archive.DEFAULT_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Только посчитать занятия для переноса")
+
+    def handle(self, *args, **options):
+        if options["before"]:
+            before = timezone.make_aware(datetime.combine(options["before"], time.min))
+        elif options["keep_semesters"] >= 1:
+            before = archive.default_cutoff(keep=options["keep_semesters"])
+        else:
+            raise CommandError("--keep-semesters должно быть не меньше 1")
+
+        moved = archive.archive_lessons(
+            before,
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+            progress=lambda total: self.stdout.write(f"  перенесено: {total}"),
+        )
+        verb = "будет перенесено" if options["dry_run"] else "перенесено в архив"
+        self.stdout.write(self.style.SUCCESS(f"Занятий до {before:%Y-%m-%d} {verb}: {moved}"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core import timeslots
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает дату и номер пары (Lesson.date, Lesson.slot) у всех занятий и архива "
+        "по текущей сетке TimeSlot. Запускайте после изменения сетки пар."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=timeslots.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        changed = timeslots.assign_slots(
+            batch_size=options["batch_size"],
+            progress=lambda model, last_id, total: self.stdout.write(
+                f"  {model._meta.verbose_name_plural}: до id {last_id}, изменено {total}"
+            ),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Сетка пар: {len(timeslots.grid())}; изменено занятий: {changed}"))
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import consistency
+
+
+class Command(BaseCommand):
+    help = (
+        "Ищет пересечения занятий по аудиториям, преподавателям и группам во всём расписании "
+        "(заметающая прямая по занятиям каждого объекта) и пишет отчёт в JSON Lines или CSV."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default="schedule_overlaps.jsonl", help="Файл отчёта")
+        parser.add_argument("--format", choices=consistency.FORMATS, default="json")
+        parser.add_argument("--kinds", default=",".join(consistency.KINDS),
+                            help="Виды объектов через запятую: room,teacher,group")
+        parser.add_argument("--processes", type=int, default=len(consistency.KINDS),
+                            help="Число процессов (по одному на вид объектов)")
+        parser.add_argument("--batch-size", type=int, default=consistency.DEFAULT_BATCH_SIZE)
+        parser.add_argument("--open-requests", metavar="USERNAME",
+                            help="Открыть от имени пользователя заявки на перенос в свободные аудитории")
+
+    def handle(self, *args, **options):
+        kinds = [k for k in options["kinds"].split(",") if k]
+        unknown = set(kinds) - set(consistency.KINDS)
+        if unknown or not kinds:
+            raise CommandError(f"Допустимые виды: {', '.join(consistency.KINDS)}")
+        user = None
+        if options["open_requests"]:
+            user = get_user_model().objects.filter(username=options["open_requests"]).first()
+            if user is None:
+                raise CommandError(f"Пользователь {options['open_requests']} не найден")
+
+        counts = consistency.check(options["output"], options["format"], kinds,
+                                   processes=options["processes"], batch_size=options["batch_size"])
+        for kind, count in counts.items():
+            self.stdout.write(f"  {kind}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересечений: {sum(counts.values())}; отчёт: {options['output']}"
+        ))
+        if user is not None:
+            opened, skipped = consistency.open_change_requests(
+                consistency.read_report(options["output"], options["format"]), user
+            )
+            self.stdout.write(f"Открыто заявок: {opened}; без свободной аудитории: {skipped}")
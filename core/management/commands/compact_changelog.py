@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core import changelog
+
+
+class Command(BaseCommand):
+    help = (
+        "Сжимает журнал изменений: удаляет записи, перекрытые более поздними, "
+        "и записи старше срока хранения (клиенты со старыми токенами получат reset)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days", type=int,
+            help=f"Срок хранения журнала (по умолчанию CHANGELOG_RETENTION_DAYS или {changelog.DEFAULT_RETENTION_DAYS})",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        result = changelog.compact(options["retention_days"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено перекрытых записей: {result['superseded']}, устаревших: {result['expired']}"
+        ))
@@ -0,0 +1,82 @@
+import time
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from core.caching import week_monday
+from core.dataset import DatasetSpec, generate
+from core.models import GroupModel, Lesson, Student, Teacher
+
+DUMP_MODELS = (
+    "auth.group", "auth.user", "core.department", "core.groupmodel", "core.teacher",
+    "core.student", "core.discipline", "core.room", "core.lesson",
+)
+DEFAULT_FIXTURE = "fixtures/dataset.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Создаёт детерминированный бесконфликтный набор данных масштаба университета "
+        "для нагрузочного тестирования и замеров производительности. "
+        "Запускайте на пустой базе (например, после manage.py flush)."
+    )
+
+    def add_arguments(self, parser):
+        defaults = DatasetSpec()
+        parser.add_argument("--departments", type=int, default=defaults.departments)
+        parser.add_argument("--groups", type=int, default=defaults.groups)
+        parser.add_argument("--teachers", type=int, default=defaults.teachers)
+        parser.add_argument("--rooms", type=int, default=defaults.rooms)
+        parser.add_argument("--weeks", type=int, default=defaults.weeks)
+        parser.add_argument("--students-per-group", type=int, default=defaults.students_per_group)
+        parser.add_argument("--lessons-per-week", type=int, default=defaults.lessons_per_week,
+                            help="Занятий в неделю у каждой группы")
+        parser.add_argument("--start", type=date.fromisoformat, default=defaults.start,
+                            help="Первый день семестра (округляется до понедельника)")
+        parser.add_argument("--seed", type=int, default=defaults.seed)
+        parser.add_argument("--password", default=defaults.password, help="Пароль всех созданных пользователей")
+        parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+        parser.add_argument("--dump", nargs="?", const=Path(DEFAULT_FIXTURE), type=Path,
+                            help=f"Сохранить набор в фикстуру (по умолчанию {DEFAULT_FIXTURE})")
+
+    def handle(self, *args, **options):
+        if min(options[name] for name in ("departments", "groups", "teachers", "rooms", "weeks")) < 1:
+            raise CommandError("Число кафедр, групп, преподавателей, аудиторий и недель должно быть положительным")
+        if any(qs.exists() for qs in (GroupModel.objects, Teacher.objects, Student.objects, Lesson.objects)):
+            raise CommandError("В базе уже есть группы, преподаватели или занятия: выполните manage.py flush или укажите пустую базу")
+
+        spec = DatasetSpec(
+            departments=options["departments"],
+            groups=options["groups"],
+            teachers=options["teachers"],
+            rooms=options["rooms"],
+            weeks=options["weeks"],
+            students_per_group=options["students_per_group"],
+            lessons_per_week=options["lessons_per_week"],
+            start=week_monday(options["start"]),
+            seed=options["seed"],
+            password=options["password"],
+            batch_size=options["batch_size"],
+        )
+        started = time.perf_counter()
+        report = generate(spec, progress=lambda phase, seconds: self.stdout.write(f"  {phase}: {seconds:.2f} с"))
+
+        self.stdout.write(", ".join(f"{name}: {count}" for name, count in report.counts.items()))
+        if report.unplaced:
+            self.stdout.write(self.style.WARNING(f"Не удалось разместить занятий в шаблонах: {report.unplaced}"))
+
+        if options["dump"]:
+            path: Path = options["dump"]
+            if not path.is_absolute():
+                path = Path(settings.BASE_DIR) / path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            dump_started = time.perf_counter()
+            call_command("dumpdata", *DUMP_MODELS, output=str(path), verbosity=0)
+            self.stdout.write(f"  Фикстура {path}: {time.perf_counter() - dump_started:.2f} с")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Набор данных создан за {time.perf_counter() - started:.1f} с (seed={spec.seed}, с {spec.start})"
+        ))
@@ -0,0 +1,52 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import DEFAULT_CHUNK_SIZE, ScheduleImporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортирует расписание из CSV (group,teacher,discipline,room,start_time,end_time) "
+        "пачками с upsert по (группа, начало) и проверкой пересечений. "
+        "Отклонённые строки пишутся в отчёт JSON Lines."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", type=Path)
+        parser.add_argument("--report", type=Path, help="Файл отчёта об ошибках (по умолчанию <file>.errors.jsonl)")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--encoding", default="utf-8-sig", help="Кодировка файла (utf-8-sig понимает BOM из Excel)")
+        parser.add_argument("--delimiter", default=",")
+        parser.add_argument("--dry-run", action="store_true", help="Только проверка, без записи в БД")
+
+    def handle(self, *args, **options):
+        path: Path = options["file"]
+        if not path.exists():
+            raise CommandError(f"Файл не найден: {path}")
+        report_path = options["report"] or path.with_name(path.name + ".errors.jsonl")
+
+        started = time.perf_counter()
+        with path.open(encoding=options["encoding"], newline="") as source, \
+                report_path.open("w", encoding="utf-8") as report:
+            importer = ScheduleImporter(
+                report=report,
+                chunk_size=options["chunk_size"],
+                dry_run=options["dry_run"],
+                progress=lambda stats: self.stdout.write(f"  обработано строк: {stats.rows}"),
+                delimiter=options["delimiter"],
+            )
+            try:
+                stats = importer.run(source)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Строк: {stats.rows}, импортировано: {stats.imported}, отклонено: {stats.rejected} "
+            f"за {elapsed:.1f} с" + (" (пробный запуск)" if options["dry_run"] else "")
+        ))
+        if stats.rejected:
+            self.stdout.write(f"Отчёт об ошибках: {report_path}")
+
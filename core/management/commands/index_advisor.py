@@ -0,0 +1,52 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import index_advisor
+from core.index_advisor import UnsupportedBackend
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет EXPLAIN для канонических запросов к занятиям (конфликты, свободные аудитории, by_*), "
+        "показывает полные просмотры и оценки строк и предлагает составные индексы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--plans", action="store_true", help="Печатать планы целиком")
+        parser.add_argument("--write-migration", action="store_true",
+                            help="Создать миграцию AddIndex для предложенных индексов")
+        parser.add_argument("--migrations-dir", type=Path, help="Каталог для миграции (по умолчанию core/migrations)")
+
+    def handle(self, *args, **options):
+        try:
+            findings = index_advisor.analyze()
+        except UnsupportedBackend as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"БД: {connection.vendor}, таблица {index_advisor.Lesson._meta.db_table}\n")
+        for finding in findings:
+            nodes = finding.lesson_nodes or finding.plan
+            access = ", ".join(
+                f"{n.access}{f' [{n.index}]' if n.index else ''}{f' ~{n.rows:.0f} строк' if n.rows is not None else ''}"
+                for n in nodes
+            )
+            style = self.style.WARNING if any(n.full_scan for n in nodes) or finding.needs_index else self.style.SUCCESS
+            self.stdout.write(style(f"{finding.query.name:22} {access}"))
+            self.stdout.write(f"{'':22} {finding.query.description}; "
+                              f"индекс ({', '.join(finding.query.index)}): {finding.covered_by or 'нет'}"
+                              f"{' (частично)' if finding.partial else ''}")
+            if options["plans"]:
+                self.stdout.write(finding.raw)
+
+        proposed = [index_advisor.index_for(columns) for columns in index_advisor.proposals(findings)]
+        if not proposed:
+            self.stdout.write(self.style.SUCCESS("\nВсе канонические запросы обслуживаются существующими индексами"))
+            return
+        self.stdout.write("\nПредлагаемые индексы (добавьте в Lesson.Meta.indexes):")
+        for index in proposed:
+            self.stdout.write(f'    models.Index(fields={index.fields!r}, name="{index.name}"),')
+        if options["write_migration"]:
+            path = index_advisor.write_migration(proposed, options["migrations_dir"])
+            self.stdout.write(self.style.SUCCESS(f"Миграция: {path}"))
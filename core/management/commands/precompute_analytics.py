@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import analytics
+from core.caching import week_monday
+
+
+class Command(BaseCommand):
+    help = (
+        "Заранее строит недельную аналитику (тепловые карты, загрузку аудиторий, "
+        "нагрузку преподавателей) и кладёт её в кэш. Имеет смысл при общем кэше "
+        "(CACHES с файловым/внешним бэкендом), который видят все воркеры."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date-from", type=date.fromisoformat, help="Начало периода (по умолчанию — текущая неделя)")
+        parser.add_argument("--date-to", type=date.fromisoformat, help="Конец периода (по умолчанию — date-from + 6 дней)")
+
+    def handle(self, *args, **options):
+        date_from = options["date_from"] or week_monday(timezone.localdate())
+        date_to = options["date_to"] or date_from + timedelta(days=6)
+        if date_from > date_to:
+            raise CommandError("--date-from должна быть не позже --date-to")
+
+        weeks = analytics.precompute(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f"Аналитика подготовлена для {weeks} недель ({date_from} — {date_to})"))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.change_requests import DEFAULT_BATCH_SIZE, process_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Обрабатывает заявки на изменение расписания пачками. Несколько процессов "
+        "могут работать одновременно: заявки захватываются через SELECT ... SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--loop", action="store_true", help="Работать постоянно, ожидая новые заявки")
+        parser.add_argument("--interval", type=float, default=5.0, help="Пауза между опросами в режиме --loop, сек")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                result = process_batch(options["batch_size"])
+                if result["applied"] or result["rejected"]:
+                    self.stdout.write(f"Применено: {result['applied']}, отклонено: {result['rejected']}")
+                    continue
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS("Очередь заявок обработана"))
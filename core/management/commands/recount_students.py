@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import capacity
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет число студентов групп (GroupModel.student_count) с таблицей студентов. "
+        "Запускайте после массовых изменений студентов в обход моделей (SQL, QuerySet.update)."
+    )
+
+    def handle(self, *args, **options):
+        fixed = capacity.recount()
+        self.stdout.write(self.style.SUCCESS(f"Исправлено групп: {fixed}"))
@@ -0,0 +1,67 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+
+def _worker_main(stop_event, poll_interval: float) -> None:
+    # Процесс запускается через spawn (работает и на Windows), поэтому Django настраиваем заново
+    import django
+
+    django.setup()
+    from core import jobs
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    jobs.work(jobs.worker_name(), should_stop=stop_event.is_set, poll_interval=poll_interval)
+
+
+class Command(BaseCommand):
+    help = (
+        "Запускает пул процессов, выполняющих фоновые задачи (модель Job). "
+        "Очередь хранится в базе проекта, внешний брокер не нужен."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=2, help="Число процессов-обработчиков")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Пауза при пустой очереди, сек")
+        parser.add_argument("--once", action="store_true", help="Выполнить задачи из очереди в текущем процессе и выйти")
+
+    def handle(self, *args, **options):
+        from django.db import connections
+        from core import jobs
+
+        if options["once"]:
+            jobs.requeue_stale()
+            done = jobs.work(jobs.worker_name(), once=True)
+            self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {done}"))
+            return
+
+        connections.close_all()
+        ctx = multiprocessing.get_context("spawn")
+        stop_event = ctx.Event()
+        processes = []
+        for _ in range(options["concurrency"]):
+            process = ctx.Process(target=_worker_main, args=(stop_event, options["poll_interval"]), daemon=True)
+            process.start()
+            processes.append(process)
+        self.stdout.write(f"Запущено обработчиков: {len(processes)}")
+
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+        try:
+            while not stop_event.is_set():
+                jobs.requeue_stale()
+                # Перезапускаем упавшие процессы
+                for i, process in enumerate(processes):
+                    if not process.is_alive():
+                        processes[i] = ctx.Process(
+                            target=_worker_main, args=(stop_event, options["poll_interval"]), daemon=True
+                        )
+                        processes[i].start()
+                time.sleep(options["poll_interval"] * 5)
+        except KeyboardInterrupt:
+            stop_event.set()
+        self.stdout.write("Ожидание завершения текущих задач...")
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS("Обработчики остановлены"))
@@ -0,0 +1,354 @@
+"""
+Метрики приложения в текстовом формате Prometheus (GET /metrics), без внешних зависимостей.
+
+Каждый процесс копит счётчики и гистограммы в памяти. Если задана настройка
+METRICS_DIR (переменная окружения DJANGO_METRICS_DIR), процесс раз в
+METRICS_FLUSH_INTERVAL секунд сбрасывает свои значения в файл <pid>-<uuid>.json
+этого каталога, а /metrics суммирует файлы всех процессов — так метрики
+нескольких воркеров gunicorn/uvicorn и run_workers агрегируются в один ответ.
+uuid в имени не даёт новому процессу с тем же pid затереть файл завершившегося.
+Файл завершившегося процесса (на POSIX — pid не существует) при сборке
+забирает себе собравший процесс: значения добавляются к его собственным,
+так что суммы не уменьшаются, а каталог не растёт.
+
+Без METRICS_DIR /metrics показывает только процесс, принявший запрос.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _alive(pid: int) -> bool:
+    if os.name != "posix":
+        # Без дешёвой проверки процесса файлы не забираются
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, "Metric"] = {}
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+        # Значения завершившихся процессов, забранные этим процессом
+        self.inherited: dict[str, dict[tuple, object]] = {}
+        self._instance: tuple[int, str] | None = None
+
+    @property
+    def instance(self) -> str:
+        """Имя файла процесса без расширения; после fork — новое."""
+        pid = os.getpid()
+        if self._instance is None or self._instance[0] != pid:
+            self._instance = (pid, f"{pid}-{uuid.uuid4().hex[:12]}")
+        return self._instance[1]
+
+    def forked(self) -> None:
+        # Забранные значения остаются за родителем, иначе они посчитаются дважды
+        self.inherited = {}
+
+    def register(self, metric: "Metric") -> "Metric":
+        self.metrics[metric.name] = metric
+        return metric
+
+    def collect(self) -> dict:
+        with self.lock:
+            totals = {name: {key: _copy(value) for key, value in metric.values.items()}
+                      for name, metric in self.metrics.items()}
+            for name, values in self.inherited.items():
+                for key, value in values.items():
+                    totals[name][key] = _merge(totals[name].get(key), value)
+        return totals
+
+    @property
+    def directory(self) -> Path | None:
+        path = getattr(settings, "METRICS_DIR", None)
+        return Path(path) if path else None
+
+    def flush(self) -> None:
+        """Сбрасывает значения процесса в <METRICS_DIR>/<pid>-<uuid>.json (атомарно, через rename)."""
+        directory = self.directory
+        if directory is None:
+            return
+        self.last_flush = time.monotonic()
+        data = {name: [[list(key), value] for key, value in values.items()]
+                for name, values in self.collect().items()}
+        directory.mkdir(parents=True, exist_ok=True)
+        target = directory / f"{self.instance}.json"
+        tmp = target.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, target)
+
+    def maybe_flush(self) -> None:
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)
+        if self.directory is not None and time.monotonic() - self.last_flush >= interval:
+            self.flush()
+
+    def aggregate(self) -> dict:
+        """Значения всех процессов: файлы METRICS_DIR плюс текущие значения этого процесса."""
+        totals = self.collect()
+        directory = self.directory
+        if directory is None or not directory.exists():
+            return totals
+        own = f"{self.instance}.json"
+        for path in directory.glob("*.json"):
+            if path.name == own:
+                continue
+            pid = path.stem.split("-")[0]
+            if pid.isdigit() and not _alive(int(pid)):
+                data = self._adopt(path)
+            else:
+                try:
+                    data = json.loads(path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    data = None
+            if not data:
+                continue
+            for name, entries in data.items():
+                if name not in self.metrics:
+                    continue
+                values = totals.setdefault(name, {})
+                for key, value in entries:
+                    key = tuple(key)
+                    values[key] = _merge(values.get(key), value)
+        return totals
+
+    def _adopt(self, path: Path) -> dict | None:
+        """
+        Забирает значения завершившегося процесса: rename атомарен, файл
+        достаётся одному сборщику. Возвращает забранные значения — в этой
+        сборке они ещё не учтены в collect().
+        """
+        claimed = path.with_name(f"{path.stem}.{self.instance}.adopted")
+        try:
+            os.rename(path, claimed)
+            data = json.loads(claimed.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            claimed.unlink(missing_ok=True)
+            return None
+        with self.lock:
+            for name, entries in data.items():
+                if name not in self.metrics:
+                    continue
+                values = self.inherited.setdefault(name, {})
+                for key, value in entries:
+                    values[tuple(key)] = _merge(values.get(tuple(key)), value)
+        # Сначала свой файл с забранными значениями, затем удаление — суммы не проседают
+        self.flush()
+        claimed.unlink(missing_ok=True)
+        return data
+
+    def render(self) -> str:
+        totals = self.aggregate()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for key, value in sorted(totals.get(name, {}).items()):
+                lines.extend(metric.render(key, value))
+        return "\n".join(lines) + "\n"
+
+
+def _copy(value):
+    return list(value) if isinstance(value, list) else value
+
+
+def _merge(current, value):
+    if current is None:
+        return _copy(value)
+    if isinstance(value, list):
+        return [a + b for a, b in zip(current, value)]
+    return current + value
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, key: tuple, le: str | None = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, key)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: dict[tuple, object] = {}
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self, key: tuple, value) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"]
+
+
+class Histogram(Metric):
+    """Значение — [счётчики по корзинам..., сумма, число наблюдений]."""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, amount: float, **labels) -> None:
+        key = self._key(labels)
+        with registry.lock:
+            value = self.values.get(key)
+            if value is None:
+                value = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    value[i] += 1
+                    break
+            value[-2] += amount
+            value[-1] += 1
+
+    def render(self, key: tuple, value) -> list[str]:
+        lines, cumulative = [], 0
+        for bound, hits in zip(self.buckets, value):
+            cumulative += hits
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, _number(bound))} {cumulative}")
+        lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, '+Inf')} {value[-1]}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(value[-2])}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {value[-1]}")
+        return lines
+
+
+registry = Registry()
+atexit.register(registry.flush)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry.forked)
+
+requests_total = Counter(
+    "schedule_http_requests_total", "Число HTTP-запросов по маршрутам", ("route", "method", "status")
+)
+request_duration = Histogram(
+    "schedule_http_request_duration_seconds", "Время обработки запроса", ("route", "method")
+)
+response_size = Histogram(
+    "schedule_http_response_size_bytes", "Размер тела ответа", ("route",), buckets=SIZE_BUCKETS
+)
+db_queries_total = Counter("schedule_db_queries_total", "Число SQL-запросов по маршрутам", ("route",))
+db_duration_total = Counter(
+    "schedule_db_query_duration_seconds_total", "Суммарное время SQL-запросов по маршрутам", ("route",)
+)
+cache_requests_total = Counter(
+    "schedule_cache_requests_total", "Обращения к кэшу производных данных расписания", ("prefix", "result")
+)
+conflict_checks_total = Counter(
+    "schedule_conflict_checks_total", "Проверки пересечений занятий при сохранении", ("outcome",)
+)
+conflicts_total = Counter("schedule_conflicts_total", "Найденные пересечения по видам", ("kind",))
+permission_checks_total = Counter(
+    "schedule_permission_checks_total", "Проверки прав доступа", ("permission", "result")
+)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Считает запросы, задержку, размер ответа и SQL по маршрутам (имя URL, для ViewSet — действие).
+
+    Поддерживает async-цепочку, чтобы не переводить асинхронные представления
+    в поток; SQL там не считается — асинхронный ORM выполняет запросы в других потоках.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        queries = _QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def _acall(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - started, None)
+        return response
+
+    @staticmethod
+    def _record(request, response, duration: float, queries: _QueryCounter | None) -> None:
+        match = getattr(request, "resolver_match", None)
+        route = (match.view_name or match.route) if match else "unmatched"
+        requests_total.inc(route=route, method=request.method, status=response.status_code)
+        request_duration.observe(duration, route=route, method=request.method)
+        if not response.streaming:
+            response_size.observe(len(response.content), route=route)
+        if queries is not None:
+            db_queries_total.inc(queries.count, route=route)
+            db_duration_total.inc(queries.duration, route=route)
+        registry.maybe_flush()
+
+
+def metrics_view(request):
+    """GET /metrics. Если задан METRICS_TOKEN, нужен заголовок Authorization: Bearer <token>."""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and request.headers.get("Authorization", "") != f"Bearer {token}":
+        return HttpResponseForbidden("Нет доступа")
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-19 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_changelog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='changelog',
+            name='action',
+            field=models.CharField(choices=[('created', 'Создание'), ('updated', 'Изменение'), ('deleted', 'Удаление'), ('reset', 'Полная синхронизация'), ('compacted', 'Сжатие журнала')], max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['group_id', 'id'], name='core_change_group_i_ef9f05_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['model', 'object_id'], name='core_change_model_6dda55_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['created_at'], name='core_change_created_1da5d6_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 11:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_changelog_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changerequest',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='changerequest',
+            name='result',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='changerequest',
+            name='state',
+            field=models.CharField(choices=[('new', 'Новая'), ('done', 'Обработана'), ('rejected', 'Отклонена')], default='new', max_length=8),
+        ),
+        migrations.AddIndex(
+            model_name='changerequest',
+            index=models.Index(fields=['state', 'created_at'], name='core_change_state_af3e7a_idx'),
+        ),
+    ]
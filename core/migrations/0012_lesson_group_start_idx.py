@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-19 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['group', 'start_time'], name='lesson_group_start_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-19 12:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_lesson_group_start_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedLesson',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('week', models.PositiveIntegerField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('discipline', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_lessons', to='core.discipline')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_lessons', to='core.groupmodel')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_lessons', to='core.room')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_lessons', to='core.teacher')),
+            ],
+            options={
+                'verbose_name': 'Архивное занятие',
+                'verbose_name_plural': 'Архив занятий',
+                'indexes': [models.Index(fields=['start_time'], name='core_archiv_start_t_57dfea_idx'), models.Index(fields=['end_time'], name='core_archiv_end_tim_2512fd_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-19 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_archivedlesson'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['room', 'start_time', 'end_time'], name='lesson_room_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['teacher', 'start_time', 'end_time'], name='lesson_teacher_start_end_idx'),
+        ),
+    ]
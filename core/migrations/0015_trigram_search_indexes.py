@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# GIN-индексы pg_trgm для icontains (UPPER(col) LIKE UPPER('%…%')) — только на PostgreSQL
+TRIGRAM_INDEXES = [
+    ("core_groupmodel", "name"),
+    ("core_room", "name"),
+    ("core_discipline", "name"),
+    ("core_department", "name"),
+    ("auth_user", "username"),
+    ("auth_user", "first_name"),
+    ("auth_user", "last_name"),
+]
+
+
+def _index_name(table: str, column: str) -> str:
+    return f"{table}_{column}_trgm"
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{_index_name(table, column)}" '
+            f'ON "{table}" USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{_index_name(table, column)}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_lesson_advised_indexes"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.0.6 on 2026-10-19 12:36
+
+from collections import defaultdict
+from datetime import time
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Пары, как в create_test_data.py и core.dataset
+PAIRS = [
+    (1, time(8, 30), time(10, 0)),
+    (2, time(10, 20), time(11, 50)),
+    (3, time(12, 10), time(13, 40)),
+    (4, time(14, 0), time(15, 30)),
+    (5, time(15, 50), time(17, 20)),
+    (6, time(17, 30), time(19, 0)),
+]
+BATCH_SIZE = 5000
+
+
+def seed_pairs(apps, schema_editor):
+    TimeSlot = apps.get_model("core", "TimeSlot")
+    db = schema_editor.connection.alias
+    TimeSlot.objects.using(db).bulk_create([TimeSlot(number=n, start=s, end=e) for n, s, e in PAIRS])
+
+
+def fill_dates_and_slots(apps, schema_editor):
+    db = schema_editor.connection.alias
+    by_time = {(s, e): n for n, s, e in PAIRS}
+    for name in ("Lesson", "ArchivedLesson"):
+        model = apps.get_model("core", name)
+        last_id = 0
+        while True:
+            rows = list(model.objects.using(db).filter(id__gt=last_id).order_by("id")
+                        .only("id", "start_time", "end_time")[:BATCH_SIZE])
+            if not rows:
+                break
+            last_id = rows[-1].id
+            # Одно UPDATE … WHERE id IN (…) на пару (дата, номер пары) вместо CASE по каждой строке
+            ids = defaultdict(list)
+            for row in rows:
+                start, end = timezone.localtime(row.start_time), timezone.localtime(row.end_time)
+                slot = by_time.get((start.time(), end.time())) if end.date() == start.date() else None
+                ids[(start.date(), slot)].append(row.id)
+            for (day, slot), group in ids.items():
+                model.objects.using(db).filter(id__in=group).update(date=day, slot=slot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField(unique=True)),
+                ('start', models.TimeField()),
+                ('end', models.TimeField()),
+            ],
+            options={
+                'verbose_name': 'Пара',
+                'verbose_name_plural': 'Сетка пар',
+                'ordering': ['number'],
+            },
+        ),
+        migrations.AddField(
+            model_name='archivedlesson',
+            name='date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedlesson',
+            name='slot',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='slot',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='timeslot',
+            constraint=models.CheckConstraint(check=models.Q(('end__gt', models.F('start'))), name='timeslot_time_order'),
+        ),
+        migrations.RunPython(seed_pairs, migrations.RunPython.noop),
+        migrations.RunPython(fill_dates_and_slots, migrations.RunPython.noop),
+    ]
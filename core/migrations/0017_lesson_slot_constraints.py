@@ -0,0 +1,47 @@
+# Уникальные индексы пар — отдельной миграцией, после заполнения date/slot
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def release_double_bookings(apps, schema_editor):
+    """
+    Двойные бронирования, уже записанные в таблицу, не дают создать индексы:
+    у всех занятий пары, кроме первого записанного, номер пары обнуляется.
+    Сами занятия остаются — они проверяются пересечением интервалов, как
+    занятия вне сетки, и попадают в отчёт manage.py check_schedule.
+    """
+    db = schema_editor.connection.alias
+    Lesson = apps.get_model("core", "Lesson")
+    for field in ("room", "teacher", "group"):
+        duplicates = (
+            Lesson.objects.using(db).filter(slot__isnull=False).order_by()
+            .values(field, "date", "slot").annotate(n=Count("id"), keep=Min("id")).filter(n__gt=1)
+        )
+        for row in duplicates:
+            Lesson.objects.using(db).filter(
+                **{field: row[field], "date": row["date"], "slot": row["slot"]}
+            ).exclude(id=row["keep"]).update(slot=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_timeslot_lesson_slot'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('room', 'date', 'slot'), name='lesson_room_slot_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('teacher', 'date', 'slot'), name='lesson_teacher_slot_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('group', 'date', 'slot'), name='lesson_group_slot_unique'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-19 12:50
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_student_count(apps, schema_editor):
+    db = schema_editor.connection.alias
+    GroupModel = apps.get_model("core", "GroupModel")
+    Student = apps.get_model("core", "Student")
+    sizes = (
+        Student.objects.using(db).filter(group=OuterRef("pk")).order_by()
+        .values("group").annotate(n=Count("id")).values("n")
+    )
+    GroupModel.objects.using(db).update(student_count=Coalesce(Subquery(sizes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_lesson_slot_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupmodel',
+            name='student_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_student_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.6 on 2026-10-19 13:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_group_student_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('lesson_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+            ],
+            options={
+                'verbose_name': 'Неделя снимка',
+                'verbose_name_plural': 'Недели снимков',
+            },
+        ),
+        migrations.CreateModel(
+            name='ScheduleSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=191)),
+                ('date_from', models.DateField()),
+                ('date_to', models.DateField()),
+                ('lesson_count', models.PositiveIntegerField(default=0)),
+                ('digest', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='snapshots', to='core.department')),
+            ],
+            options={
+                'verbose_name': 'Снимок расписания',
+                'verbose_name_plural': 'Снимки расписания',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotWeek',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('monday', models.DateField()),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.snapshotblob')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weeks', to='core.schedulesnapshot')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotweek',
+            constraint=models.UniqueConstraint(fields=('snapshot', 'monday'), name='snapshot_week_unique'),
+        ),
+    ]
@@ -1,9 +1,62 @@
 from django.conf import settings
 from django.contrib.auth.models import Group
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, router, transaction
+from django.utils import timezone
 
 
-class Department(models.Model):
+class ChangeLoggedQuerySet(models.QuerySet):
+    """
+    Массовые операции, которые пишут журнал изменений в той же транзакции.
+
+    bulk_create/bulk_update/update не вызывают сигналы post_save, поэтому
+    журнал для них заполняется здесь (см. core.changelog).
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from . import changelog
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            action = ChangeLog.UPDATED if kwargs.get("update_conflicts") else ChangeLog.CREATED
+            changelog.record_bulk(self.model, objs, action, using=self.db)
+        return objs
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        from . import changelog
+
+        objs = list(objs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            updated = super().bulk_update(objs, fields, batch_size=batch_size)
+            changelog.record_bulk(self.model, objs, ChangeLog.UPDATED, using=self.db, previous=True)
+        return updated
+
+    def update(self, **kwargs):
+        from . import changelog
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            previous = changelog.scope_snapshot(self)
+            updated = super().update(**kwargs)
+            changed = self.model._base_manager.using(self.db).filter(pk__in=list(previous))
+            changelog.record_bulk(self.model, changed, ChangeLog.UPDATED, using=self.db, previous=previous)
+        return updated
+
+
+class ChangeLoggedModel(models.Model):
+    """Сохранение и запись в журнал изменений (сигнал post_save) выполняются в одной транзакции."""
+
+    objects = ChangeLoggedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class Department(ChangeLoggedModel):
     name = models.CharField(max_length=191, unique=True)
 
     class Meta:
@@ -14,10 +67,12 @@ class Department(models.Model):
         return self.name
 
 
-class GroupModel(models.Model):
+class GroupModel(ChangeLoggedModel):
     name = models.CharField(max_length=50, unique=True)
     department = models.ForeignKey(Department, on_delete=models.PROTECT, related_name="groups")
     year = models.PositiveIntegerField()
+    # Число студентов: поддерживается сигналами Student и core.capacity.recount()
+    student_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name = "Группа"
@@ -26,8 +81,17 @@ class GroupModel(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Счётчик меняют только UPDATE … F() из core.capacity: сохранение загруженной
+        # раньше группы не должно перезаписать его устаревшим значением
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name != "student_count"
+            ]
+        super().save(*args, **kwargs)
+
 
-class Teacher(models.Model):
+class Teacher(ChangeLoggedModel):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="teacher")
     department = models.ForeignKey(Department, on_delete=models.PROTECT, related_name="teachers")
     title = models.CharField(max_length=255, blank=True)
@@ -56,7 +120,7 @@ class Student(models.Model):
         return self.user.get_full_name() or self.user.username
 
 
-class Discipline(models.Model):
+class Discipline(ChangeLoggedModel):
     name = models.CharField(max_length=191, unique=True)
 
     class Meta:
@@ -67,7 +131,7 @@ class Discipline(models.Model):
         return self.name
 
 
-class Room(models.Model):
+class Room(ChangeLoggedModel):
     LECTURE = "lecture"
     LAB = "lab"
     ROOM_TYPES = [(LECTURE, "Лекционная"), (LAB, "Лабораторная")]
@@ -84,7 +148,38 @@ class Room(models.Model):
         return self.name
 
 
-class Lesson(models.Model):
+class TimeSlot(models.Model):
+    """
+    Сетка пар (08:30–10:00, 10:20–11:50, …). Занятие, которое совпадает с парой,
+    хранит её номер в Lesson.slot (см. core.timeslots); после изменения сетки
+    номера у существующих занятий пересчитывает manage.py assign_slots.
+    """
+    number = models.PositiveSmallIntegerField(unique=True)
+    start = models.TimeField()
+    end = models.TimeField()
+
+    class Meta:
+        verbose_name = "Пара"
+        verbose_name_plural = "Сетка пар"
+        ordering = ["number"]
+        constraints = [
+            models.CheckConstraint(check=models.Q(end__gt=models.F("start")), name="timeslot_time_order"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.number} пара ({self.start:%H:%M}–{self.end:%H:%M})"
+
+    def clean(self):
+        if self.start is None or self.end is None:
+            return
+        if self.end <= self.start:
+            raise ValidationError({"end": "Время окончания должно быть больше времени начала"})
+        overlapping = TimeSlot.objects.exclude(pk=self.pk).filter(start__lt=self.end, end__gt=self.start).first()
+        if overlapping is not None:
+            raise ValidationError(f"Пара пересекается с парой {overlapping}")
+
+
+class Lesson(ChangeLoggedModel):
     group = models.ForeignKey(GroupModel, on_delete=models.PROTECT, related_name="lessons")
     teacher = models.ForeignKey(Teacher, on_delete=models.PROTECT, related_name="lessons")
     discipline = models.ForeignKey(Discipline, on_delete=models.PROTECT, related_name="lessons")
@@ -93,6 +188,9 @@ class Lesson(models.Model):
     end_time = models.DateTimeField()
 
     week = models.PositiveIntegerField(null=True, blank=True)
+    # Местная дата начала и номер пары по сетке TimeSlot; slot пуст у занятий вне сетки
+    date = models.DateField(null=True, blank=True, editable=False)
+    slot = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
 
 
     class Meta:
@@ -104,35 +202,252 @@ class Lesson(models.Model):
             models.Index(fields=["room"]),
 
             models.Index(fields=["week"]),
-
+            # Проверка конфликтов и by_room/by_teacher: равенство, затем диапазон (manage.py index_advisor)
+            models.Index(fields=["room", "start_time", "end_time"], name="lesson_room_start_end_idx"),
+            models.Index(fields=["teacher", "start_time", "end_time"], name="lesson_teacher_start_end_idx"),
+            # Поиск занятия группы по времени начала (обновление при импорте, by_group)
+            models.Index(fields=["group", "start_time"], name="lesson_group_start_idx"),
         ]
         constraints = [
             models.CheckConstraint(check=models.Q(end_time__gt=models.F("start_time")), name="lesson_time_order"),
+            # Конфликт в паре — равенство (аудитория/преподаватель/группа, дата, пара)
+            models.UniqueConstraint(fields=["room", "date", "slot"], name="lesson_room_slot_unique"),
+            models.UniqueConstraint(fields=["teacher", "date", "slot"], name="lesson_teacher_slot_unique"),
+            models.UniqueConstraint(fields=["group", "date", "slot"], name="lesson_group_slot_unique"),
         ]
 
     def __str__(self) -> str:
         return f"{self.discipline} {self.group} {self.start_time:%Y-%m-%d %H:%M}"
 
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем исходное время начала, чтобы при переносе занятия
+        # сбросить кэш и старой, и новой недели
+        instance._loaded_start_time = instance.__dict__.get("start_time")
+        # и исходные группу/преподавателя/аудиторию — чтобы журнал изменений
+        # уведомил прежних подписчиков о переносе занятия
+        instance._loaded_scope = {
+            name: instance.__dict__.get(name) for name in ("group_id", "teacher_id", "room_id")
+        }
+        return instance
+
+    def fill_week(self) -> None:
         # Автозаполняем номер недели, если не задан
         if self.start_time and not self.week:
             self.week = self.start_time.isocalendar().week
+
+    def fill_slot(self, grid=None) -> None:
+        # Дата и пара всегда выводятся из времени начала и окончания (сетка — core.timeslots)
+        from . import timeslots
+
+        if self.start_time and self.end_time:
+            self.date, self.slot = (grid if grid is not None else timeslots.grid()).date_and_slot(self.start_time, self.end_time)
+
+    def clean(self):
+        # date и slot не редактируются в формах, поэтому ModelForm не проверяет по ним
+        # уникальные индексы пары — без этой проверки админка получила бы IntegrityError
+        self.fill_slot()
+        if self.slot is None:
+            return
+        scope = {"room": self.room_id, "teacher": self.teacher_id, "group": self.group_id}
+        taken = Lesson.objects.exclude(pk=self.pk).filter(
+            models.Q(room_id=self.room_id) | models.Q(teacher_id=self.teacher_id) | models.Q(group_id=self.group_id),
+            date=self.date, slot=self.slot,
+        ).values_list("room_id", "teacher_id", "group_id")
+        labels = {"room": "Аудитория уже занята", "teacher": "Преподаватель уже ведёт занятие", "group": "Группа уже занята"}
+        errors = {}
+        for row in taken:
+            for (field, object_id), other_id in zip(scope.items(), row):
+                if object_id is not None and object_id == other_id:
+                    errors[field] = f"{labels[field]} в {self.slot}-й паре {self.date:%d.%m.%Y}"
+        if errors:
+            raise ValidationError(errors)
+
+    def save(self, *args, **kwargs):
+        self.fill_week()
+        self.fill_slot()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"start_time", "end_time"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "date", "slot"}
         super().save(*args, **kwargs)
 
 
+class ArchivedLesson(models.Model):
+    """
+    Занятия прошедших семестров, перенесённые командой archive_semester (см. core.archive).
+
+    Поля и id те же, что у Lesson; таблица только дополняется и читается
+    эндпоинтами расписания, когда запрошенный период заходит в архив.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    group = models.ForeignKey(GroupModel, on_delete=models.PROTECT, related_name="archived_lessons")
+    teacher = models.ForeignKey(Teacher, on_delete=models.PROTECT, related_name="archived_lessons")
+    discipline = models.ForeignKey(Discipline, on_delete=models.PROTECT, related_name="archived_lessons")
+    room = models.ForeignKey(Room, on_delete=models.PROTECT, related_name="archived_lessons")
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    week = models.PositiveIntegerField(null=True, blank=True)
+    date = models.DateField(null=True, blank=True)
+    slot = models.PositiveSmallIntegerField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Архивное занятие"
+        verbose_name_plural = "Архив занятий"
+        indexes = [
+            models.Index(fields=["start_time"]),
+            # Граница архива: Max(end_time)
+            models.Index(fields=["end_time"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.discipline} {self.group} {self.start_time:%Y-%m-%d %H:%M} (архив)"
+
+
 class ChangeRequest(models.Model):
+    """
+    Заявка на изменение расписания, обрабатывается командой process_change_requests.
+
+    payload: {"action": "create" | "update" | "delete", "lesson_id": <для update/delete>,
+              "lesson": {"group_id", "teacher_id", "discipline_id", "room_id", "start_time", "end_time"}}
+    """
     NEW = "new"
     DONE = "done"
-    STATES = [(NEW, "Новая"), (DONE, "Обработана")]
+    REJECTED = "rejected"
+    STATES = [(NEW, "Новая"), (DONE, "Обработана"), (REJECTED, "Отклонена")]
 
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     payload = models.JSONField()
     state = models.CharField(max_length=8, choices=STATES, default=NEW)
     created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    # {"lesson_id": ...} для применённой заявки, {"errors": {поле: [сообщения]}} для отклонённой
+    result = models.JSONField(null=True, blank=True)
 
     class Meta:
         verbose_name = "Заявка на изменение"
         verbose_name_plural = "Заявки на изменения"
+        indexes = [
+            models.Index(fields=["state", "created_at"]),
+        ]
+
+
+class ChangeLog(models.Model):
+    """Журнал изменений расписания (только добавление), источник ленты событий."""
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    # Массовая операция без известных id (bulk_create на MySQL): клиенту нужна полная синхронизация модели
+    RESET = "reset"
+    # Служебная запись: журнал до object_id включительно удалён при сжатии
+    COMPACTED = "compacted"
+    ACTIONS = [
+        (CREATED, "Создание"),
+        (UPDATED, "Изменение"),
+        (DELETED, "Удаление"),
+        (RESET, "Полная синхронизация"),
+        (COMPACTED, "Сжатие журнала"),
+    ]
+
+    model = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=16, choices=ACTIONS)
+    # Денормализованные ссылки для фильтрации подписок (объект мог быть уже удалён)
+    group_id = models.BigIntegerField(null=True, blank=True)
+    teacher_id = models.BigIntegerField(null=True, blank=True)
+    room_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Запись журнала изменений"
+        verbose_name_plural = "Журнал изменений"
+        indexes = [
+            models.Index(fields=["group_id", "id"]),
+            models.Index(fields=["model", "object_id"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+
+class Job(models.Model):
+    """Фоновая задача, выполняется процессами manage.py run_workers (см. core.jobs)."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATES = [(QUEUED, "В очереди"), (RUNNING, "Выполняется"), (DONE, "Выполнена"), (FAILED, "Ошибка")]
+
+    kind = models.CharField(max_length=64)
+    params = models.JSONField(default=dict, blank=True)
+    state = models.CharField(max_length=8, choices=STATES, default=QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    worker = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            models.Index(fields=["state", "run_after"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.pk}"
+
+
+class SnapshotBlob(models.Model):
+    """Занятия одной недели снимка в упакованном виде; ключ — SHA-256 содержимого (см. core.snapshots)."""
+    digest = models.CharField(max_length=64, primary_key=True)
+    lesson_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        verbose_name = "Неделя снимка"
+        verbose_name_plural = "Недели снимков"
+
+
+class ScheduleSnapshot(models.Model):
+    """Опубликованная версия расписания: занятия кафедры (или всех) за период, по неделям."""
+    name = models.CharField(max_length=191)
+    department = models.ForeignKey(Department, null=True, blank=True, on_delete=models.PROTECT,
+                                   related_name="snapshots")
+    date_from = models.DateField()
+    date_to = models.DateField()
+    lesson_count = models.PositiveIntegerField(default=0)
+    # Хеш списка (неделя, хеш недели): у одинаковых снимков совпадает
+    digest = models.CharField(max_length=64, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Снимок расписания"
+        verbose_name_plural = "Снимки расписания"
+        ordering = ["-created_at", "-id"]
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class SnapshotWeek(models.Model):
+    snapshot = models.ForeignKey(ScheduleSnapshot, on_delete=models.CASCADE, related_name="weeks")
+    monday = models.DateField()
+    blob = models.ForeignKey(SnapshotBlob, on_delete=models.PROTECT, related_name="+")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["snapshot", "monday"], name="snapshot_week_unique"),
+        ]
 
 
 def ensure_default_groups() -> None:
@@ -1,15 +1,35 @@
+from django.conf import settings
 from rest_framework.permissions import BasePermission, SAFE_METHODS
+from . import metrics
 from .models import Lesson, Teacher
 
 
+def _checked(permission: str, allowed: bool) -> bool:
+    metrics.permission_checks_total.inc(permission=permission, result="allow" if allowed else "deny")
+    return allowed
+
+
 class IsAdminDB(BasePermission):
     def has_permission(self, request, view) -> bool:
-        return bool(request.user and request.user.is_authenticated and request.user.groups.filter(name="ADMIN_DB").exists())
+        return _checked("IsAdminDB", bool(
+            request.user and request.user.is_authenticated and request.user.groups.filter(name="ADMIN_DB").exists()
+        ))
 
 
 class IsTeacher(BasePermission):
     def has_permission(self, request, view) -> bool:
-        return bool(request.user and request.user.is_authenticated and request.user.groups.filter(name="TEACHER").exists())
+        return _checked("IsTeacher", bool(
+            request.user and request.user.is_authenticated and request.user.groups.filter(name="TEACHER").exists()
+        ))
+
+
+class IsAuthenticatedOrKiosk(BasePermission):
+    """Пользователь или табло с ?token=, совпадающим с GRID_KIOSK_TOKEN (если он задан)."""
+
+    def has_permission(self, request, view) -> bool:
+        token = getattr(settings, "GRID_KIOSK_TOKEN", "")
+        kiosk = bool(token) and request.query_params.get("token") == token
+        return _checked("IsAuthenticatedOrKiosk", kiosk or bool(request.user and request.user.is_authenticated))
 
 
 class LessonPermission(BasePermission):
@@ -22,13 +42,16 @@ class LessonPermission(BasePermission):
 
     def has_permission(self, request, view) -> bool:
         if request.method in SAFE_METHODS:
-            return request.user.is_authenticated
+            return _checked("LessonPermission", request.user.is_authenticated)
         if IsAdminDB().has_permission(request, view):
-            return True
+            return _checked("LessonPermission", True)
         # teachers can modify via object-level check
-        return IsTeacher().has_permission(request, view)
+        return _checked("LessonPermission", IsTeacher().has_permission(request, view))
 
     def has_object_permission(self, request, view, obj: Lesson) -> bool:
+        return _checked("LessonPermission.object", self._object_allowed(request, view, obj))
+
+    def _object_allowed(self, request, view, obj: Lesson) -> bool:
         if request.method in SAFE_METHODS:
             return True
         if IsAdminDB().has_permission(request, view):
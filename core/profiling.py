@@ -0,0 +1,152 @@
+"""
+Профилирование запросов: заголовок Server-Timing и выборка детальных профилей.
+
+Включается настройкой PROFILING_ENABLED (переменная окружения DJANGO_PROFILING=1).
+Когда профилирование выключено, ProfilingMiddleware отказывается от участия
+(MiddlewareNotUsed) и не попадает в цепочку обработки — накладных расходов нет.
+
+Для каждого запроса считаются:
+- db — время и число SQL-запросов (connection.execute_wrapper на всех БД;
+  чтение строк результата драйвером сюда не входит);
+- ser — сериализация DRF (serializer.data) без времени SQL внутри неё;
+- render — рендеринг ответа DRF (JSON);
+- app — полное время обработки.
+
+Часть запросов (PROFILING_SAMPLE_RATE, а также все медленнее PROFILING_SLOW_MS)
+сохраняется с разбивкой по SQL в кольцевой буфер процесса; его отдаёт
+эндпоинт /api/profiling/requests/ (только ADMIN_DB).
+"""
+import random
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from itertools import count
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+DEFAULT_SAMPLE_RATE = 0.01
+DEFAULT_SLOW_MS = 500
+DEFAULT_BUFFER_SIZE = 200
+SQL_PREVIEW_LENGTH = 1000
+
+_current: ContextVar["RequestProfile | None"] = ContextVar("request_profile", default=None)
+_ids = count(1)
+buffer: deque = deque(maxlen=getattr(settings, "PROFILING_BUFFER_SIZE", DEFAULT_BUFFER_SIZE))
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.ser_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+        self.queries: list[tuple[str, str, float]] = []
+        self.in_serializer = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка connection.execute_wrapper: время каждого SQL-запроса."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.db_time += duration
+            self.queries.append((context["connection"].alias, sql, duration))
+
+    def server_timing(self, total: float) -> str:
+        return ", ".join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{len(self.queries)} queries"',
+            f"queries;desc={len(self.queries)}",
+            f"ser;dur={self.ser_time * 1000:.1f}",
+            f"render;dur={self.render_time * 1000:.1f}",
+            f"app;dur={total * 1000:.1f}",
+        ))
+
+    def snapshot(self, request, response, total: float) -> dict:
+        repeated = Counter(sql for _alias, sql, _d in self.queries)
+        return {
+            "id": next(_ids),
+            "time": timezone.now().isoformat(),
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 2),
+            "db_ms": round(self.db_time * 1000, 2),
+            "ser_ms": round(self.ser_time * 1000, 2),
+            "render_ms": round(self.render_time * 1000, 2),
+            "query_count": len(self.queries),
+            # Один и тот же SQL много раз за запрос — типичный признак N+1
+            "repeated_queries": [{"sql": sql[:SQL_PREVIEW_LENGTH], "count": n} for sql, n in repeated.items() if n > 1],
+            "queries": [
+                {"db": alias, "sql": sql[:SQL_PREVIEW_LENGTH], "ms": round(duration * 1000, 3)}
+                for alias, sql, duration in self.queries
+            ],
+        }
+
+
+def _instrument_serializers() -> None:
+    """Засекает время serializer.data верхнего уровня (вложенные сериализаторы его не вызывают)."""
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data
+    if getattr(original, "profiled", False):
+        return
+
+    def data(self):
+        profile = _current.get()
+        if profile is None or profile.in_serializer:
+            return original.fget(self)
+        profile.in_serializer = True
+        started, db_before = time.perf_counter(), profile.db_time
+        try:
+            return original.fget(self)
+        finally:
+            profile.in_serializer = False
+            profile.ser_time += (time.perf_counter() - started) - (profile.db_time - db_before)
+
+    BaseSerializer.data = property(data)
+    BaseSerializer.data.fget.profiled = True
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", DEFAULT_SAMPLE_RATE)
+        self.slow_ms = getattr(settings, "PROFILING_SLOW_MS", DEFAULT_SLOW_MS)
+        _instrument_serializers()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        total = time.perf_counter() - profile.started
+        response["Server-Timing"] = profile.server_timing(total)
+        if total * 1000 >= self.slow_ms or random.random() < self.sample_rate:
+            buffer.append(profile.snapshot(request, response, total))
+        return response
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся после этого хука, время до post-render колбэка — это render
+        profile = _current.get()
+        if profile is not None:
+            profile.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: _finish_render(profile))
+        return response
+
+
+def _finish_render(profile: RequestProfile) -> None:
+    profile.render_time += time.perf_counter() - profile.render_started
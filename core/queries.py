@@ -0,0 +1,133 @@
+"""
+Разбор параметров и построение запросов, общие для синхронных (DRF)
+и асинхронных (core.async_views) эндпоинтов чтения расписания.
+"""
+from datetime import datetime
+
+from django.db.models import Exists, OuterRef, Subquery
+from rest_framework import status
+
+from . import timeslots
+from .archive import with_archive
+from .lesson_rows import lesson_values
+from .models import GroupModel, Lesson, Room
+
+# Всё, что читают вложенные сериализаторы LessonSerializer, — одним JOIN
+LESSON_RELATED = ("group__department", "teacher__user", "teacher__department", "discipline", "room")
+
+
+class QueryParamError(Exception):
+    def __init__(self, detail: str, status_code: int = status.HTTP_400_BAD_REQUEST):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def parse_datetime_param(value: str, name: str, example: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise QueryParamError(f"Неверный формат {name}. Используйте ISO format (например: {example})")
+
+
+def lesson_values_in_range(params, **filters):
+    """
+    Занятия по фильтрам и start_date/end_date в виде кортежей lesson_values(),
+    по времени начала (для by_group/by_teacher/by_room). Если период заходит
+    в архив прошлых семестров, архивные занятия добавляются к результату.
+    """
+    start_date_str = params.get("start_date")
+    end_date_str = params.get("end_date")
+    start = end = None
+    if start_date_str:
+        start = parse_datetime_param(start_date_str, "start_date", "2024-01-01T00:00:00")
+        filters["start_time__gte"] = start
+    if end_date_str:
+        end = parse_datetime_param(end_date_str, "end_date", "2024-01-01T23:59:59")
+        filters["end_time__lte"] = end
+    return with_archive(lambda model: lesson_values(model.objects.filter(**filters)), since=start).order_by("start_time")
+
+
+def free_rooms_query(params, grid: timeslots.Grid | None = None):
+    """
+    Разбор параметров поиска свободных аудиторий: (start, end, queryset).
+    grid — сетка пар, уже прочитанная async-представлением (timeslots.agrid).
+    """
+    start_str = params.get("start")
+    end_str = params.get("end")
+    room_type = params.get("type")
+    capacity = params.get("capacity")
+
+    if not start_str or not end_str:
+        raise QueryParamError("Параметры start и end обязательны (ISO format datetime)")
+
+    start = parse_datetime_param(start_str, "start", "2024-01-01T09:00:00")
+    end = parse_datetime_param(end_str, "end", "2024-01-01T10:30:00")
+
+    # Валидация временного диапазона
+    if start >= end:
+        raise QueryParamError("Время начала должно быть меньше времени окончания")
+
+    # Аудитория занята, если есть занятие, которое пересекается с запрашиваемым временем
+    # (для интервала-пары — занятие в той же паре или вне сетки)
+    busy_qs = Lesson.objects.filter(room=OuterRef("pk")).filter(
+        timeslots.busy_q(start, end, *(grid if grid is not None else timeslots.grid()).date_and_slot(start, end))
+    )
+
+    qs = Room.objects.all()
+
+    if room_type:
+        if room_type not in [Room.LECTURE, Room.LAB]:
+            raise QueryParamError(f"Тип аудитории должен быть '{Room.LECTURE}' или '{Room.LAB}'")
+        qs = qs.filter(room_type=room_type)
+
+    if capacity:
+        try:
+            min_capacity = int(capacity)
+        except ValueError:
+            raise QueryParamError("Параметр capacity должен быть числом")
+        if min_capacity <= 0:
+            raise QueryParamError("Вместимость должна быть положительным числом")
+        qs = qs.filter(capacity__gte=min_capacity)
+
+    # Аудитории, где помещается группа: число студентов хранится в группе (core.capacity).
+    # Подзапрос, а не чтение группы здесь: queryset остаётся ленивым и для async-представлений
+    for_group = params.get("for_group")
+    if for_group:
+        try:
+            group_id = int(for_group)
+        except ValueError:
+            raise QueryParamError("Параметр for_group должен быть числом")
+        qs = qs.filter(capacity__gte=Subquery(GroupModel.objects.filter(pk=group_id).values("student_count")))
+
+    # Исключаем занятые аудитории, сортируем по имени
+    qs = qs.annotate(is_busy=Exists(busy_qs)).filter(is_busy=False).order_by("name")
+    return start, end, qs
+
+
+def user_role(groups: list[str]) -> str:
+    if 'ADMIN_DB' in groups:
+        return 'ADMIN_DB'
+    if 'TEACHER' in groups:
+        return 'TEACHER'
+    return 'STUDENT'
+
+
+def current_user_payload(user, groups: list[str], teacher, student, disciplines) -> dict:
+    """Ответ /api/auth/me/ по уже загруженным данным."""
+    data = {
+        'id': user.id,
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'email': user.email,
+        'groups': groups,
+        'role': user_role(groups),
+        'teacher_id': teacher.id if teacher else None,
+        'student_id': student.id if student else None,
+    }
+    if teacher:
+        data['teacher_department_id'] = teacher.department.id
+        data['teacher_department_name'] = teacher.department.name
+        data['teacher_disciplines'] = [{'id': d_id, 'name': name} for d_id, name in disciplines]
+    return data
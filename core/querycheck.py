@@ -0,0 +1,172 @@
+"""
+Обнаружение N+1 и повторяющихся SQL-запросов.
+
+Каждый запрос к БД сводится к «отпечатку»: литералы и параметры заменяются
+на ?, списки IN (...) схлопываются. Если за один HTTP-запрос один и тот же
+отпечаток выполняется QUERY_DETECTOR_THRESHOLD раз и больше (или одинаковый
+SQL с одинаковыми параметрами — дважды), это почти всегда N+1 в цикле или
+лишний повторный запрос вроде qs.count() после выборки.
+
+- RepeatedQueriesMiddleware включается настройкой QUERY_DETECTOR_ENABLED
+  (по умолчанию равна DEBUG) и пишет предупреждение в лог core.querycheck
+  со стеком вызовов внутри проекта; при QUERY_DETECTOR_RAISE=True
+  выбрасывает RepeatedQueriesError — так тест падает на лишних запросах;
+- QueryDetectorMixin для тестов включает этот режим, а
+  assertNoRepeatedQueries() проверяет произвольный блок кода.
+"""
+import logging
+import re
+import traceback
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.test.utils import override_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 3
+STACK_DEPTH = 6
+SAMPLE_STACKS = 3
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s|NULL)\s*,?)+\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+class RepeatedQueriesError(AssertionError):
+    pass
+
+
+def fingerprint(sql: str) -> str:
+    """SQL без конкретных значений: одинаковые по форме запросы дают одинаковый отпечаток."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def _project_stack() -> list[str]:
+    """Кадры стека из кода проекта (без Django, DRF и этого модуля)."""
+    base = str(Path(settings.BASE_DIR))
+    frames = [
+        f"{Path(frame.filename).relative_to(base)}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base) and "site-packages" not in frame.filename
+        and not frame.filename.endswith("querycheck.py")
+    ]
+    return frames[-STACK_DEPTH:]
+
+
+@dataclass
+class RepeatedQuery:
+    fingerprint: str
+    count: int
+    identical: bool
+    sample: str
+    stacks: list[list[str]] = field(default_factory=list)
+
+    def describe(self) -> str:
+        kind = "одинаковых" if self.identical else "похожих"
+        lines = [f"{self.count} {kind} запросов: {self.sample[:300]}"]
+        for stack in self.stacks:
+            lines.append("    " + " <- ".join(reversed(stack)))
+        return "\n".join(lines)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.by_fingerprint: dict[str, list] = defaultdict(list)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.by_fingerprint[fingerprint(sql)].append((sql, repr(params), _project_stack()))
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def repeated(self, threshold: int = DEFAULT_THRESHOLD) -> list[RepeatedQuery]:
+        found = []
+        for key, calls in self.by_fingerprint.items():
+            identical = len({(sql, params) for sql, params, _stack in calls}) < len(calls)
+            if len(calls) < threshold and not identical:
+                continue
+            stacks = []
+            for _sql, _params, stack in calls:
+                if stack and stack not in stacks:
+                    stacks.append(stack)
+            found.append(RepeatedQuery(key, len(calls), identical, calls[0][0], stacks[:SAMPLE_STACKS]))
+        return found
+
+
+def _report(where: str, repeated: list[RepeatedQuery], raise_error: bool) -> None:
+    message = f"Повторяющиеся SQL-запросы в {where}:\n" + "\n".join(r.describe() for r in repeated)
+    if raise_error:
+        raise RepeatedQueriesError(message)
+    logger.warning(message)
+
+
+class RepeatedQueriesMiddleware:
+    """
+    Поддерживает и sync, и async цепочку: иначе под ASGI каждый запрос к
+    async-представлениям и SSE-ленте выполнялся бы через поток. В async-запросах
+    SQL не проверяется — асинхронный ORM выполняет запросы в других потоках,
+    и обёртки соединений этого потока их не видят.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_DETECTOR_ENABLED", settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        with recorder.capture():
+            response = self.get_response(request)
+        repeated = recorder.repeated(getattr(settings, "QUERY_DETECTOR_THRESHOLD", DEFAULT_THRESHOLD))
+        if repeated:
+            response["X-Repeated-Queries"] = str(len(repeated))
+            _report(f"{request.method} {request.path}", repeated, getattr(settings, "QUERY_DETECTOR_RAISE", False))
+        return response
+
+
+class QueryDetectorMixin:
+    """
+    Для TestCase: каждый запрос тестового клиента проверяется детектором,
+    повторяющиеся запросы роняют тест с указанием мест в коде.
+    """
+    query_threshold = DEFAULT_THRESHOLD
+
+    def setUp(self):
+        # До super().setUp(): middleware загружается при первом запросе клиента
+        detector = override_settings(
+            QUERY_DETECTOR_ENABLED=True, QUERY_DETECTOR_RAISE=True, QUERY_DETECTOR_THRESHOLD=self.query_threshold
+        )
+        detector.enable()
+        self.addCleanup(detector.disable)
+        super().setUp()
+
+    @contextmanager
+    def assertNoRepeatedQueries(self, threshold: int | None = None):
+        recorder = QueryRecorder()
+        with recorder.capture():
+            yield recorder
+        repeated = recorder.repeated(threshold or self.query_threshold)
+        if repeated:
+            _report("блоке теста", repeated, raise_error=True)
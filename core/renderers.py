@@ -0,0 +1,68 @@
+"""
+Быстрый JSON-рендерер для DRF.
+
+Ответы расписания — большие однообразные массивы с кириллицей. Рендерер
+кодирует их через orjson, если он установлен, иначе через stdlib json в
+самом компактном виде: без отступов, с разделителями "," и ":" и
+ensure_ascii=False (кириллическая буква — 2 байта UTF-8 вместо 6 на \\uXXXX).
+
+Бэкенд выбирается ключом REST_FRAMEWORK["JSON_BACKEND"]: "auto" (orjson,
+если установлен), "orjson" или "json". Значения, которые orjson не знает
+(даты, Decimal, ленивые строки), кодируются тем же JSONEncoder, что и в
+DRF, поэтому ответ не зависит от бэкенда. Запрошенные отступы
+(Accept: application/json; indent=2) обрабатывает стандартный JSONRenderer.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"), allow_nan=not api_settings.STRICT_JSON)
+
+
+def _escape_separators(data: str) -> str:
+    # Как в DRF: U+2028/U+2029 допустимы в JSON, но ломают встраивание в JavaScript
+    return data.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+def _json_dumps(data) -> bytes:
+    return _escape_separators(_encoder.encode(data)).encode()
+
+
+def _orjson_dumps(data) -> bytes:
+    result = orjson.dumps(data, default=_encoder.default,
+                          option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+    if b"\xe2\x80\xa8" in result or b"\xe2\x80\xa9" in result:
+        return _escape_separators(result.decode()).encode()
+    return result
+
+
+def json_backend() -> str:
+    name = getattr(settings, "REST_FRAMEWORK", {}).get("JSON_BACKEND", "auto")
+    if name == "auto":
+        return "orjson" if orjson is not None else "json"
+    if name == "orjson" and orjson is None:
+        raise ImproperlyConfigured('REST_FRAMEWORK["JSON_BACKEND"] = "orjson", но пакет orjson не установлен')
+    if name not in ("orjson", "json"):
+        raise ImproperlyConfigured(f'Неизвестный REST_FRAMEWORK["JSON_BACKEND"]: {name!r}')
+    return name
+
+
+def dumps(data) -> bytes:
+    """Компактный JSON в UTF-8 выбранным бэкендом."""
+    return _orjson_dumps(data) if json_backend() == "orjson" else _json_dumps(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
@@ -0,0 +1,97 @@
+"""
+Чтение с реплик БД.
+
+Реплики перечислены в настройке DATABASE_REPLICAS (алиасы из DATABASES).
+На реплику уходят только чтения внутри безопасных HTTP-запросов
+(GET/HEAD/OPTIONS): списки, by_*, rooms/free и т.п. Всё остальное идёт на
+основную БД:
+
+- записи и всё, что выполняется в изменяющих запросах, в том числе проверка
+  конфликтов по времени — она должна видеть последние данные;
+- select_for_update() и get_or_create() — Django сам отправляет их в db_for_write;
+- фоновые задачи, команды управления и shell — вне запроса реплика не используется.
+
+После успешного изменяющего запроса клиент получает cookie на
+REPLICA_PIN_SECONDS секунд, и его чтения тоже идут на основную БД: иначе из-за
+задержки репликации он мог бы не увидеть только что сделанные изменения.
+
+Соединения постоянные (CONN_MAX_AGE) и проверяются перед повторным
+использованием (CONN_HEALTH_CHECKS) — см. DATABASES в settings.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = "db_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_alias: ContextVar[str | None] = ContextVar("read_alias", default=None)
+
+
+def replicas() -> list[str]:
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+@contextmanager
+def read_from_replica(alias: str | None = None):
+    """Чтения в блоке идут на реплику (указанную или случайную), если они настроены."""
+    alias = alias or (random.choice(replicas()) if replicas() else None)
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _use_replica(request) -> bool:
+        return bool(replicas()) and request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+
+    @staticmethod
+    def _pin(request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(PIN_COOKIE, "1", max_age=getattr(settings, "REPLICA_PIN_SECONDS", 10),
+                                httponly=True, samesite="Lax")
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        if not self._use_replica(request):
+            return self._pin(request, self.get_response(request))
+        with read_from_replica():
+            return self.get_response(request)
+
+    async def _acall(self, request):
+        if not self._use_replica(request):
+            return self._pin(request, await self.get_response(request))
+        with read_from_replica():
+            return await self.get_response(request)
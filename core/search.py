@@ -0,0 +1,226 @@
+"""
+Поиск по мере ввода (typeahead) по группам, преподавателям, аудиториям и дисциплинам.
+
+Индекс держится в памяти процесса — это несколько тысяч коротких имён:
+
+- отсортированный список ключей (каждое слово имени и имя целиком) для
+  поиска по префиксу двоичным поиском;
+- триграммы -> записи для поиска подстроки в середине слова («101» в «А-101»).
+
+Имена сравниваются после casefold() и замены «ё» на «е», так что
+«ИВТ», «ивт» и «Ивт» равнозначны. Порядок выдачи: сначала совпадение
+с началом имени, затем с началом слова, затем подстрока; внутри — короче
+и по алфавиту.
+
+Индекс строится при первом поиске и обновляется по сигналам моделей после
+коммита транзакции. Другие процессы узнают об изменениях справочников по
+глобальной версии расписания (core.caching) и перестраивают индекс целиком.
+
+На PostgreSQL миграция 0015 добавляет GIN-индексы pg_trgm, которые
+ускоряют icontains в админке и фильтрах.
+"""
+import re
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .caching import get_schedule_version
+from .models import Discipline, GroupModel, Room, Teacher
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    return text.casefold().replace("ё", "е")
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass(frozen=True)
+class Entry:
+    type: str
+    id: int
+    name: str
+    # Нормализованный текст для поиска (имя и, например, логин преподавателя)
+    text: str
+
+    @property
+    def key(self) -> tuple[str, int]:
+        return self.type, self.id
+
+    def as_dict(self) -> dict:
+        return {"type": self.type, "id": self.id, "name": self.name}
+
+
+def _teacher_entry(teacher: Teacher) -> Entry:
+    user = teacher.user
+    name = user.get_full_name() or user.username
+    return Entry("teacher", teacher.id, name, normalize(f"{name} {user.username}"))
+
+
+def _named_entry(type_: str, obj) -> Entry:
+    return Entry(type_, obj.id, obj.name, normalize(obj.name))
+
+
+# Тип -> (модель, загрузка всех записей, запись по объекту)
+SOURCES = {
+    "group": (GroupModel, lambda: GroupModel.objects.only("id", "name"), lambda o: _named_entry("group", o)),
+    "teacher": (Teacher, lambda: Teacher.objects.select_related("user"), _teacher_entry),
+    "room": (Room, lambda: Room.objects.only("id", "name"), lambda o: _named_entry("room", o)),
+    "discipline": (Discipline, lambda: Discipline.objects.only("id", "name"), lambda o: _named_entry("discipline", o)),
+}
+TYPES = tuple(SOURCES)
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries: dict[tuple[str, int], Entry] = {}
+        self._prefixes: list[tuple[str, str, int]] = []
+        self._trigrams: dict[str, set[tuple[str, int]]] = {}
+
+    # ---------- Построение и обновление ----------
+
+    def _add(self, entry: Entry, keep_sorted: bool = True) -> None:
+        self._entries[entry.key] = entry
+        for word in {entry.text, *_WORD.findall(entry.text)}:
+            item = (word, *entry.key)
+            if not keep_sorted:
+                self._prefixes.append(item)
+                continue
+            position = bisect_left(self._prefixes, item)
+            if position == len(self._prefixes) or self._prefixes[position] != item:
+                self._prefixes.insert(position, item)
+        for trigram in _trigrams(entry.text):
+            self._trigrams.setdefault(trigram, set()).add(entry.key)
+
+    def _remove(self, key: tuple[str, int]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for word in {entry.text, *_WORD.findall(entry.text)}:
+            position = bisect_left(self._prefixes, (word, *key))
+            if position < len(self._prefixes) and self._prefixes[position] == (word, *key):
+                del self._prefixes[position]
+        for trigram in _trigrams(entry.text):
+            keys = self._trigrams.get(trigram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._trigrams[trigram]
+
+    def rebuild(self) -> None:
+        version = get_schedule_version()
+        entries = [make(obj) for _model, load, make in SOURCES.values() for obj in load()]
+        with self._lock:
+            self._entries, self._prefixes, self._trigrams = {}, [], {}
+            for entry in entries:
+                self._add(entry, keep_sorted=False)
+            self._prefixes.sort()
+            self._version = version
+
+    def update(self, entry: Entry | None, key: tuple[str, int]) -> None:
+        """Замена (entry) или удаление (entry=None) одной записи."""
+        with self._lock:
+            if self._version is None:
+                return
+            self._remove(key)
+            if entry is not None:
+                self._add(entry)
+            # Своё изменение уже учтено — перестраивать индекс из-за новой версии не нужно
+            self._version = get_schedule_version()
+
+    def _ensure_fresh(self) -> None:
+        if self._version != get_schedule_version():
+            self.rebuild()
+
+    # ---------- Поиск ----------
+
+    def _prefix_keys(self, word: str) -> set[tuple[str, int]]:
+        found = set()
+        position = bisect_left(self._prefixes, (word,))
+        while position < len(self._prefixes) and self._prefixes[position][0].startswith(word):
+            found.add(self._prefixes[position][1:])
+            position += 1
+        return found
+
+    def _substring_keys(self, word: str) -> set[tuple[str, int]]:
+        if len(word) < 3:
+            return {key for key, entry in self._entries.items() if word in entry.text}
+        keys = None
+        for trigram in _trigrams(word):
+            keys = set(self._trigrams.get(trigram, ())) if keys is None else keys & self._trigrams.get(trigram, set())
+            if not keys:
+                return set()
+        return {key for key in keys if word in self._entries[key].text}
+
+    def search(self, query: str, types=TYPES, limit: int = DEFAULT_LIMIT) -> list[Entry]:
+        words = _WORD.findall(normalize(query))
+        if not words:
+            return []
+        self._ensure_fresh()
+        query_text = " ".join(words)
+        with self._lock:
+            # Кандидаты — по самому длинному слову запроса; остальные слова проверяются подстрокой
+            anchor = max(words, key=len)
+            keys = {key for key in self._prefix_keys(anchor) if key[0] in types}
+            if len(keys) < limit:
+                keys |= {key for key in self._substring_keys(anchor) if key[0] in types}
+            matches = []
+            for key in keys:
+                entry = self._entries[key]
+                if not all(w in entry.text for w in words):
+                    continue
+                if entry.text.startswith(query_text):
+                    rank = 0
+                elif any(word.startswith(words[0]) for word in _WORD.findall(entry.text)):
+                    rank = 1
+                else:
+                    rank = 2
+                matches.append((rank, len(entry.name), entry.name, entry))
+        matches.sort(key=lambda m: m[:3])
+        return [m[3] for m in matches[:limit]]
+
+
+index = SearchIndex()
+
+
+def _on_commit_update(type_: str, instance_id: int, make=None, instance=None) -> None:
+    key = (type_, instance_id)
+    transaction.on_commit(lambda: index.update(make(instance) if make else None, key))
+
+
+def _saved(sender, instance, **kwargs):
+    for type_, (model, _load, make) in SOURCES.items():
+        if sender is model:
+            _on_commit_update(type_, instance.id, make, instance)
+
+
+def _deleted(sender, instance, **kwargs):
+    for type_, (model, _load, _make) in SOURCES.items():
+        if sender is model:
+            _on_commit_update(type_, instance.id)
+
+
+def _user_saved(sender, instance, update_fields=None, **kwargs):
+    # Имя преподавателя хранится в пользователе; вход (update_fields=["last_login"]) его не меняет
+    if update_fields is not None and not {"first_name", "last_name", "username"} & set(update_fields):
+        return
+    teacher = Teacher.objects.filter(user=instance).select_related("user").first()
+    if teacher is not None:
+        _on_commit_update("teacher", teacher.id, _teacher_entry, teacher)
+
+
+for _model, _load, _make in SOURCES.values():
+    post_save.connect(_saved, sender=_model, dispatch_uid=f"search_save_{_model.__name__}")
+    post_delete.connect(_deleted, sender=_model, dispatch_uid=f"search_delete_{_model.__name__}")
+post_save.connect(_user_saved, sender=get_user_model(), dispatch_uid="search_save_user")
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User, Group
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from .models import Department, GroupModel, Teacher, Student, Discipline, Room, Lesson
+from . import capacity, snapshots
+from .models import Department, GroupModel, Teacher, Student, Discipline, Room, Lesson, Job, ScheduleSnapshot
 
 
 class DepartmentSerializer(serializers.ModelSerializer):
@@ -118,4 +120,94 @@ class LessonSerializer(serializers.ModelSerializer):
             "room_id",
             "start_time",
             "end_time",
-        ]
\ No newline at end of file
+        ]
+
+    def validate(self, attrs):
+        # Вместимость — по уже загруженным аудитории и группе, без подсчёта студентов
+        if "room" in attrs or "group" in attrs:
+            room = attrs.get("room") or self.instance.room
+            group = attrs.get("group") or self.instance.group
+            error = capacity.capacity_error(room.name, room.capacity, group.name, group.student_count)
+            if error:
+                raise serializers.ValidationError({"room_id": [error]})
+        return attrs
+
+    def _save_in_slot(self, save, *args):
+        # Уникальные индексы (аудитория/преподаватель/группа, дата, пара) — последняя
+        # защита от двух одновременных записей в одну пару
+        try:
+            with transaction.atomic():
+                return save(*args)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {"start_time": ["В этой паре аудитория, преподаватель или группа уже заняты."]}
+            )
+
+    def create(self, validated_data):
+        return self._save_in_slot(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._save_in_slot(super().update, instance, validated_data)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    kind = serializers.CharField()
+
+    class Meta:
+        model = Job
+        fields = [
+            "id", "kind", "params", "state", "progress", "message", "result", "error",
+            "attempts", "max_attempts", "created_at", "started_at", "finished_at",
+        ]
+        read_only_fields = [
+            "state", "progress", "message", "result", "error", "attempts",
+            "created_at", "started_at", "finished_at",
+        ]
+
+    def validate_kind(self, value):
+        from .jobs import HANDLERS
+
+        if value not in HANDLERS:
+            raise serializers.ValidationError(f"Допустимые значения: {', '.join(sorted(HANDLERS))}")
+        return value
+
+    def validate(self, attrs):
+        from .jobs import check_params
+
+        attrs.setdefault("params", {})
+        try:
+            check_params(attrs["kind"], attrs["params"])
+        except ValueError as exc:
+            raise serializers.ValidationError({"params": [str(exc)]})
+        return attrs
+
+
+class ScheduleSnapshotSerializer(serializers.ModelSerializer):
+    department_id = serializers.PrimaryKeyRelatedField(
+        queryset=Department.objects.all(), source="department", required=False, allow_null=True
+    )
+    # Любой день семестра вместо date_from/date_to (см. core.snapshots.semester_bounds)
+    semester = serializers.DateField(write_only=True, required=False)
+
+    class Meta:
+        model = ScheduleSnapshot
+        fields = ["id", "name", "department_id", "date_from", "date_to", "semester", "lesson_count", "digest", "created_at"]
+        read_only_fields = ["lesson_count", "digest", "created_at"]
+        extra_kwargs = {"date_from": {"required": False}, "date_to": {"required": False}}
+
+    def validate(self, data):
+        semester = data.pop("semester", None)
+        if semester is not None:
+            data["date_from"], data["date_to"] = snapshots.semester_bounds(semester)
+        if "date_from" not in data or "date_to" not in data:
+            raise serializers.ValidationError({"semester": "Укажите semester или date_from и date_to"})
+        if data["date_from"] > data["date_to"]:
+            raise serializers.ValidationError({"date_to": "date_from должна быть не позже date_to"})
+        if (data["date_to"] - data["date_from"]).days > snapshots.MAX_DAYS:
+            raise serializers.ValidationError({"date_to": f"Период не может превышать {snapshots.MAX_DAYS} дней"})
+        return data
+
+    def create(self, validated_data):
+        department = validated_data.get("department")
+        scope = snapshots.Scope(department.id if department else None, validated_data["date_from"], validated_data["date_to"])
+        return snapshots.create_snapshot(validated_data["name"], scope, user=validated_data.get("created_by"))
@@ -0,0 +1,35 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import changelog
+from .caching import bump_schedule_version, bump_week_versions
+from .models import ChangeLog, Lesson, Student
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_weeks(sender, instance, **kwargs):
+    bump_week_versions([instance.start_time, getattr(instance, "_loaded_start_time", None)])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_schedule_cache(sender, **kwargs):
+    bump_schedule_version()
+
+
+def log_saved(sender, instance, created, **kwargs):
+    changelog.record(instance, ChangeLog.CREATED if created else ChangeLog.UPDATED)
+    if sender is not Lesson:
+        bump_schedule_version()
+
+
+def log_deleted(sender, instance, **kwargs):
+    changelog.record(instance, ChangeLog.DELETED)
+    if sender is not Lesson:
+        bump_schedule_version()
+
+
+for model in changelog.MODEL_LABELS:
+    post_save.connect(log_saved, sender=model, dispatch_uid=f"changelog_save_{model.__name__}")
+    post_delete.connect(log_deleted, sender=model, dispatch_uid=f"changelog_delete_{model.__name__}")
@@ -0,0 +1,214 @@
+"""
+Снимки (опубликованные версии) расписания и разница между ними.
+
+Снимок — занятия кафедры (или всех кафедр) за период, разложенные по
+неделям. Неделя хранится как отсортированные по id кортежи
+(id, группа, преподаватель, дисциплина, аудитория, начало, конец),
+упакованные в 7 × int64 и сжатые zlib; ключ блока — SHA-256 упакованных
+байтов, поэтому одинаковые недели разных снимков хранятся один раз.
+
+Разница сначала сравнивает хеши недель и распаковывает только недели с
+разными хешами. Текущее расписание упаковывается теми же функциями и
+кэшируется по неделям с недельной версией расписания (core.caching),
+поэтому сравнение снимка с текущим состоянием пересобирает только недели,
+в которых что-то менялось. Сравниваются только снимки одной кафедры и
+одного периода; занятие, перенесённое на другую неделю, считается
+изменённым, а не удалённым и добавленным.
+"""
+import hashlib
+import struct
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .archive import semester_start, with_archive
+from .caching import cached_weeks, week_monday
+from .grid import NAMES
+from .models import ScheduleSnapshot, SnapshotBlob, SnapshotWeek
+
+RECORD = struct.Struct("<7q")
+LESSON_FIELDS = ["id", "group_id", "teacher_id", "discipline_id", "room_id", "start_time", "end_time"]
+MAX_DAYS = 400
+LIVE = "live"
+
+
+def semester_bounds(day: date) -> tuple[date, date]:
+    """Первый и последний день семестра, в который попадает day (см. archive.semester_start)."""
+    start = semester_start(day)
+    following = date(start.year + 1, 2, 1) if start.month == 9 else date(start.year, 9, 1)
+    return start, following - timedelta(days=1)
+
+
+@dataclass(frozen=True)
+class Scope:
+    department_id: int | None
+    date_from: date
+    date_to: date
+
+    @classmethod
+    def of(cls, snapshot: ScheduleSnapshot) -> "Scope":
+        return cls(snapshot.department_id, snapshot.date_from, snapshot.date_to)
+
+    def mondays(self) -> list[date]:
+        first, last = week_monday(self.date_from), week_monday(self.date_to)
+        return [first + timedelta(weeks=i) for i in range((last - first).days // 7 + 1)]
+
+
+def pack(rows) -> bytes:
+    """Кортежи занятий, отсортированные по id, в байты: время — секунды Unix."""
+    flat = []
+    for lesson_id, group_id, teacher_id, discipline_id, room_id, start, end in rows:
+        flat += (lesson_id, group_id, teacher_id, discipline_id, room_id, int(start.timestamp()), int(end.timestamp()))
+    return struct.pack(f"<{len(flat)}q", *flat)
+
+
+def unpack(data: bytes) -> dict[int, tuple]:
+    return {row[0]: row for row in RECORD.iter_unpack(data)}
+
+
+def build_week(scope: Scope, monday: date) -> tuple[str, bytes]:
+    """(хеш, упакованные занятия) недели текущего расписания в пределах scope."""
+    first = max(monday, scope.date_from)
+    last = min(monday + timedelta(days=6), scope.date_to)
+    start = timezone.make_aware(datetime.combine(first, time.min))
+    end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min))
+    filters = {"start_time__gte": start, "start_time__lt": end}
+    if scope.department_id is not None:
+        filters["group__department_id"] = scope.department_id
+    rows = with_archive(
+        lambda model: model.objects.filter(**filters).values_list(
+            "id", "group_id", "teacher_id", "discipline_id", "room_id", "start_time", "end_time"
+        ),
+        since=start,
+    ).order_by("id")
+    data = pack(rows)
+    return hashlib.sha256(data).hexdigest(), data
+
+
+def live_weeks(scope: Scope) -> dict[date, tuple[str, bytes]]:
+    return cached_weeks(
+        "snapshot", scope.mondays(), lambda monday: build_week(scope, monday),
+        scope.department_id, scope.date_from.isoformat(), scope.date_to.isoformat(),
+    )
+
+
+def _digest(weeks: dict[date, str]) -> str:
+    return hashlib.sha256("".join(f"{m.isoformat()}:{d}\n" for m, d in sorted(weeks.items())).encode()).hexdigest()
+
+
+def create_snapshot(name: str, scope: Scope, user=None) -> ScheduleSnapshot:
+    weeks = live_weeks(scope)
+    with transaction.atomic():
+        stored = set(SnapshotBlob.objects.filter(digest__in={d for d, _ in weeks.values()}).values_list("digest", flat=True))
+        new = {d: data for d, data in weeks.values() if d not in stored}
+        SnapshotBlob.objects.bulk_create(
+            [SnapshotBlob(digest=d, lesson_count=len(data) // RECORD.size, data=zlib.compress(data))
+             for d, data in new.items()],
+            ignore_conflicts=True,
+        )
+        snapshot = ScheduleSnapshot.objects.create(
+            name=name, department_id=scope.department_id, date_from=scope.date_from, date_to=scope.date_to,
+            lesson_count=sum(len(data) // RECORD.size for _, data in weeks.values()),
+            digest=_digest({m: d for m, (d, _) in weeks.items()}), created_by=user,
+        )
+        SnapshotWeek.objects.bulk_create(
+            [SnapshotWeek(snapshot=snapshot, monday=m, blob_id=d) for m, (d, _) in weeks.items()]
+        )
+    return snapshot
+
+
+def _snapshot_weeks(snapshot: ScheduleSnapshot) -> dict[date, str]:
+    return dict(snapshot.weeks.values_list("monday", "blob_id"))
+
+
+def _load_blobs(digests) -> dict[str, bytes]:
+    return {
+        d: zlib.decompress(bytes(data))
+        for d, data in SnapshotBlob.objects.filter(digest__in=digests).values_list("digest", "data")
+    }
+
+
+class ScopeMismatch(ValueError):
+    pass
+
+
+def diff(old: ScheduleSnapshot, new: ScheduleSnapshot | None = None, group_id: int | None = None) -> dict:
+    """
+    Разница между снимками old и new (None — текущее расписание в границах old):
+    по изменившимся неделям — добавленные, удалённые и изменённые занятия.
+    Перенос на другую неделю — изменение в неделе, где занятие стоит теперь.
+    group_id оставляет только занятия группы (до или после изменения).
+    Снимки других кафедры или периода — ScopeMismatch: недели вне общей
+    части выглядели бы целиком удалёнными или добавленными.
+    """
+    if new is not None and Scope.of(old) != Scope.of(new):
+        raise ScopeMismatch("Снимки сделаны для разных кафедр или периодов")
+    old_weeks = _snapshot_weeks(old)
+    if new is None:
+        live = live_weeks(Scope.of(old))
+        new_weeks = {m: d for m, (d, _) in live.items()}
+        new_data = {d: data for d, data in live.values()}
+    else:
+        new_weeks, new_data = _snapshot_weeks(new), None
+
+    changed = sorted(m for m in old_weeks.keys() | new_weeks.keys() if old_weeks.get(m) != new_weeks.get(m))
+    wanted = {old_weeks[m] for m in changed if m in old_weeks}
+    if new_data is None:
+        wanted |= {new_weeks[m] for m in changed if m in new_weeks}
+    data = _load_blobs(wanted)
+    if new_data is not None:
+        data.update(new_data)
+
+    weekly = {}
+    for monday in changed:
+        # Кортежи недели упакованы по возрастанию id — словари обходятся в том же порядке
+        before = unpack(data[old_weeks[monday]]) if monday in old_weeks else {}
+        after = unpack(data[new_weeks[monday]]) if monday in new_weeks else {}
+        weekly[monday] = (
+            {i: row for i, row in after.items() if i not in before},
+            {i: row for i, row in before.items() if i not in after},
+            [(row, after[i]) for i, row in before.items() if i in after and after[i] != row],
+        )
+    # Удалённое в одной неделе и добавленное в другой — одно и то же занятие после переноса
+    removed_in = {i: monday for monday, (_added, removed, _updated) in weekly.items() for i in removed}
+    for added, _removed, updated in weekly.values():
+        for i in [i for i in added if i in removed_in]:
+            updated.append((weekly[removed_in[i]][1].pop(i), added.pop(i)))
+
+    keep = (lambda row: True) if group_id is None else (lambda row: row[1] == group_id)
+    changes = []
+    for monday, (added, removed, updated) in weekly.items():
+        added = [row for row in added.values() if keep(row)]
+        removed = [row for row in removed.values() if keep(row)]
+        updated = sorted((pair for pair in updated if keep(pair[0]) or keep(pair[1])), key=lambda pair: pair[0][0])
+        if added or removed or updated:
+            changes.append((monday, added, removed, updated))
+
+    # Имена и ISO-время — по уникальным значениям всех изменённых строк, а не построчно
+    rows = [row for _m, added, removed, updated in changes for row in (*added, *removed, *(r for p in updated for r in p))]
+    columns = list(zip(*rows)) or [()] * RECORD.size
+    tz = timezone.get_current_timezone()
+    times = {ts: datetime.fromtimestamp(ts, tz).isoformat() for ts in {*columns[5], *columns[6]}}
+    out = lambda r: r[:5] + (times[r[5]], times[r[6]])
+    weeks = [
+        {
+            "monday": monday.isoformat(),
+            "added": [out(r) for r in added],
+            "removed": [out(r) for r in removed],
+            "changed": [(out(b), out(a)) for b, a in updated],
+        }
+        for monday, added, removed, updated in changes
+    ]
+    referenced = dict(zip(("group", "teacher", "discipline", "room"), (set(c) for c in columns[1:5])))
+    return {
+        "from": old.id,
+        "to": new.id if new is not None else LIVE,
+        "weeks_compared": len(old_weeks.keys() | new_weeks.keys()),
+        "weeks_changed": len(weeks),
+        "lesson_fields": LESSON_FIELDS,
+        "weeks": weeks,
+        "names": {name: NAMES[name](ids) for name, ids in referenced.items()},
+    }
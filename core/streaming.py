@@ -0,0 +1,240 @@
+"""
+Лента изменений расписания через Server-Sent Events.
+
+Схема работы:
+- каждое изменение занятий и справочников пишется в ChangeLog (см. core.changelog);
+- в каждом воркере работает один ChangeBroadcaster: он раз в
+  SSE_POLL_INTERVAL секунд читает новые строки журнала и раздаёт их
+  подписчикам через asyncio-очереди. Так журнал служит мостом между
+  воркерами, а число запросов к БД не зависит от числа подключений;
+- подключение — это асинхронный генератор на общем event loop, поэтому
+  тысячи простаивающих клиентов не занимают потоки.
+
+Строки журнала фиксируются не в порядке id: при параллельных записях
+меньший id может стать видимым позже большего. Пропущенные id ниже курсора
+запоминаются и перечитываются при следующих опросах (GAP_TIMEOUT секунд —
+дольше транзакции не держат; id откатившихся транзакций так и не появятся).
+
+По Last-Event-ID досылается не больше REPLAY_LIMIT событий. Если пропущено
+больше или нужные строки уже удалены сжатием журнала, клиент вместо
+событий получает event: reset (как reset в changelog.changes_since) и
+перезагружает данные; id этого события — текущая позиция ленты.
+
+Эндпоинт рассчитан на запуск через ASGI (schedule/asgi.py), например:
+    uvicorn schedule.asgi:application
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db.models import Max
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .async_views import authenticate
+from .models import ChangeLog
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_HEARTBEAT_INTERVAL = 15.0
+SUBSCRIBER_QUEUE_SIZE = 256
+REPLAY_LIMIT = 1000
+GAP_TIMEOUT = 60.0
+MAX_GAPS = 10000
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = ("id", "model", "object_id", "action", "group_id", "teacher_id", "room_id", "data")
+
+
+@dataclass(eq=False)
+class Subscription:
+    group_ids: set[int] = field(default_factory=set)
+    teacher_ids: set[int] = field(default_factory=set)
+    room_ids: set[int] = field(default_factory=set)
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+
+    def matches(self, event: dict) -> bool:
+        if not (self.group_ids or self.teacher_ids or self.room_ids):
+            return True
+        return (
+            event["group_id"] in self.group_ids
+            or event["teacher_id"] in self.teacher_ids
+            or event["room_id"] in self.room_ids
+        )
+
+
+class ChangeBroadcaster:
+    """Один опрос журнала на воркер, раздача событий всем подписчикам."""
+
+    def __init__(self):
+        self.subscribers: set[Subscription] = set()
+        self.cursor: int | None = None
+        # Пропущенные id ниже курсора -> когда замечены (time.monotonic())
+        self.gaps: dict[int, float] = {}
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def poll_interval(self) -> float:
+        return getattr(settings, "SSE_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)
+
+    async def subscribe(self, subscription: Subscription) -> int:
+        """Регистрирует подписчика и возвращает позицию журнала, с которой он получает события."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Новый event loop (перезапуск воркера, тесты) — начинаем с чистого состояния
+            self.subscribers = set()
+            self.cursor = None
+            self._task = None
+            self._loop = loop
+        if self.cursor is None or not self.subscribers:
+            # Первый подписчик начинает с текущего конца журнала: события, накопившиеся,
+            # пока подписчиков не было, досылаются только по Last-Event-ID
+            first = not self.subscribers
+            last = await ChangeLog.objects.order_by("-id").values_list("id", flat=True).afirst() or 0
+            if first and not self.subscribers:
+                self.cursor = last
+                self.gaps = {}
+            else:
+                self.cursor = max(self.cursor or 0, last)
+        self.subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return self.cursor
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscribers.discard(subscription)
+
+    async def _run(self) -> None:
+        while self.subscribers:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+            except Exception:
+                # Ошибка БД не должна останавливать ленту для всех подписчиков воркера
+                logger.exception("Не удалось прочитать журнал изменений")
+        self._task = None
+
+    async def poll(self) -> None:
+        now = time.monotonic()
+        if self.gaps:
+            late = [
+                row async for row in ChangeLog.objects.filter(id__in=list(self.gaps))
+                .order_by("id").values(*EVENT_FIELDS)
+            ]
+            for row in late:
+                del self.gaps[row["id"]]
+                self.publish(row)
+            self.gaps = {i: seen for i, seen in self.gaps.items() if now - seen < GAP_TIMEOUT}
+
+        rows = [
+            row async for row in ChangeLog.objects.filter(id__gt=self.cursor)
+            .order_by("id").values(*EVENT_FIELDS)[:REPLAY_LIMIT]
+        ]
+        expected = self.cursor + 1
+        for row in rows:
+            for missing in range(expected, min(row["id"], expected + MAX_GAPS - len(self.gaps))):
+                self.gaps[missing] = now
+            expected = row["id"] + 1
+            self.publish(row)
+
+    def publish(self, event: dict) -> None:
+        self.cursor = max(self.cursor or 0, event["id"])
+        for subscription in list(self.subscribers):
+            if not subscription.matches(event):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Медленный клиент: отключаем, он переподключится с Last-Event-ID
+                self.unsubscribe(subscription)
+                subscription.queue.get_nowait()
+                subscription.queue.put_nowait(None)
+
+
+broadcaster = ChangeBroadcaster()
+
+
+def format_event(event: dict) -> str:
+    payload = {"op": event["action"], "model": event["model"], "id": event["object_id"], **event["data"]}
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {event['id']}\nevent: {event['model']}\ndata: {data}\n\n"
+
+
+def format_reset(cursor: int) -> str:
+    data = json.dumps({"op": "reset", "token": str(cursor)}, separators=(",", ":"))
+    return f"id: {cursor}\nevent: reset\ndata: {data}\n\n"
+
+
+def _parse_ids(value: str | None) -> set[int]:
+    if not value:
+        return set()
+    return {int(part) for part in value.split(",") if part.strip()}
+
+
+async def _event_stream(subscription: Subscription, backlog: list[dict], reset: int | None = None):
+    heartbeat = getattr(settings, "SSE_HEARTBEAT_INTERVAL", DEFAULT_HEARTBEAT_INTERVAL)
+    try:
+        yield "retry: 3000\n\n"
+        if reset is not None:
+            yield format_reset(reset)
+        for event in backlog:
+            yield format_event(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                break
+            yield format_event(event)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+async def change_stream(request):
+    """
+    SSE-лента изменений занятий
+
+    Query params:
+    - group_id, teacher_id, room_id: фильтры (через запятую, опционально)
+    - token: access-токен JWT, если нельзя передать заголовок Authorization
+    Заголовок Last-Event-ID: досылает пропущенные события после переподключения.
+    """
+    if request.method != "GET":
+        return JsonResponse({"detail": "Метод не поддерживается"}, status=405)
+
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse({"detail": "Учетные данные не были предоставлены."}, status=401)
+
+    try:
+        subscription = Subscription(
+            group_ids=_parse_ids(request.GET.get("group_id")),
+            teacher_ids=_parse_ids(request.GET.get("teacher_id")),
+            room_ids=_parse_ids(request.GET.get("room_id")),
+        )
+        last_event_id = request.headers.get("Last-Event-ID")
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return JsonResponse({"detail": "Параметры group_id, teacher_id, room_id и Last-Event-ID должны быть числами"}, status=400)
+
+    cursor = await broadcaster.subscribe(subscription)
+    backlog, reset = [], None
+    if last_event_id is not None and last_event_id < cursor:
+        qs = ChangeLog.objects.filter(id__gt=last_event_id, id__lte=cursor).order_by("id").values(*EVENT_FIELDS)
+        rows = [event async for event in qs[:REPLAY_LIMIT + 1]]
+        watermark = (await ChangeLog.objects.filter(action=ChangeLog.COMPACTED).aaggregate(w=Max("object_id")))["w"]
+        if len(rows) > REPLAY_LIMIT or last_event_id < (watermark or 0):
+            # Всё пропущенное не дослать: клиент перезагружает данные и продолжает с cursor
+            reset = cursor
+        else:
+            backlog = [event for event in rows if subscription.matches(event)]
+
+    response = StreamingHttpResponse(_event_stream(subscription, backlog, reset), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
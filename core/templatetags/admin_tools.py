@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+
+from django import template
+from django.contrib.admin.templatetags import admin_list
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from core.admin_tools import KeysetChangeList
+
+register = template.Library()
+
+
+def _calendar(first: date, last: date, kind: str) -> list[date]:
+    if kind == "year":
+        return [date(year, 1, 1) for year in range(first.year, last.year + 1)]
+    if kind == "month":
+        months, year, month = [], first.year, first.month
+        while (year, month) <= (last.year, last.month):
+            months.append(date(year, month, 1))
+            year, month = year + month // 12, month % 12 + 1
+        return months
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+class _CalendarQuerySet:
+    """
+    Для date_hierarchy: годы, месяцы и дни — календарь между Min и Max поля
+    (два чтения индекса) вместо SELECT DISTINCT по всем строкам периода.
+    Пустые периоды внутри диапазона тоже попадают в список.
+    """
+
+    def __init__(self, queryset):
+        self._queryset = queryset
+        self._aggregates = {}
+
+    def __getattr__(self, name):
+        return getattr(self._queryset, name)
+
+    def aggregate(self, *args, **kwargs):
+        # Тег сам запрашивает Min и Max для выбора начального уровня — тот же запрос
+        key = (args, tuple(sorted(kwargs.items())))
+        if key not in self._aggregates:
+            self._aggregates[key] = self._queryset.aggregate(*args, **kwargs)
+        return self._aggregates[key]
+
+    def datetimes(self, field_name, kind):
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if bounds["first"] is None:
+            return []
+        first, last = (timezone.localtime(v) if timezone.is_aware(v) else v for v in bounds.values())
+        return _calendar(first.date(), last.date(), kind)
+
+    dates = datetimes
+
+
+class _CalendarChangeList:
+    def __init__(self, cl):
+        self._cl = cl
+        self.queryset = _CalendarQuerySet(cl.queryset)
+
+    def __getattr__(self, name):
+        return getattr(self._cl, name)
+
+
+def calendar_date_hierarchy(cl):
+    return admin_list.date_hierarchy(_CalendarChangeList(cl) if isinstance(cl, KeysetChangeList) else cl)
+
+
+@register.tag(name="calendar_date_hierarchy")
+def calendar_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(
+        parser,
+        token,
+        func=calendar_date_hierarchy,
+        template_name="date_hierarchy.html",
+        takes_context=False,
+    )
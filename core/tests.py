@@ -1,12 +1,37 @@
 from django.contrib.auth.models import User, Group
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
-from .models import Department, GroupModel, Teacher, Discipline, Room, Lesson
+from .models import ChangeLog, ChangeRequest, Department, Job, GroupModel, Teacher, Student, Discipline, Room, Lesson
+from .streaming import broadcaster
+from . import changelog
+from .change_requests import process_batch
+from . import jobs
+from .importer import ScheduleImporter
+from benchmarks import endpoints as endpoint_benchmarks
 from datetime import datetime, timedelta
+import io
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
+from django.utils import timezone
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from . import metrics, profiling
+from .querycheck import QueryDetectorMixin, RepeatedQueriesError
+from .lesson_rows import lesson_rows
+from .queries import LESSON_RELATED
+from .serializers import LessonSerializer
+from rest_framework.renderers import JSONRenderer
 
 
-class ApiSmokeTests(APITestCase):
+class ScheduleTestCase(APITestCase):
     def setUp(self):
         # roles
         for g in ["ADMIN_DB", "TEACHER", "STUDENT"]:
@@ -29,6 +54,9 @@ class ApiSmokeTests(APITestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
 
+
+class ApiSmokeTests(ScheduleTestCase):
+
     def test_admin_can_create_lesson(self):
         self.auth(self.admin)
         url = "/api/lessons/"
@@ -61,3 +89,1073 @@ class ApiSmokeTests(APITestCase):
         res = self.client.post("/api/lessons/", {})
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
 
+
+
+class AnalyticsTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for i in range(15):
+            user = User.objects.create_user(username=f"s{i}", password="pass")
+            Student.objects.create(user=user, group=self.group)
+        monday = timezone.make_aware(datetime(2024, 9, 2, 8, 30))
+        for day in range(2):
+            Lesson.objects.create(
+                group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                start_time=monday + timedelta(days=day), end_time=monday + timedelta(days=day, minutes=90),
+            )
+
+    def test_room_utilization(self):
+        self.auth(self.student_user)
+        res = self.client.get("/api/analytics/utilization/", {"date": "2024-09-04"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        room = res.data["rooms"][0]
+        self.assertEqual(room["lessons"], 2)
+        self.assertEqual(room["occupied_hours"], 3.0)
+        self.assertEqual(room["seat_utilization_percent"], 50.0)
+        self.assertEqual(room["peak_hours"], [9])
+
+    def test_workload_cache_invalidated_on_lesson_change(self):
+        self.auth(self.student_user)
+        res = self.client.get("/api/analytics/workload/", {"date": "2024-09-02"})
+        self.assertEqual(res.data["teachers"][0]["hours"], 3.0)
+        Lesson.objects.first().delete()
+        res = self.client.get("/api/analytics/workload/", {"date": "2024-09-02"})
+        self.assertEqual(res.data["teachers"][0]["hours"], 1.5)
+        self.assertEqual(res.data["teachers"][0]["disciplines"][0]["hours"], 1.5)
+
+    def test_heatmap(self):
+        self.auth(self.student_user)
+        res = self.client.get("/api/analytics/heatmap/", {"date_from": "2024-09-02", "date_to": "2024-09-08"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        nine = res.data["bins"].index("09:00")
+        self.assertEqual(res.data["occupied_rooms"][0][nine], 1)
+        self.assertEqual(res.data["students"][1][nine], 15)
+        self.assertEqual(res.data["occupied_rooms"][2][nine], 0)
+        self.assertEqual(res.data["occupied_rooms"][0][res.data["bins"].index("10:00")], 0)
+        res = self.client.get("/api/analytics/heatmap/", {"date_from": "2024-09-08", "date_to": "2024-09-02"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.get("/api/analytics/heatmap/", {
+            "date_from": "2024-09-02", "date_to": "2024-09-08", "room_type": "lab",
+        })
+        self.assertEqual(res.data["occupied_rooms"][0][nine], 0)
+
+
+class ChangeStreamTests(ScheduleTestCase):
+    async def test_stream_replays_missed_events_for_group(self):
+        other_group = await GroupModel.objects.acreate(name="ИВТ-32", department=self.department, year=3)
+        start = timezone.now() + timedelta(days=1)
+        for group in (self.group, other_group):
+            await Lesson.objects.acreate(
+                group=group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                start_time=start, end_time=start + timedelta(minutes=90),
+            )
+        token = (await self.async_client.post(
+            "/api/auth/token/", {"username": "student", "password": "pass"}
+        )).json()["access"]
+
+        res = await self.async_client.get(
+            "/api/stream/changes/", {"group_id": self.group.id, "token": token}, headers={"Last-Event-ID": "0"},
+        )
+        self.assertEqual(res["Content-Type"], "text/event-stream")
+        stream = res.streaming_content
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+        event = (await anext(stream)).decode()
+        self.assertIn("event: lesson", event)
+        self.assertIn(f'"group_id":{self.group.id}', event)
+        self.assertIn('"op":"created"', event)
+        self.assertEqual(await ChangeLog.objects.filter(model="lesson").acount(), 2)
+
+        lesson = await Lesson.objects.filter(group=self.group).afirst()
+        await lesson.adelete()
+        await broadcaster.poll()
+        event = (await anext(stream)).decode()
+        await stream.aclose()
+        self.assertIn('"op":"deleted"', event)
+
+    async def test_truncated_replay_sends_reset(self):
+        from unittest import mock
+
+        start = timezone.now() + timedelta(days=1)
+        for day in range(3):
+            await Lesson.objects.acreate(
+                group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                start_time=start + timedelta(days=day), end_time=start + timedelta(days=day, minutes=90),
+            )
+        token = (await self.async_client.post(
+            "/api/auth/token/", {"username": "student", "password": "pass"}
+        )).json()["access"]
+        last = await ChangeLog.objects.order_by("-id").values_list("id", flat=True).afirst()
+
+        with mock.patch("core.streaming.REPLAY_LIMIT", 2):
+            res = await self.async_client.get(
+                "/api/stream/changes/", {"token": token}, headers={"Last-Event-ID": "0"},
+            )
+            stream = res.streaming_content
+            await anext(stream)
+            event = (await anext(stream)).decode()
+            await stream.aclose()
+        self.assertEqual(event, f'id: {last}\nevent: reset\ndata: {{"op":"reset","token":"{last}"}}\n\n')
+
+    async def test_stream_requires_auth(self):
+        res = await self.async_client.get("/api/stream/changes/")
+        self.assertEqual(res.status_code, 401)
+
+    async def test_rows_committed_out_of_id_order_are_delivered(self):
+        from .streaming import ChangeBroadcaster, Subscription
+
+        feed, subscription = ChangeBroadcaster(), Subscription()
+        cursor = await feed.subscribe(subscription)
+        entry = lambda pk: ChangeLog.objects.acreate(id=pk, model="lesson", object_id=pk, action=ChangeLog.CREATED)
+        # Запись с большим id стала видна раньше записи с меньшим
+        await entry(cursor + 2)
+        await feed.poll()
+        await entry(cursor + 1)
+        await feed.poll()
+        received = [subscription.queue.get_nowait()["id"] for _ in range(subscription.queue.qsize())]
+        self.assertEqual(received, [cursor + 2, cursor + 1])
+        self.assertEqual(feed.gaps, {})
+
+        # После ухода последнего подписчика новый начинает с конца журнала, без старых событий
+        feed.unsubscribe(subscription)
+        await entry(cursor + 3)
+        self.assertEqual(await feed.subscribe(Subscription()), cursor + 3)
+
+
+class SyncTests(ScheduleTestCase):
+    def create_lesson(self, group, hours=24):
+        start = timezone.now() + timedelta(hours=hours)
+        return Lesson.objects.create(
+            group=group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+            start_time=start, end_time=start + timedelta(minutes=90),
+        )
+
+    def test_delta_sync_for_group(self):
+        self.auth(self.student_user)
+        other_group = GroupModel.objects.create(name="ИВТ-32", department=self.department, year=3)
+        moved = self.create_lesson(self.group)
+        removed = self.create_lesson(self.group, hours=48)
+        token = self.client.get("/api/sync/").data["token"]
+
+        self.create_lesson(other_group, hours=72)
+        moved.group = other_group
+        moved.save()
+        removed_id = removed.id
+        removed.delete()
+        Lesson.objects.filter(pk=self.create_lesson(self.group, hours=96).pk).update(room=self.room)
+        self.room.capacity = 40
+        self.room.save()
+
+        res = self.client.get("/api/sync/", {"since": token, "group_id": self.group.id})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(res.data["deleted"]["lesson"]), sorted([moved.id, removed_id]))
+        self.assertEqual(len(res.data["changed"]["lesson"]), 1)
+        self.assertEqual(res.data["changed"]["room"][0]["capacity"], 40)
+        self.assertFalse(res.data["more"])
+
+        res = self.client.get("/api/sync/", {"since": res.data["token"], "group_id": self.group.id})
+        self.assertEqual(res.data["changed"], {})
+
+    def test_compaction_keeps_latest_state(self):
+        lesson = self.create_lesson(self.group)
+        for hours in (30, 36):
+            lesson.start_time = timezone.now() + timedelta(hours=hours)
+            lesson.end_time = lesson.start_time + timedelta(minutes=90)
+            lesson.save()
+        result = changelog.compact(retention_days=30)
+        self.assertEqual(result, {"superseded": 2, "expired": 0})
+        changes = changelog.changes_since(0)
+        self.assertEqual(changes["changed"]["lesson"][0]["start_time"], lesson.start_time.isoformat())
+
+        ChangeLog.objects.update(created_at=timezone.now() - timedelta(days=31))
+        changelog.compact(retention_days=30)
+        self.assertTrue(changelog.changes_since(0)["reset"])
+
+
+class AsyncReadTests(ScheduleTestCase):
+    def test_async_endpoints_match_sync(self):
+        start = timezone.now() + timedelta(days=1)
+        Lesson.objects.create(
+            group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+            start_time=start, end_time=start + timedelta(minutes=90),
+        )
+        self.auth(self.teacher_user)
+        cases = [
+            ("/api/lessons/by_group/", "/api/async/lessons/by_group/", {"group_id": self.group.id}),
+            ("/api/lessons/by_teacher/", "/api/async/lessons/by_teacher/", {"teacher_id": self.teacher.id}),
+            ("/api/lessons/by_room/", "/api/async/lessons/by_room/", {"room_id": self.room.id}),
+            ("/api/rooms/free/", "/api/async/rooms/free/", {
+                "start": (start - timedelta(hours=3)).isoformat(), "end": (start - timedelta(hours=2)).isoformat(),
+            }),
+            ("/api/auth/me/", "/api/async/auth/me/", {}),
+        ]
+        for sync_url, async_url, params in cases:
+            with self.subTest(url=async_url):
+                sync_res = self.client.get(sync_url, params)
+                async_res = self.client.get(async_url, params)
+                self.assertEqual(async_res.status_code, status.HTTP_200_OK)
+                self.assertEqual(async_res.json(), sync_res.json())
+
+        res = self.client.get("/api/async/lessons/by_group/", {"group_id": self.group.id, "start_date": "bad"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Сетка пар не прочитана этим процессом: async-представление читает её само
+        from . import timeslots
+        timeslots._cached = None
+        free = self.client.get("/api/async/rooms/free/", cases[3][2])
+        self.assertEqual(free.status_code, status.HTTP_200_OK)
+        self.assertEqual(free.json(), self.client.get("/api/rooms/free/", cases[3][2]).json())
+        self.client.credentials()
+        self.assertEqual(self.client.get("/api/async/auth/me/").status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ChangeRequestProcessingTests(ScheduleTestCase):
+    def payload(self, action, hours, lesson_id=None, **overrides):
+        start = timezone.now().replace(microsecond=0) + timedelta(hours=hours)
+        lesson = {
+            "group_id": self.group.id, "teacher_id": self.teacher.id, "discipline_id": self.discipline.id,
+            "room_id": self.room.id, "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=90)).isoformat(), **overrides,
+        }
+        return ChangeRequest.objects.create(
+            created_by=self.admin, payload={"action": action, "lesson_id": lesson_id, "lesson": lesson},
+        )
+
+    def test_batch_applies_non_conflicting_requests(self):
+        existing = Lesson.objects.create(
+            group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+            start_time=timezone.now() + timedelta(hours=100), end_time=timezone.now() + timedelta(hours=101),
+        )
+        first = self.payload("create", 24)
+        clash = self.payload("create", 24.5)
+        moved = self.payload("update", 48, lesson_id=existing.id)
+        broken = self.payload("create", 72, room_id=999999)
+
+        self.assertEqual(process_batch(), {"applied": 2, "rejected": 2})
+        for req in (first, clash, moved, broken):
+            req.refresh_from_db()
+        self.assertEqual(first.state, ChangeRequest.DONE)
+        self.assertTrue(Lesson.objects.filter(pk=first.result["lesson_id"]).exists())
+        self.assertEqual(clash.state, ChangeRequest.REJECTED)
+        self.assertIn("room_id", clash.result["errors"])
+        self.assertEqual(broken.state, ChangeRequest.REJECTED)
+        existing.refresh_from_db()
+        self.assertEqual(existing.start_time.isoformat(), moved.payload["lesson"]["start_time"])
+        self.assertEqual(process_batch(), {"applied": 0, "rejected": 0})
+
+    def test_created_lessons_keep_ids_without_bulk_insert_returning(self):
+        from unittest import mock
+
+        req = self.payload("create", 24)
+        # Как на MySQL: bulk_create не возвращает id созданных строк
+        with mock.patch.dict(vars(connections["default"].features), {"can_return_rows_from_bulk_insert": False}):
+            self.assertEqual(process_batch(), {"applied": 1, "rejected": 0})
+        req.refresh_from_db()
+        lesson_id = req.result["lesson_id"]
+        self.assertTrue(Lesson.objects.filter(pk=lesson_id).exists())
+        self.assertFalse(ChangeLog.objects.filter(action=ChangeLog.RESET).exists())
+        self.assertTrue(ChangeLog.objects.filter(model="lesson", object_id=lesson_id, action=ChangeLog.CREATED).exists())
+
+
+class JobQueueTests(ScheduleTestCase):
+    def test_submit_run_and_poll(self):
+        self.auth(self.student_user)
+        res = self.client.post("/api/jobs/", {"kind": "compact_changelog"}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.auth(self.admin)
+        res = self.client.post("/api/jobs/", {"kind": "nope"}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.post("/api/jobs/", {
+            "kind": "precompute_analytics", "params": {"date_from": "2024-09-02", "date_to": "2024-09-15"},
+        }, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["state"], Job.QUEUED)
+
+        self.assertEqual(jobs.work("test", once=True), 1)
+        res = self.client.get(f"/api/jobs/{res.data['id']}/")
+        self.assertEqual(res.data["state"], Job.DONE)
+        self.assertEqual(res.data["progress"], 100)
+        self.assertEqual(res.data["result"], {"weeks": 2})
+
+    def test_import_job_is_confined_to_import_root(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        Path(root, "week.csv").write_text(
+            "group,teacher,discipline,room,start_time,end_time\n"
+            "ИВТ-31,teacher,БД,А-101,2024-09-02T08:30,2024-09-02T10:00\n", encoding="utf-8",
+        )
+        self.auth(self.admin)
+        post = lambda params: self.client.post("/api/jobs/", {"kind": "import_schedule", "params": params}, format="json")
+        with self.settings(IMPORT_ROOT=root):
+            for params in ({"path": "../etc/passwd"}, {"path": "/etc/passwd"}, {"path": "week.csv", "report": "../x"},
+                           {"path": "week.csv", "mode": "w"}, {}, {"path": "week.csv", "dry_run": "no"}):
+                with self.subTest(params=params):
+                    res = post(params)
+                    self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+                    self.assertIn("params", res.data)
+            res = post({"path": "week.csv"})
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            jobs.work("test", once=True)
+        job = Job.objects.get(pk=res.data["id"])
+        self.assertEqual((job.state, job.result["imported"], job.result["report"]), (Job.DONE, 1, "week.csv.errors.jsonl"))
+        self.assertTrue(Path(root, "week.csv.errors.jsonl").exists())
+
+        # Задача, поставленная в обход API, тоже не выходит за каталог
+        with self.settings(IMPORT_ROOT=root):
+            outside = jobs.enqueue("import_schedule", {"path": "../outside.csv"}, max_attempts=1)
+            jobs.work("test", once=True)
+        outside.refresh_from_db()
+        self.assertEqual(outside.state, Job.FAILED)
+        self.assertIn("вне каталога импорта", outside.error)
+
+    def test_failed_job_is_retried_then_failed(self):
+        job = jobs.enqueue("precompute_analytics", {"date_from": "bad", "date_to": "bad"}, max_attempts=2)
+        jobs.work("test", once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.attempts), (Job.QUEUED, 1))
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.work("test", once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.FAILED)
+        self.assertIn("ValueError", job.error)
+
+    def test_stale_run_counts_as_attempt_and_cannot_overwrite_new_run(self):
+        job = jobs.enqueue("compact_changelog", max_attempts=2)
+        lost = jobs.claim("w1")
+        stall = lambda: Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        stall()
+        self.assertEqual(jobs.requeue_stale(), 1)
+        current = jobs.claim("w2")
+        self.assertEqual(current.attempts, 2)
+
+        # Запуск, сочтённый зависшим, дошёл до конца позже — итог не сохраняется
+        jobs.run(lost)
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.worker), (Job.RUNNING, "w2"))
+
+        stall()
+        self.assertEqual(jobs.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.FAILED)
+
+
+class ScheduleImportTests(ScheduleTestCase):
+    HEADER = "group,teacher,discipline,room,start_time,end_time\n"
+
+    def run_import(self, rows):
+        report = io.StringIO()
+        stats = ScheduleImporter(report=report, chunk_size=2).run(io.StringIO(self.HEADER + rows))
+        return stats, [json.loads(line) for line in report.getvalue().splitlines()]
+
+    def test_import_upserts_and_reports_conflicts(self):
+        rows = (
+            "ИВТ-31,teacher,БД,А-101,2024-09-02T08:30,2024-09-02T10:00\n"
+            "ивт-31,teacher,бд,а-101,2024-09-02T10:10,2024-09-02T11:40\n"
+            "ИВТ-31,teacher,БД,А-101,2024-09-02T09:00,2024-09-02T10:30\n"
+            "ИВТ-99,teacher,БД,А-101,2024-09-03T08:30,2024-09-03T10:00\n"
+        )
+        stats, report = self.run_import(rows)
+        self.assertEqual((stats.rows, stats.imported, stats.rejected), (4, 2, 2))
+        self.assertEqual(Lesson.objects.count(), 2)
+        errors = {r["line"]: r["errors"] for r in report}
+        self.assertEqual(sorted(errors), [4, 5])
+        self.assertIn("room_id", errors[4])
+        self.assertIn("group_id", errors[5])
+
+        # Повторный импорт обновляет занятия по ключу (группа, начало), а не дублирует их
+        first = Lesson.objects.get(start_time=timezone.make_aware(datetime(2024, 9, 2, 8, 30)))
+        other_room = Room.objects.create(name="Б-1", capacity=30)
+        stats, report = self.run_import("ИВТ-31,teacher,БД,Б-1,2024-09-02T08:30,2024-09-02T09:50\n")
+        self.assertEqual((stats.imported, stats.rejected), (1, 0))
+        self.assertEqual(Lesson.objects.count(), 2)
+        lesson = Lesson.objects.get(pk=first.pk)
+        self.assertEqual((timezone.localtime(lesson.end_time).minute, lesson.room_id), (50, other_room.id))
+        # Журнал сообщает о переносе и новой, и прежней аудитории
+        rooms = set(ChangeLog.objects.filter(model="lesson", object_id=first.pk, action="updated").values_list("room_id", flat=True))
+        self.assertEqual(rooms, {self.room.id, other_room.id})
+
+
+class GenerateDatasetTests(APITestCase):
+    def test_generates_conflict_free_schedule(self):
+        call_command(
+            "generate_dataset", "--departments", "2", "--groups", "6", "--teachers", "8", "--rooms", "10",
+            "--weeks", "2", "--students-per-group", "3", "--lessons-per-week", "4", stdout=io.StringIO(),
+        )
+        self.assertEqual(GroupModel.objects.count(), 6)
+        self.assertEqual(Lesson.objects.count(), 6 * 4 * 2)
+        self.assertEqual(Student.objects.count(), User.objects.filter(username__startswith="student").count())
+        for column in ("room", "teacher", "group"):
+            clashes = Lesson.objects.values(column, "start_time").annotate(n=Count("id")).filter(n__gt=1)
+            self.assertFalse(clashes.exists(), column)
+        with self.assertRaises(CommandError):
+            call_command("generate_dataset", stdout=io.StringIO())
+
+
+class QueryBudgetTests(ScheduleTestCase):
+    def test_endpoints_stay_within_query_budgets(self):
+        # Число запросов не зависит от объёма данных, поэтому бюджеты проверяются и на маленькой базе
+        results = endpoint_benchmarks.run_suite(repeat=1)
+        violations = endpoint_benchmarks.check(results, endpoint_benchmarks.load_budgets(), latency=False)
+        self.assertEqual(violations, [])
+
+
+class ProfilingTests(ScheduleTestCase):
+    @override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0)
+    def test_server_timing_and_sampled_profiles(self):
+        profiling.buffer.clear()
+        self.auth(self.student_user)
+        res = self.client.get(f"/api/lessons/by_group/?group_id={self.group.id}")
+        timing = res["Server-Timing"]
+        for metric in ("db;dur=", "queries;desc=", "ser;dur=", "render;dur=", "app;dur="):
+            self.assertIn(metric, timing)
+
+        res = self.client.get("/api/profiling/requests/")
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.auth(self.admin)
+        res = self.client.get("/api/profiling/requests/")
+        profile = next(p for p in res.data["requests"] if p["path"].startswith("/api/lessons/by_group/"))
+        self.assertEqual(profile["query_count"], len(profile["queries"]))
+
+    def test_disabled_middleware_is_not_installed(self):
+        self.auth(self.student_user)
+        res = self.client.get("/api/lessons/")
+        self.assertNotIn("Server-Timing", res)
+
+
+class MetricsTests(ScheduleTestCase):
+    def test_metrics_endpoint_reports_routes_and_conflicts(self):
+        self.auth(self.teacher_user)
+        start = timezone.now() + timedelta(days=1)
+        start = start + timedelta(days=(7 - start.weekday()) % 7)  # ближайший понедельник
+        Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                              start_time=start, end_time=start + timedelta(hours=1))
+        res = self.client.post("/api/lessons/", {
+            "group_id": self.group.id, "discipline_id": self.discipline.id, "room_id": self.room.id,
+            "start_time": (start + timedelta(minutes=30)).isoformat(),
+            "end_time": (start + timedelta(minutes=90)).isoformat(),
+        }, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.get(f"/api/lessons/by_group/?group_id={self.group.id}")
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('schedule_http_requests_total{route="lesson-by-group",method="GET",status="200"}', body)
+        self.assertIn('schedule_http_request_duration_seconds_bucket{route="lesson-list",method="POST",le="+Inf"}', body)
+        self.assertIn('schedule_conflicts_total{kind="room"}', body)
+        self.assertIn('schedule_permission_checks_total{permission="IsTeacher",result="allow"}', body)
+
+    def test_metrics_are_aggregated_across_processes(self):
+        self.addCleanup(setattr, metrics.registry, "inherited", {})
+        with self.settings(METRICS_DIR=self.tmp_dir()):
+            directory = Path(metrics.registry.directory)
+            metrics.requests_total.inc(route="x", method="GET", status=200)
+            metrics.registry.flush()
+            own_file = directory / f"{metrics.registry.instance}.json"
+            # Живой процесс (родитель этого) и завершившийся (pid, которого нет)
+            (directory / f"{os.getppid()}-live.json").write_text(own_file.read_text())
+            (directory / "4194305-dead.json").write_text(own_file.read_text())
+            own = metrics.requests_total.values[("x", "GET", "200")]
+            line = 'schedule_http_requests_total{route="x",method="GET",status="200"}'
+            self.assertIn(f"{line} {own * 3:g}", metrics.registry.render())
+
+            # Файл завершившегося процесса забран этим: сумма та же, файлов меньше
+            self.assertFalse((directory / "4194305-dead.json").exists())
+            self.assertEqual(len(list(directory.glob("*.json"))), 2)
+            self.assertIn(f"{line} {own * 3:g}", metrics.registry.render())
+
+    def tmp_dir(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        return path
+
+
+class RepeatedQueryTests(QueryDetectorMixin, ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        start = timezone.make_aware(datetime(2024, 9, 2, 8, 30))
+        for day in range(4):
+            Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                                  start_time=start + timedelta(days=day), end_time=start + timedelta(days=day, hours=1))
+
+    def test_main_endpoints_have_no_repeated_queries(self):
+        self.auth(self.teacher_user)
+        for url in (
+            "/api/lessons/",
+            f"/api/lessons/by_group/?group_id={self.group.id}",
+            f"/api/lessons/by_teacher/?teacher_id={self.teacher.id}",
+            f"/api/lessons/by_room/?room_id={self.room.id}",
+            "/api/rooms/free/?start=2024-09-02T08:00:00&end=2024-09-02T09:00:00",
+            "/api/auth/me/",
+        ):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK, url)
+
+    def test_detector_keeps_asgi_middleware_chain_async(self):
+        import logging
+        from django.core.handlers.asgi import ASGIHandler
+
+        # Для синхронного middleware Django переключает цепочку в sync и пишет об этом в лог при DEBUG
+        with self.settings(DEBUG=True), self.assertLogs("django.request", "DEBUG") as logs:
+            ASGIHandler()
+            logging.getLogger("django.request").debug("цепочка загружена")
+        self.assertFalse([line for line in logs.output if "adapted for middleware core.querycheck" in line])
+
+    def test_detector_points_at_n_plus_one(self):
+        with self.assertRaises(RepeatedQueriesError) as ctx:
+            with self.assertNoRepeatedQueries():
+                [lesson.room.name for lesson in Lesson.objects.all()]
+        self.assertIn("core/tests.py", str(ctx.exception))
+
+
+class LessonRowsTests(ScheduleTestCase):
+    def test_fast_path_matches_serializer_byte_for_byte(self):
+        self.teacher_user.first_name, self.teacher_user.email = "Анна \"Q\"", "t@example.com"
+        self.teacher_user.save()
+        start = timezone.make_aware(datetime(2024, 9, 2, 8, 30, 15, 123456))
+        for day in range(3):
+            Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                                  start_time=start + timedelta(days=day), end_time=start + timedelta(days=day, hours=1))
+        qs = Lesson.objects.order_by("start_time")
+        expected = JSONRenderer().render(LessonSerializer(qs.select_related(*LESSON_RELATED), many=True).data)
+        self.assertEqual(JSONRenderer().render(lesson_rows(qs)), expected)
+
+        self.auth(self.admin)
+        res = self.client.get("/api/lessons/")
+        self.assertEqual(res.content, expected)
+
+
+class RenderingTests(ScheduleTestCase):
+    def test_backends_match_drf_and_large_responses_are_gzipped(self):
+        import gzip
+        from decimal import Decimal
+        from . import renderers
+
+        data = {"name": "Лекция\u2028", "start": timezone.make_aware(datetime(2024, 9, 2, 8, 30, 0, 123456)),
+                "value": Decimal("1.50"), 1: [None, True, 2.5]}
+        expected = JSONRenderer().render(data)
+        for backend in ("json", "orjson") if renderers.orjson else ("json",):
+            with override_settings(REST_FRAMEWORK={"JSON_BACKEND": backend}):
+                self.assertEqual(renderers.dumps(data), expected)
+
+        start = timezone.make_aware(datetime(2024, 9, 2, 8, 30))
+        for day in range(6):
+            Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                                  start_time=start + timedelta(days=day), end_time=start + timedelta(days=day, hours=1))
+        self.auth(self.admin)
+        plain = self.client.get("/api/lessons/")
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertIn("Accept-Encoding", plain["Vary"])
+        res = self.client.get("/api/lessons/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertLess(len(res.content), len(plain.content) / 2)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """Основная БД — тестовая, реплика — отдельный файл SQLite без репликации."""
+    client_class = APIClient
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # После super(): алиас не должен попасть под запрет запросов к «чужим» БД
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings["replica"] = connections.configure_settings({
+            "default": connections.settings["default"],
+            "replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(cls.replica_dir, "db.sqlite3")},
+        })["replica"]
+        call_command("migrate", database="replica", verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        shutil.rmtree(cls.replica_dir)
+        super().tearDownClass()
+
+    def test_reads_use_replica_until_client_writes(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        for db in ("default", "replica"):
+            User.objects.db_manager(db).create_user(id=1, username="admin", password="pass")
+        Department.objects.using("replica").create(name="Только на реплике")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(User.objects.get(pk=1))}")
+
+        with override_settings(DATABASE_REPLICAS=["replica"]):
+            names = [d["name"] for d in self.client.get("/api/departments/").data]
+            self.assertEqual(names, ["Только на реплике"])
+            res = self.client.post("/api/departments/", {"name": "ИТ"}, format="json")
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertTrue(Department.objects.using("default").filter(name="ИТ").exists())
+            # Записавший клиент читает с основной БД и видит свои изменения
+            names = [d["name"] for d in self.client.get("/api/departments/").data]
+            self.assertEqual(names, ["ИТ"])
+            self.client.cookies.clear()
+            names = [d["name"] for d in self.client.get("/api/departments/").data]
+            self.assertEqual(names, ["Только на реплике"])
+
+
+class ArchiveSemesterTests(ScheduleTestCase):
+    def test_archived_lessons_are_read_only_when_range_needs_them(self):
+        from . import archive
+        from .models import ArchivedLesson
+
+        old = timezone.make_aware(datetime(2024, 3, 4, 9, 0))
+        new = timezone.make_aware(datetime(2025, 3, 3, 9, 0))
+        for start in (old, old + timedelta(days=1), new):
+            Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                                  start_time=start, end_time=start + timedelta(hours=1))
+        logged = ChangeLog.objects.count()
+
+        call_command("archive_semester", "--before", "2024-09-01", "--batch-size", "1", stdout=io.StringIO())
+        self.assertEqual(Lesson.objects.count(), 1)
+        self.assertEqual(ArchivedLesson.objects.count(), 2)
+        self.assertEqual(ChangeLog.objects.count(), logged)
+        self.assertEqual(archive.default_cutoff(datetime(2025, 3, 10).date()), timezone.make_aware(datetime(2024, 9, 1)))
+
+        self.auth(self.student_user)
+        url = f"/api/lessons/by_group/?group_id={self.group.id}"
+        res = self.client.get(url)
+        self.assertEqual([l["start_time"][:10] for l in res.data["lessons"]], ["2024-03-04", "2024-03-05", "2025-03-03"])
+        with self.assertNumQueries(3):
+            res = self.client.get(url + "&start_date=2025-01-01T00:00:00")
+        self.assertEqual(res.data["count"], 1)
+        res = self.client.get(url + "&start_date=2024-03-05T00:00:00")
+        self.assertEqual(res.data["count"], 2)
+
+
+class IndexAdvisorTests(ScheduleTestCase):
+    def test_reports_plans_for_every_backend_format(self):
+        from . import index_advisor
+
+        start = timezone.make_aware(datetime(2024, 9, 2, 9, 0))
+        Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                              start_time=start, end_time=start + timedelta(hours=1))
+        out = io.StringIO()
+        call_command("index_advisor", stdout=out)
+        for name in ("conflict_room", "rooms_free", "by_teacher", "week_analytics"):
+            self.assertIn(name, out.getvalue())
+        self.assertIn("обслуживаются существующими индексами", out.getvalue())
+
+        postgresql = json.dumps([{"Plan": {"Node Type": "Limit", "Plan Rows": 1, "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "core_lesson", "Plan Rows": 1200},
+        ]}}])
+        self.assertEqual(index_advisor._parse_postgresql(postgresql),
+                         [index_advisor.PlanNode("core_lesson", "Seq Scan", None, 1200)])
+        mysql = json.dumps(json.dumps({"query_block": {"nested_loop": [
+            {"table": {"table_name": "core_room", "access_type": "ALL", "rows_examined_per_scan": 300}},
+            {"table": {"table_name": "core_lesson", "access_type": "ref", "key": "lesson_room_start_end_idx",
+                       "rows_examined_per_scan": 4}},
+        ]}}))
+        nodes = index_advisor._parse_mysql(mysql)
+        self.assertTrue(nodes[0].full_scan)
+        self.assertEqual((nodes[1].index, nodes[1].rows), ("lesson_room_start_end_idx", 4.0))
+
+        indexes = {"core_lesson_room_idx": ["room_id"], "lesson_group_start_idx": ["group_id", "start_time"]}
+        self.assertEqual(index_advisor.covering_index(("room_id", "start_time", "end_time"), indexes), (None, False))
+        self.assertEqual(index_advisor.covering_index(("group_id", "start_time", "end_time"), indexes),
+                         ("lesson_group_start_idx", True))
+
+
+class SearchTests(ScheduleTestCase):
+    def test_typeahead_is_case_insensitive_ranked_and_follows_changes(self):
+        from . import search
+
+        self.teacher_user.first_name, self.teacher_user.last_name = "Пётр", "Иванов"
+        self.teacher_user.save()
+        Room.objects.create(name="Б-101", capacity=20, room_type="lab")
+        GroupModel.objects.create(name="ЭК-11", department=self.department, year=1)
+        self.auth(self.student_user)
+
+        def names(q, types=""):
+            res = self.client.get("/api/search/", {"q": q, "types": types})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return [(r["type"], r["name"]) for r in res.data["results"]]
+
+        self.assertEqual(names("ивт"), [("group", "ИВТ-31")])
+        self.assertEqual(names("петр"), [("teacher", "Пётр Иванов")])
+        self.assertEqual(names("иванов п"), [("teacher", "Пётр Иванов")])
+        # Подстрока внутри слова через триграммы; совпадение с началом имени — выше
+        self.assertEqual(names("10", "room"), [("room", "А-101"), ("room", "Б-101")])
+        self.assertEqual(names("101", "room"), [("room", "А-101"), ("room", "Б-101")])
+        self.assertEqual(names("а-1", "room"), [("room", "А-101")])
+        self.assertEqual(self.client.get("/api/search/", {"q": "а", "types": "rooms"}).status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.name = "Актовый зал"
+            self.room.save()
+        self.assertEqual(names("акт"), [("room", "Актовый зал")])
+        self.assertEqual(names("а-1", "room"), [])
+        self.assertIsNotNone(search.index._version)
+
+    def test_admin_search_falls_back_to_table_when_index_hits_limit(self):
+        from unittest import mock
+
+        Room.objects.create(name="Б-101", capacity=20, room_type="lab")
+        self.client.force_login(User.objects.create_superuser("root", "root@example.com", "pass"))
+        for limit in (1000, 1):
+            with mock.patch("core.admin.ADMIN_SEARCH_LIMIT", limit):
+                res = self.client.get("/admin/core/room/", {"q": "101"})
+            self.assertEqual(res.context["cl"].result_count, 2)
+
+
+class LargeTableAdminTests(ScheduleTestCase):
+    def test_changelist_pages_by_key_with_autocomplete_filters(self):
+        from unittest import mock
+        from .admin import LessonAdmin
+        from .admin_tools import estimated_count
+        from .templatetags.admin_tools import _calendar
+
+        other = GroupModel.objects.create(name="ЭК-11", department=self.department, year=1)
+        start = timezone.make_aware(datetime(2024, 12, 30, 9, 0))
+        for day in range(5):
+            for group in (self.group, other):
+                Lesson.objects.create(group=group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                                      start_time=start + timedelta(days=day), end_time=start + timedelta(days=day, hours=1))
+        self.client.force_login(User.objects.create_superuser("root", "root@example.com", "pass"))
+        expected = list(Lesson.objects.filter(group=self.group).order_by("-start_time", "-id").values_list("id", flat=True))
+
+        seen, url = [], f"/admin/core/lesson/?group__id__exact={self.group.id}"
+        with mock.patch.object(LessonAdmin, "list_per_page", 2):
+            while url:
+                res = self.client.get(url)
+                self.assertEqual(res.status_code, 200)
+                cl = res.context["cl"]
+                self.assertTrue(cl.keyset)
+                self.assertEqual(cl.result_count, 5)
+                seen += [lesson.id for lesson in cl.result_list]
+                url = cl.next_cursor and "/admin/core/lesson/" + cl.next_page_url
+        self.assertEqual(seen, expected)
+        # В фильтре только выбранная группа, остальные подгружает автодополнение
+        self.assertContains(res, 'class="admin-autocomplete" name="group__id__exact"')
+        self.assertNotContains(res, "ЭК-11")
+        # Годы date_hierarchy — по календарю между первым и последним занятием
+        res = self.client.get("/admin/core/lesson/")
+        self.assertContains(res, "start_time__year=2024")
+        self.assertContains(res, "start_time__year=2025")
+
+        self.assertEqual(self.client.get("/admin/core/lesson/?after=garbage").status_code, 302)
+        self.assertEqual(estimated_count(Lesson.objects.all()), (10, False))
+        self.assertEqual(_calendar(start.date(), (start + timedelta(days=4)).date(), "month"),
+                         [datetime(2024, 12, 1).date(), datetime(2025, 1, 1).date()])
+
+
+class TimeSlotTests(ScheduleTestCase):
+    def test_lessons_keep_date_and_pair_and_conflict_by_equality(self):
+        from datetime import time
+        from .caching import bump_schedule_version
+        from .models import TimeSlot
+        from . import timeslots
+
+        day = datetime(2024, 9, 2)
+        at = lambda h, m: timezone.make_aware(day.replace(hour=h, minute=m))
+        lesson = lambda **kw: Lesson.objects.create(**{"group": self.group, "teacher": self.teacher,
+                                                       "discipline": self.discipline, "room": self.room, **kw})
+        paired = lesson(start_time=at(10, 20), end_time=at(11, 50))
+        free_form = lesson(start_time=at(12, 0), end_time=at(12, 45), room=Room.objects.create(name="Б-1", capacity=5),
+                           group=GroupModel.objects.create(name="ЭК-11", department=self.department, year=1),
+                           teacher=Teacher.objects.create(user=User.objects.create_user("t2"), department=self.department))
+        self.assertEqual((paired.date, paired.slot), (day.date(), 2))
+        self.assertEqual((free_form.date, free_form.slot), (day.date(), None))
+        grid = timeslots.grid()
+        self.assertEqual(grid.position(day.date() + timedelta(days=1), 2, day.date()), len(grid) + 1)
+
+        # Пара 12:10–13:40 пересекается с занятием вне сетки в той же аудитории
+        busy = Lesson.objects.filter(timeslots.busy_q(at(12, 10), at(13, 40), day.date(), 3), room=free_form.room)
+        self.assertEqual(list(busy), [free_form])
+
+        # Вторая запись в ту же пару той же аудитории отклоняется уникальным индексом
+        self.auth(self.admin)
+        res = self.client.post("/api/lessons/", {
+            "group_id": free_form.group_id, "teacher_id": free_form.teacher_id, "discipline_id": self.discipline.id,
+            "room_id": self.room.id, "start_time": at(10, 20).isoformat(), "end_time": at(11, 50).isoformat(),
+        }, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("start_time", res.data)
+
+        # Сетку поменяли — номера пар пересчитываются
+        TimeSlot.objects.filter(number=2).update(start=time(10, 10), end=time(11, 40))
+        bump_schedule_version()
+        self.assertEqual(timeslots.assign_slots(), 1)
+        paired.refresh_from_db()
+        self.assertIsNone(paired.slot)
+
+    def test_admin_form_reports_taken_pair(self):
+        start = timezone.make_aware(datetime(2024, 9, 2, 8, 30))
+        Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                              start_time=start, end_time=start + timedelta(minutes=90))
+        other = GroupModel.objects.create(name="ЭК-11", department=self.department, year=1)
+        self.client.force_login(User.objects.create_superuser("root", "root@example.com", "pass"))
+        form = {
+            "group": other.id, "teacher": Teacher.objects.create(user=User.objects.create_user("t2"),
+                                                                 department=self.department).id,
+            "discipline": self.discipline.id, "room": self.room.id,
+            "start_time_0": "2024-09-02", "start_time_1": "08:30", "end_time_0": "2024-09-02", "end_time_1": "10:00",
+        }
+        res = self.client.post("/admin/core/lesson/add/", form)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(list(res.context["adminform"].form.errors), ["room"])
+        self.assertEqual(Lesson.objects.count(), 1)
+
+        form["room"] = Room.objects.create(name="Б-1", capacity=30).id
+        self.assertEqual(self.client.post("/admin/core/lesson/add/", form).status_code, 302)
+        self.assertEqual(Lesson.objects.count(), 2)
+
+    def test_renumbered_grid_is_pending_until_reassigned(self):
+        from .caching import bump_schedule_version
+        from .models import TimeSlot
+        from . import timeslots
+
+        day = datetime(2024, 9, 2)
+        at = lambda h, m: timezone.make_aware(day.replace(hour=h, minute=m))
+        lesson = lambda start, end: Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline,
+                                                          room=self.room, start_time=start, end_time=end)
+        first, second = lesson(at(8, 30), at(10, 0)), lesson(at(10, 20), at(11, 50))
+        self.assertEqual((first.slot, second.slot), (1, 2))
+
+        # Номера первых двух пар поменяли местами: сохранение ставит пересчёт в очередь
+        TimeSlot.objects.filter(number=1).update(number=99)
+        TimeSlot.objects.filter(number=2).update(number=1)
+        TimeSlot.objects.filter(number=99).update(number=2)
+        TimeSlot.objects.get(number=1).save()
+        self.assertTrue(Job.objects.filter(kind="assign_slots", state=Job.QUEUED).exists())
+        self.assertTrue(timeslots.grid().pending)
+        self.assertEqual(timeslots.date_and_slot(at(8, 30), at(10, 0)), (day.date(), None))
+        busy = Lesson.objects.filter(timeslots.busy_q(at(8, 30), at(10, 0), *timeslots.date_and_slot(at(8, 30), at(10, 0))))
+        self.assertEqual(list(busy), [first])
+
+        # Перестановка номеров не упирается в уникальный индекс (аудитория, дата, пара)
+        self.assertEqual(timeslots.assign_slots(), 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.slot, second.slot), (2, 1))
+        Job.objects.filter(kind="assign_slots").update(state=Job.DONE)
+        bump_schedule_version()
+        self.assertFalse(timeslots.grid().pending)
+        self.assertEqual(timeslots.date_and_slot(at(8, 30), at(10, 0)), (day.date(), 2))
+
+
+class GridTests(ScheduleTestCase):
+    def test_week_and_day_grid_place_lessons_by_pair(self):
+        cache.clear()
+        day = datetime(2024, 9, 3)  # вторник
+        at = lambda d, h, m: timezone.make_aware((day + timedelta(days=d)).replace(hour=h, minute=m))
+        other_room = Room.objects.create(name="Б-2", capacity=20)
+        paired = Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline,
+                                       room=self.room, start_time=at(0, 10, 20), end_time=at(0, 11, 50))
+        free_form = Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline,
+                                          room=other_room, start_time=at(1, 12, 0), end_time=at(1, 12, 45))
+
+        self.auth(self.student_user)
+        res = self.client.get("/api/grid/", {"kind": "room", "ids": f"{other_room.id},{self.room.id}",
+                                             "date": "2024-09-05"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.json()
+        slots = len(data["slots"])
+        self.assertEqual(data["days"][0], "2024-09-02")
+        self.assertEqual([r["name"] for r in data["rows"]], ["Б-2", "А-101"])
+        # Вторник, пара 2 -> столбец slots + 1 во второй строке
+        number = data["cells"][1][slots + 1]
+        self.assertEqual(data["lessons"][number][0], paired.id)
+        self.assertEqual(sum(c is not None for row in data["cells"] for c in row), 1)
+        self.assertEqual(data["lessons"][data["extra"][0][2][0]][0], free_form.id)
+        self.assertEqual(data["names"]["discipline"], {str(self.discipline.id): "БД"})
+
+        res = self.client.get("/api/grid/", {"kind": "room", "ids": f"{other_room.id},{self.room.id}",
+                                             "date": "2024-09-04", "span": "day"})
+        day_grid = res.json()
+        self.assertEqual(day_grid["days"], ["2024-09-04"])
+        self.assertEqual(day_grid["cells"], [[None] * slots, [None] * slots])
+        self.assertEqual([row[0] for row in day_grid["extra"]], [[0], []])
+        self.assertEqual(day_grid["lessons"][0][0], free_form.id)
+
+        # Изменение занятия сбрасывает закэшированную сетку недели
+        paired.delete()
+        res = self.client.get("/api/grid/", {"kind": "room", "ids": str(self.room.id), "date": "2024-09-05"})
+        self.assertEqual(res.json()["cells"], [[None] * (7 * slots)])
+
+        self.assertEqual(self.client.get("/api/grid/", {"kind": "x"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get("/api/grid/", {"kind": "room", "ids": "a"}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_html_for_kiosks_with_token(self):
+        Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline, room=self.room,
+                              start_time=timezone.make_aware(datetime(2024, 9, 2, 8, 30)),
+                              end_time=timezone.make_aware(datetime(2024, 9, 2, 10, 0)))
+        params = {"kind": "group", "date": "2024-09-02", "format": "html", "token": "kiosk"}
+        self.assertIn(self.client.get("/api/grid/", params).status_code,
+                      (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        with override_settings(GRID_KIOSK_TOKEN="kiosk"):
+            res = self.client.get("/api/grid/", params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/html; charset=utf-8")
+        html = res.content.decode()
+        self.assertIn("ИВТ-31", html)
+        self.assertIn("А-101", html)
+
+
+class CapacityTests(ScheduleTestCase):
+    def _students(self, n, group):
+        return [Student.objects.create(user=User.objects.create_user(f"s{group.id}-{i}"), group=group) for i in range(n)]
+
+    def test_student_count_follows_students_and_recount_fixes_drift(self):
+        from . import capacity
+
+        other = GroupModel.objects.create(name="ЭК-11", department=self.department, year=1)
+        students = self._students(3, self.group)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.student_count, 3)
+
+        students[0].group = other
+        students[0].save()
+        students[1].delete()
+        # Сохранение загруженной раньше группы не затирает счётчик
+        self.group.name = "ИВТ-32"
+        self.group.save()
+        self.assertEqual(
+            dict(GroupModel.objects.values_list("id", "student_count")), {self.group.id: 1, other.id: 1}
+        )
+
+        Student.objects.filter(group=other).update(group=self.group)
+        self.assertEqual(capacity.recount(), 2)
+        self.assertEqual(dict(GroupModel.objects.values_list("id", "student_count")), {self.group.id: 2, other.id: 0})
+
+    def test_loaddata_keeps_dumped_student_count(self):
+        self._students(3, self.group)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "groups.json")
+            call_command("dumpdata", "core.groupmodel", "core.student", output=path, verbosity=0)
+            Student.objects.all().delete()
+            call_command("loaddata", path, verbosity=0)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.student_count, 3)
+
+    def test_rooms_too_small_are_rejected_and_filtered(self):
+        small = Room.objects.create(name="Б-5", capacity=2)
+        self._students(3, self.group)
+        start = timezone.make_aware(datetime(2024, 9, 2, 8, 30))
+        payload = {"group_id": self.group.id, "teacher_id": self.teacher.id, "discipline_id": self.discipline.id,
+                   "start_time": start.isoformat(), "end_time": (start + timedelta(minutes=90)).isoformat()}
+
+        self.auth(self.admin)
+        res = self.client.post("/api/lessons/", {**payload, "room_id": small.id}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("room_id", res.data)
+        res = self.client.post("/api/lessons/", {**payload, "room_id": self.room.id}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        ChangeRequest.objects.create(created_by=self.admin, payload={
+            "action": "update", "lesson_id": res.data["id"], "lesson": {"room_id": small.id},
+        })
+        self.assertEqual(process_batch(), {"applied": 0, "rejected": 1})
+
+        res = self.client.get("/api/rooms/free/", {"start": "2024-09-02T12:10:00", "end": "2024-09-02T13:40:00",
+                                                   "for_group": self.group.id})
+        self.assertEqual([r["name"] for r in res.data["rooms"]], ["А-101"])
+
+
+class CheckScheduleTests(ScheduleTestCase):
+    def test_sweep_reports_every_overlap_and_opens_room_requests(self):
+        from . import consistency
+
+        at = lambda h, m: timezone.make_aware(datetime(2024, 9, 2, h, m))
+        other_group = GroupModel.objects.create(name="ЭК-11", department=self.department, year=1)
+        other_teacher = Teacher.objects.create(user=User.objects.create_user("t2"), department=self.department)
+        spare = Room.objects.create(name="Б-1", capacity=40, room_type="lecture")
+        first = Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline,
+                                      room=self.room, start_time=at(9, 0), end_time=at(10, 30))
+        second = Lesson.objects.create(group=other_group, teacher=other_teacher, discipline=self.discipline,
+                                       room=self.room, start_time=at(10, 0), end_time=at(11, 0))
+        # Встык с первым — не пересечение
+        Lesson.objects.create(group=self.group, teacher=self.teacher, discipline=self.discipline,
+                              room=Room.objects.create(name="Б-2", capacity=20, room_type="lab"),
+                              start_time=at(10, 30), end_time=at(11, 30))
+
+        self.assertEqual(list(consistency.sweep([(1, "a", 5), (2, "b", 3), (3, "c", 4), (5, "d", 6)])),
+                         [((1, "a", 5), (2, "b", 3)), ((1, "a", 5), (3, "c", 4))])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "overlaps.csv")
+            out = io.StringIO()
+            call_command("check_schedule", output=output, format="csv", processes=1,
+                         open_requests=self.admin.username, stdout=out)
+            rows = list(consistency.read_report(output, "csv"))
+        self.assertEqual([(r["kind"], r["lesson_id"], r["other_id"]) for r in rows], [("room", second.id, first.id)])
+        self.assertIn("Открыто заявок: 1", out.getvalue())
+        request = ChangeRequest.objects.get()
+        self.assertEqual(request.payload, {"action": "update", "lesson_id": second.id, "lesson": {"room_id": spare.id}})
+        self.assertEqual(process_batch(), {"applied": 1, "rejected": 0})
+
+
+class SnapshotTests(ScheduleTestCase):
+    def test_snapshot_diff_against_live_and_other_snapshot(self):
+        from .models import ScheduleSnapshot, SnapshotBlob
+
+        cache.clear()
+        at = lambda d, h: timezone.make_aware(datetime(2024, 9, 2 + d, h, 30))
+        lesson = lambda d, h, **kw: Lesson.objects.create(**{
+            "group": self.group, "teacher": self.teacher, "discipline": self.discipline, "room": self.room,
+            "start_time": at(d, h), "end_time": at(d, h) + timedelta(minutes=90), **kw})
+        other_group = GroupModel.objects.create(name="ЭК-11", department=Department.objects.create(name="Экономика"), year=1)
+        moved, dropped = lesson(0, 8), lesson(1, 8)
+        later = lesson(14, 8)  # третья неделя не меняется
+        foreign = lesson(2, 12, group=other_group)
+
+        self.auth(self.admin)
+        res = self.client.post("/api/snapshots/", {"name": "v1", "semester": "2024-10-01"}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((res.data["date_from"], res.data["date_to"], res.data["lesson_count"]),
+                         ("2024-09-01", "2025-01-31", 4))
+        v1 = res.data["id"]
+
+        moved.room = Room.objects.create(name="Б-1", capacity=30)
+        moved.save()
+        dropped_id, foreign_id = dropped.id, foreign.id
+        dropped.delete()
+        added = lesson(3, 12)
+        foreign.delete()
+
+        self.auth(self.student_user)
+        res = self.client.get(f"/api/snapshots/{v1}/diff/", {"group_id": self.group.id})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.json()
+        self.assertEqual(data["to"], "live")
+        self.assertEqual(data["weeks_changed"], 1)
+        week = data["weeks"][0]
+        self.assertEqual(week["monday"], "2024-09-02")
+        self.assertEqual([r[0] for r in week["added"]], [added.id])
+        self.assertEqual([r[0] for r in week["removed"]], [dropped_id])
+        (before, after), = week["changed"]
+        self.assertEqual((before[4], after[4]), (self.room.id, moved.room_id))
+        self.assertEqual(after[5], at(0, 8).isoformat())
+        self.assertEqual(data["names"]["room"][str(moved.room_id)], "Б-1")
+
+        self.auth(self.admin)
+        v2 = self.client.post("/api/snapshots/", {"name": "v2", "semester": "2024-10-01"}, format="json").data["id"]
+        v3 = self.client.post("/api/snapshots/", {"name": "v3", "semester": "2024-10-01"}, format="json").data["id"]
+        data = self.client.get(f"/api/snapshots/{v1}/diff/", {"to": v2}).json()
+        self.assertEqual([r[0] for r in data["weeks"][0]["removed"]], [dropped_id, foreign_id])
+        self.assertEqual(self.client.get(f"/api/snapshots/{v2}/diff/", {"to": v3}).json()["weeks"], [])
+        # Одинаковые недели хранятся один раз: пустая, третья и две версии первой
+        self.assertEqual(ScheduleSnapshot.objects.get(pk=v2).digest, ScheduleSnapshot.objects.get(pk=v3).digest)
+        self.assertEqual(SnapshotBlob.objects.count(), 4)
+        self.assertEqual(self.client.get(f"/api/snapshots/{v1}/diff/", {"to": "x"}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+        # Перенос на другую неделю — изменение в новой неделе, а не удаление и добавление
+        later = Lesson.objects.get(pk=later.pk)
+        later.start_time, later.end_time = at(8, 8), at(8, 8) + timedelta(minutes=90)
+        later.save()
+        data = self.client.get(f"/api/snapshots/{v2}/diff/").json()
+        self.assertEqual(data["weeks_changed"], 1)
+        week = data["weeks"][0]
+        self.assertEqual((week["monday"], week["added"], week["removed"]), ("2024-09-09", [], []))
+        (before, after), = week["changed"]
+        self.assertEqual((before[0], before[5], after[5]), (later.id, at(14, 8).isoformat(), at(8, 8).isoformat()))
+
+        # Снимки разных кафедр или периодов не сравниваются
+        other = self.client.post("/api/snapshots/", {
+            "name": "ИТ", "semester": "2024-10-01", "department_id": self.department.id,
+        }, format="json").data["id"]
+        res = self.client.get(f"/api/snapshots/{v2}/diff/", {"to": other})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,220 @@
+"""
+Сетка пар и целочисленное представление времени занятия.
+
+Занятие, начало и конец которого совпадают с одной из пар TimeSlot, хранит
+местную дату и номер пары (Lesson.date, Lesson.slot). Для таких занятий
+конфликт — это равенство (аудитория, дата, пара), которое проверяет
+уникальный индекс, а место в сетке дня или недели вычисляется арифметикой:
+(дата − первый день) × число пар + столбец пары. Занятия вне сетки
+(slot пуст) по-прежнему проверяются пересечением интервалов.
+
+Сетка кэшируется в памяти процесса и перечитывается при смене глобальной
+версии расписания, которую поднимает изменение TimeSlot, и не реже раза в
+GRID_TTL секунд — версия в кэше по умолчанию (LocMemCache) другим процессам
+не видна. Пары сетки не пересекаются (TimeSlot.clean). Async-представления
+получают сетку через agrid() и передают её в сборку запроса.
+
+Изменение TimeSlot ставит в очередь задачу assign_slots, которая
+пересчитывает номера пар у существующих занятий; она запускается через
+GRID_TTL, когда все процессы уже перечитали сетку. Пока такая задача в
+очереди или выполняется, сетка «ожидает пересчёта» (Grid.pending):
+date_and_slot не возвращает пару, и проверки занятости идут пересечением
+интервалов, а новые занятия пишутся без пары — сохранённые номера пар в
+это время могут относиться к прежней сетке.
+"""
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from time import monotonic
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .caching import bump_schedule_version, get_schedule_version
+from .models import ArchivedLesson, Job, Lesson, TimeSlot
+
+DEFAULT_BATCH_SIZE = 5000
+GRID_TTL = 60
+
+
+@dataclass(frozen=True)
+class Slot:
+    number: int
+    start: time
+    end: time
+
+
+class Grid:
+    def __init__(self, slots, pending: bool = False):
+        self.slots = tuple(slots)
+        self.pending = pending
+        self._by_time = {(s.start, s.end): s.number for s in self.slots}
+        # Номер пары -> столбец в сетке дня
+        self.column = {s.number: i for i, s in enumerate(self.slots)}
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def date_and_slot(self, start: datetime, end: datetime) -> tuple[date, int | None]:
+        """Местная дата начала и номер пары (None, если занятие не совпадает с парой или ждёт пересчёта)."""
+        day, slot = self.match(start, end)
+        return day, None if self.pending else slot
+
+    def match(self, start: datetime, end: datetime) -> tuple[date, int | None]:
+        """Местная дата начала и номер пары по этой сетке, даже если пересчёт ещё не закончен."""
+        start = timezone.localtime(start) if timezone.is_aware(start) else start
+        end = timezone.localtime(end) if timezone.is_aware(end) else end
+        day = start.date()
+        if end.date() != day:
+            return day, None
+        return day, self._by_time.get((start.time(), end.time()))
+
+    def position(self, day: date, slot: int, first_day: date) -> int:
+        """Индекс ячейки в плоской сетке дней, начинающейся с first_day."""
+        return (day - first_day).days * len(self.slots) + self.column[slot]
+
+
+_lock = threading.Lock()
+_cached: tuple[object, float, Grid] | None = None
+
+
+def _pending_q() -> Q:
+    return Q(kind="assign_slots", state__in=(Job.QUEUED, Job.RUNNING))
+
+
+def reassignment_pending() -> bool:
+    return Job.objects.filter(_pending_q()).exists()
+
+
+def _slots():
+    return TimeSlot.objects.order_by("number").values_list("number", "start", "end")
+
+
+def _current(version) -> Grid | None:
+    cached = _cached
+    if cached is None or cached[0] != version or monotonic() - cached[1] > GRID_TTL:
+        return None
+    return cached[2]
+
+
+def _remember(version, rows, pending: bool) -> Grid:
+    global _cached
+    loaded = Grid((Slot(*row) for row in rows), pending=pending)
+    with _lock:
+        _cached = (version, monotonic(), loaded)
+    return loaded
+
+
+def grid() -> Grid:
+    version = get_schedule_version()
+    current = _current(version)
+    if current is not None:
+        return current
+    return _remember(version, list(_slots()), reassignment_pending())
+
+
+async def agrid() -> Grid:
+    """grid() для async-представлений: сетка перечитывается асинхронными запросами ORM."""
+    version = get_schedule_version()
+    current = _current(version)
+    if current is not None:
+        return current
+    rows = [row async for row in _slots()]
+    return _remember(version, rows, await Job.objects.filter(_pending_q()).aexists())
+
+
+def date_and_slot(start: datetime, end: datetime) -> tuple[date, int | None]:
+    return grid().date_and_slot(start, end)
+
+
+def busy_q(start: datetime, end: datetime, day: date | None = None, slot: int | None = None) -> Q:
+    """
+    Занятия, пересекающиеся с интервалом. Для интервала-пары — равенство
+    (дата, пара) плюс пересечение с занятиями вне сетки того же или
+    предыдущего дня (начавшимися до полуночи). Обе ветви OR ищутся по
+    уникальному индексу (аудитория/преподаватель/группа, дата, пара) и
+    читают несколько строк одного дня, а не всю историю до start.
+    """
+    overlap = Q(start_time__lt=end, end_time__gt=start)
+    if slot is None:
+        return overlap
+    return Q(date=day, slot=slot) | Q(overlap, date__range=(day - timedelta(days=1), day), slot__isnull=True)
+
+
+def _set_slots(model, ids: list[int], day: date, slot: int | None) -> int:
+    """UPDATE пачки; при нарушении уникального индекса пары — по одной строке, конфликтующие остаются без пары."""
+    try:
+        with transaction.atomic():
+            return model._base_manager.filter(id__in=ids).update(date=day, slot=slot)
+    except IntegrityError:
+        if len(ids) == 1:
+            # Двойное бронирование в этой паре: занятие проверяется пересечением интервалов
+            # и попадает в отчёт manage.py check_schedule
+            return model._base_manager.filter(id__in=ids).update(date=day, slot=None)
+        return sum(_set_slots(model, [i], day, slot) for i in ids)
+
+
+def _reassign_pass(model, current: Grid, fill: bool, batch_size: int, progress, changed: int) -> int:
+    """
+    Первый проход (fill=False) пишет занятия, оставшиеся без пары, и освобождает номера
+    пар, которые меняются, — иначе при перенумерации сетки UPDATE упрётся в строку,
+    ещё хранящую прежний номер. Второй проход заполняет новые номера.
+    """
+    last_id = 0
+    while True:
+        rows = list(
+            model._base_manager.filter(id__gt=last_id).order_by("id")
+            .only("id", "start_time", "end_time", "date", "slot")[:batch_size]
+        )
+        if not rows:
+            return changed
+        last_id = rows[-1].id
+        counted, released = defaultdict(list), defaultdict(list)
+        for row in rows:
+            day, slot = current.match(row.start_time, row.end_time)
+            if (day, slot) == (row.date, row.slot):
+                continue
+            if fill and slot is not None:
+                counted[(day, slot)].append(row.id)
+            elif not fill and slot is None:
+                counted[(day, None)].append(row.id)
+            elif not fill and row.slot is not None:
+                released[(day, None)].append(row.id)
+        # Одно UPDATE на (дата, пара); без журнала изменений — для клиентов занятие не меняется
+        for (day, slot), ids in released.items():
+            _set_slots(model, ids, day, slot)
+        for (day, slot), ids in counted.items():
+            changed += _set_slots(model, ids, day, slot)
+        if progress:
+            progress(model, last_id, changed)
+
+
+def assign_slots(batch_size: int = DEFAULT_BATCH_SIZE, progress=None) -> int:
+    """
+    Пересчитывает дату и пару у всех занятий (и архивных) по текущей сетке; возвращает
+    число занятий, чья пара изменилась. Пока идёт пересчёт, проверки занятости не
+    полагаются на номера пар (Grid.pending).
+    """
+    current = grid()
+    changed = 0
+    for model in (Lesson, ArchivedLesson):
+        changed = _reassign_pass(model, current, False, batch_size, progress, changed)
+        changed = _reassign_pass(model, current, True, batch_size, progress, changed)
+    bump_schedule_version()
+    return changed
+
+
+def _grid_changed(sender, **kwargs):
+    from . import jobs
+
+    # Задача — в той же транзакции, что и изменение сетки: до её завершения сетка «ожидает пересчёта»
+    if not Job.objects.filter(kind="assign_slots", state=Job.QUEUED).exists():
+        jobs.enqueue("assign_slots", run_after=timezone.now() + timedelta(seconds=GRID_TTL))
+    bump_schedule_version()
+
+
+post_save.connect(_grid_changed, sender=TimeSlot, dispatch_uid="timeslots_save")
+post_delete.connect(_grid_changed, sender=TimeSlot, dispatch_uid="timeslots_delete")
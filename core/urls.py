@@ -3,8 +3,12 @@ from django.urls import path, include
 from .views import (
     DepartmentViewSet, GroupViewSet, TeacherViewSet, StudentViewSet,
     DisciplineViewSet, RoomViewSet, LessonViewSet, CurrentUserView, RegisterView,
-    TeacherDisciplinesView, TeacherGroupsView
+    TeacherDisciplinesView, TeacherGroupsView, RoomUtilizationView, TeacherWorkloadView,
+    OccupancyHeatmapView, SyncView, JobViewSet, ProfilingView, SearchView,
+    GridView, ScheduleSnapshotViewSet,
 )
+from . import async_views
+from .streaming import change_stream
 
 router = DefaultRouter()
 router.register(r"departments", DepartmentViewSet)
@@ -14,6 +18,8 @@ router.register(r"students", StudentViewSet)
 router.register(r"disciplines", DisciplineViewSet)
 router.register(r"rooms", RoomViewSet)
 router.register(r"lessons", LessonViewSet)
+router.register(r"jobs", JobViewSet)
+router.register(r"snapshots", ScheduleSnapshotViewSet)
 
 urlpatterns = [
     path("", include(router.urls)),
@@ -21,5 +27,19 @@ urlpatterns = [
     path("auth/register/", RegisterView.as_view(), name="register"),
     path("teacher/disciplines/", TeacherDisciplinesView.as_view(), name="teacher_disciplines"),
     path("teacher/groups/", TeacherGroupsView.as_view(), name="teacher_groups"),
+    path("analytics/utilization/", RoomUtilizationView.as_view(), name="analytics_utilization"),
+    path("analytics/workload/", TeacherWorkloadView.as_view(), name="analytics_workload"),
+    path("analytics/heatmap/", OccupancyHeatmapView.as_view(), name="analytics_heatmap"),
+    path("stream/changes/", change_stream, name="change_stream"),
+    path("sync/", SyncView.as_view(), name="sync"),
+    path("search/", SearchView.as_view(), name="search"),
+    path("grid/", GridView.as_view(), name="grid"),
+    path("profiling/requests/", ProfilingView.as_view(), name="profiling_requests"),
+    # Асинхронные версии эндпоинтов чтения (для запуска под ASGI)
+    path("async/lessons/by_group/", async_views.lessons_by_group, name="async_lessons_by_group"),
+    path("async/lessons/by_teacher/", async_views.lessons_by_teacher, name="async_lessons_by_teacher"),
+    path("async/lessons/by_room/", async_views.lessons_by_room, name="async_lessons_by_room"),
+    path("async/rooms/free/", async_views.free_rooms, name="async_rooms_free"),
+    path("async/auth/me/", async_views.current_user, name="async_current_user"),
 ]
 
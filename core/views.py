@@ -1,13 +1,17 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.db.models import Q, Exists, OuterRef
+from django.utils.html import escape
+from django.db.models import Exists, OuterRef
 from rest_framework import viewsets, mixins, status, serializers as drf_serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.renderers import StaticHTMLRenderer
 from rest_framework.views import APIView
 
-from .models import Department, GroupModel, Teacher, Student, Discipline, Room, Lesson
+from .models import Department, GroupModel, Teacher, Student, Discipline, Room, Lesson, Job, ScheduleSnapshot
 from .serializers import (
     DepartmentSerializer,
     GroupSerializer,
@@ -17,8 +21,20 @@ from .serializers import (
     RoomSerializer,
     LessonSerializer,
     UserRegistrationSerializer,
+    JobSerializer,
+    ScheduleSnapshotSerializer,
 )
-from .permissions import LessonPermission, IsTeacher
+from .permissions import LessonPermission, IsTeacher, IsAdminDB, IsAuthenticatedOrKiosk
+from .queries import (
+    LESSON_RELATED,
+    QueryParamError,
+    current_user_payload,
+    free_rooms_query,
+    lesson_values_in_range,
+)
+from . import analytics, capacity, changelog, grid, metrics, profiling, search, snapshots, timeslots
+from .lesson_rows import build_lessons, lesson_values
+from .renderers import FastJSONRenderer
 
 
 class DepartmentViewSet(viewsets.ModelViewSet):
@@ -66,83 +82,13 @@ class RoomViewSet(viewsets.ModelViewSet):
         - end: конечное время (ISO format, обязательный)
         - type: тип аудитории (lecture/lab, опционально)
         - capacity: минимальная вместимость (опционально)
+        - for_group: ID группы — только аудитории, где хватает мест на её студентов (опционально)
         """
-        start_str = request.query_params.get("start")
-        end_str = request.query_params.get("end")
-        room_type = request.query_params.get("type")
-        capacity = request.query_params.get("capacity")
-        
-        if not start_str or not end_str:
-            return Response(
-                {"detail": "Параметры start и end обязательны (ISO format datetime)"}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Парсинг дат
         try:
-            start = datetime.fromisoformat(start_str.replace('Z', '+00:00'))
-        except ValueError:
-            return Response(
-                {"detail": "Неверный формат start. Используйте ISO format (например: 2024-01-01T09:00:00)"}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        try:
-            end = datetime.fromisoformat(end_str.replace('Z', '+00:00'))
-        except ValueError:
-            return Response(
-                {"detail": "Неверный формат end. Используйте ISO format (например: 2024-01-01T10:30:00)"}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Валидация временного диапазона
-        if start >= end:
-            return Response(
-                {"detail": "Время начала должно быть меньше времени окончания"}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Поиск занятых аудиторий в указанный промежуток времени
-        # Аудитория занята, если есть занятие, которое пересекается с запрашиваемым временем
-        busy_qs = Lesson.objects.filter(room=OuterRef("pk")).filter(
-            start_time__lt=end, 
-            end_time__gt=start
-        )
-        
-        # Базовый запрос всех аудиторий
-        qs = Room.objects.all()
-        
-        # Фильтрация по типу
-        if room_type:
-            if room_type not in [Room.LECTURE, Room.LAB]:
-                return Response(
-                    {"detail": f"Тип аудитории должен быть '{Room.LECTURE}' или '{Room.LAB}'"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            qs = qs.filter(room_type=room_type)
-        
-        # Фильтрация по вместимости
-        if capacity:
-            try:
-                min_capacity = int(capacity)
-                if min_capacity <= 0:
-                    return Response(
-                        {"detail": "Вместимость должна быть положительным числом"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                qs = qs.filter(capacity__gte=min_capacity)
-            except ValueError:
-                return Response(
-                    {"detail": "Параметр capacity должен быть числом"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        # Исключаем занятые аудитории
-        qs = qs.annotate(is_busy=Exists(busy_qs)).filter(is_busy=False)
-        
-        # Сортировка по имени
-        qs = qs.order_by("name")
-        
+            start, end, qs = free_rooms_query(request.query_params)
+        except QueryParamError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+
         page = self.paginate_queryset(qs)
         ser = RoomSerializer(page or qs, many=True)
         
@@ -151,7 +97,7 @@ class RoomViewSet(viewsets.ModelViewSet):
                 "start": start.isoformat(),
                 "end": end.isoformat()
             },
-            "count": qs.count(),
+            "count": self.paginator.page.paginator.count if page is not None else len(ser.data),
             "rooms": ser.data
         }
         
@@ -159,7 +105,7 @@ class RoomViewSet(viewsets.ModelViewSet):
 
 
 class LessonViewSet(viewsets.ModelViewSet):
-    queryset = Lesson.objects.select_related("group", "teacher__user", "discipline", "room").all()
+    queryset = Lesson.objects.select_related(*LESSON_RELATED).all()
     serializer_class = LessonSerializer
     permission_classes = [LessonPermission]
 
@@ -179,28 +125,31 @@ class LessonViewSet(viewsets.ModelViewSet):
         """
         from rest_framework import serializers as drf_serializers
 
-        overlap_q = Q(start_time__lt=end_time, end_time__gt=start_time)
+        # Для занятия в паре сетки — равенство (дата, пара) по уникальному индексу
+        overlap_q = timeslots.busy_q(start_time, end_time, *timeslots.date_and_slot(start_time, end_time))
         base_qs = Lesson.objects.all()
         if instance is not None and instance.pk:
             base_qs = base_qs.exclude(pk=instance.pk)
 
-        room_conflicts = base_qs.filter(overlap_q, room=room)
-        teacher_conflicts = base_qs.filter(overlap_q, teacher=teacher)
-        group_conflicts = base_qs.filter(overlap_q, group=group)
+        # Каждая проверка — один запрос: результаты нужны и для ответа, и для текста ошибок
+        room_busy = base_qs.filter(overlap_q, room=room).exists()
+        teacher_busy = base_qs.filter(overlap_q, teacher=teacher).exists()
+        group_busy = base_qs.filter(overlap_q, group=group).exists()
 
-        if not (room_conflicts.exists() or teacher_conflicts.exists() or group_conflicts.exists()):
+        if not (room_busy or teacher_busy or group_busy):
+            metrics.conflict_checks_total.inc(outcome="ok")
             return
 
         errors: dict[str, list[str]] = {}
 
-        if room_conflicts.exists():
+        if room_busy:
             busy_rooms_subq = Lesson.objects.filter(
                 overlap_q,
                 room=OuterRef("pk"),
             )
             free_rooms_qs = (
                 Room.objects.annotate(is_busy=Exists(busy_rooms_subq))
-                .filter(is_busy=False)
+                .filter(is_busy=False, capacity__gte=group.student_count if capacity.enabled() else 0)
                 .order_by("name")[:5]
             )
             suggestions = [r.name for r in free_rooms_qs]
@@ -214,22 +163,33 @@ class LessonViewSet(viewsets.ModelViewSet):
 
             errors.setdefault("room_id", []).append(msg)
 
-        if teacher_conflicts.exists():
+        if teacher_busy:
             msg = (
                 f"Преподаватель {teacher} уже ведёт занятие в интервале "
                 f"{start_time:%d.%m.%Y %H:%M} - {end_time:%d.%m.%Y %H:%M}."
             )
             errors.setdefault("teacher_id", []).append(msg)
 
-        if group_conflicts.exists():
+        if group_busy:
             msg = (
                 f"Группа {group} уже занята в интервале "
                 f"{start_time:%d.%m.%Y %H:%M} - {end_time:%d.%m.%Y %H:%M}."
             )
             errors.setdefault("group_id", []).append(msg)
 
+        metrics.conflict_checks_total.inc(outcome="conflict")
+        for field in errors:
+            metrics.conflicts_total.inc(kind=field.removesuffix("_id"))
         raise drf_serializers.ValidationError(errors)
 
+    def list(self, request, *args, **kwargs):
+        """Список занятий: чтение через values() без DRF-сериализатора (см. core.lesson_rows)"""
+        qs = lesson_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            return self.get_paginated_response(build_lessons(page))
+        return Response(build_lessons(qs))
+
     def get_queryset(self):
         """Фильтруем queryset для преподавателей - показываем только их занятия"""
         qs = super().get_queryset()
@@ -364,8 +324,6 @@ class LessonViewSet(viewsets.ModelViewSet):
         - end_date: конечная дата (ISO format, опционально)
         """
         group_id = request.query_params.get("group_id")
-        start_date_str = request.query_params.get("start_date")
-        end_date_str = request.query_params.get("end_date")
         
         if not group_id:
             return Response(
@@ -382,37 +340,15 @@ class LessonViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        qs = self.queryset.filter(group_id=group_id)
-        
-        # Фильтрация по дате
-        if start_date_str:
-            try:
-                start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-                qs = qs.filter(start_time__gte=start_date)
-            except ValueError:
-                return Response(
-                    {"detail": "Неверный формат start_date. Используйте ISO format (например: 2024-01-01T00:00:00)"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        if end_date_str:
-            try:
-                end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
-                qs = qs.filter(end_time__lte=end_date)
-            except ValueError:
-                return Response(
-                    {"detail": "Неверный формат end_date. Используйте ISO format (например: 2024-01-01T23:59:59)"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        # Сортировка по времени начала
-        qs = qs.order_by("start_time")
-        
-        ser = self.get_serializer(qs, many=True)
+        try:
+            lessons = build_lessons(lesson_values_in_range(request.query_params, group_id=group_id))
+        except QueryParamError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+
         return Response({
             "group": {"id": group.id, "name": group.name},
-            "count": qs.count(),
-            "lessons": ser.data
+            "count": len(lessons),
+            "lessons": lessons
         })
 
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
@@ -426,8 +362,6 @@ class LessonViewSet(viewsets.ModelViewSet):
         - end_date: конечная дата (ISO format, опционально)
         """
         teacher_id = request.query_params.get("teacher_id")
-        start_date_str = request.query_params.get("start_date")
-        end_date_str = request.query_params.get("end_date")
         
         if not teacher_id:
             return Response(
@@ -444,40 +378,18 @@ class LessonViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        qs = self.queryset.filter(teacher_id=teacher_id)
-        
-        # Фильтрация по дате
-        if start_date_str:
-            try:
-                start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-                qs = qs.filter(start_time__gte=start_date)
-            except ValueError:
-                return Response(
-                    {"detail": "Неверный формат start_date. Используйте ISO format (например: 2024-01-01T00:00:00)"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        if end_date_str:
-            try:
-                end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
-                qs = qs.filter(end_time__lte=end_date)
-            except ValueError:
-                return Response(
-                    {"detail": "Неверный формат end_date. Используйте ISO format (например: 2024-01-01T23:59:59)"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        # Сортировка по времени начала
-        qs = qs.order_by("start_time")
-        
-        ser = self.get_serializer(qs, many=True)
+        try:
+            lessons = build_lessons(lesson_values_in_range(request.query_params, teacher_id=teacher_id))
+        except QueryParamError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+
         return Response({
             "teacher": {
                 "id": teacher.id,
                 "name": teacher.user.get_full_name() or teacher.user.username
             },
-            "count": qs.count(),
-            "lessons": ser.data
+            "count": len(lessons),
+            "lessons": lessons
         })
 
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
@@ -491,8 +403,6 @@ class LessonViewSet(viewsets.ModelViewSet):
         - end_date: конечная дата (ISO format, опционально)
         """
         room_id = request.query_params.get("room_id")
-        start_date_str = request.query_params.get("start_date")
-        end_date_str = request.query_params.get("end_date")
         
         if not room_id:
             return Response(
@@ -509,37 +419,15 @@ class LessonViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        qs = self.queryset.filter(room_id=room_id)
-        
-        # Фильтрация по дате
-        if start_date_str:
-            try:
-                start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-                qs = qs.filter(start_time__gte=start_date)
-            except ValueError:
-                return Response(
-                    {"detail": "Неверный формат start_date. Используйте ISO format (например: 2024-01-01T00:00:00)"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        if end_date_str:
-            try:
-                end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
-                qs = qs.filter(end_time__lte=end_date)
-            except ValueError:
-                return Response(
-                    {"detail": "Неверный формат end_date. Используйте ISO format (например: 2024-01-01T23:59:59)"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        # Сортировка по времени начала
-        qs = qs.order_by("start_time")
-        
-        ser = self.get_serializer(qs, many=True)
+        try:
+            lessons = build_lessons(lesson_values_in_range(request.query_params, room_id=room_id))
+        except QueryParamError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+
         return Response({
             "room": {"id": room.id, "name": room.name, "capacity": room.capacity, "room_type": room.room_type},
-            "count": qs.count(),
-            "lessons": ser.data
+            "count": len(lessons),
+            "lessons": lessons
         })
 
 
@@ -548,53 +436,20 @@ class CurrentUserView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
+        # Преподаватель и студент — одним запросом вместе с пользователем
+        user = get_user_model().objects.select_related("teacher__department", "student").get(pk=request.user.pk)
         groups = list(user.groups.values_list('name', flat=True))
-        
-        # Определяем роль
-        role = 'STUDENT'
-        if 'ADMIN_DB' in groups:
-            role = 'ADMIN_DB'
-        elif 'TEACHER' in groups:
-            role = 'TEACHER'
-        
-        # Получаем связанные данные
-        teacher = None
-        student = None
-        
-        try:
-            teacher = Teacher.objects.select_related('department').get(user=user)
-        except Teacher.DoesNotExist:
-            pass
-        
-        try:
-            student = Student.objects.get(user=user)
-        except Student.DoesNotExist:
-            pass
+        teacher = getattr(user, "teacher", None)
+        student = getattr(user, "student", None)
 
-        response_data = {
-            'id': user.id,
-            'username': user.username,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'email': user.email,
-            'groups': groups,
-            'role': role,
-            'teacher_id': teacher.id if teacher else None,
-            'student_id': student.id if student else None,
-        }
-        
-        # Добавляем информацию о кафедре и дисциплинах для преподавателя
+        # Дисциплины преподавателя получаем через его занятия (полусоединение вместо DISTINCT по всем занятиям)
+        disciplines = []
         if teacher:
-            response_data['teacher_department_id'] = teacher.department.id
-            response_data['teacher_department_name'] = teacher.department.name
-            # Получаем дисциплины преподавателя через его занятия
-            from .models import Discipline
-            disciplines = Discipline.objects.filter(lessons__teacher=teacher).distinct()
-            response_data['teacher_disciplines'] = [
-                {'id': d.id, 'name': d.name} for d in disciplines
-            ]
+            disciplines = Discipline.objects.filter(
+                Exists(Lesson.objects.filter(teacher=teacher, discipline=OuterRef("pk")))
+            ).values_list('id', 'name')
 
+        response_data = current_user_payload(user, groups, teacher, student, disciplines)
         return Response(response_data)
 
 
@@ -663,3 +518,293 @@ class TeacherGroupsView(APIView):
             "department_name": teacher.department.name,
             "groups": serializer.data
         })
+
+
+def _parse_week_date(request):
+    """Дата внутри интересующей недели из ?date=YYYY-MM-DD (по умолчанию — текущая неделя)."""
+    date_str = request.query_params.get("date")
+    if not date_str:
+        return timezone.localdate(), None
+    try:
+        return datetime.fromisoformat(date_str).date(), None
+    except ValueError:
+        return None, Response(
+            {"detail": "Неверный формат date. Используйте ISO format (например: 2024-01-01)"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+class RoomUtilizationView(APIView):
+    """Недельная загрузка аудиторий: занятые часы, заполненность мест, пиковые часы"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        day, error = _parse_week_date(request)
+        if error:
+            return error
+        return Response(analytics.room_utilization(day))
+
+
+class TeacherWorkloadView(APIView):
+    """Недельная нагрузка преподавателей в часах, в том числе по дисциплинам"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        day, error = _parse_week_date(request)
+        if error:
+            return error
+        return Response(analytics.teacher_workload(day))
+
+
+class OccupancyHeatmapView(APIView):
+    """
+    Тепловая карта занятости здания: день недели × интервал времени
+
+    Query params:
+    - date_from, date_to: период (ISO date, по умолчанию — текущая неделя)
+    - room_type: тип аудитории (lecture/lab, опционально)
+    - department_id: кафедра групп (опционально)
+    """
+    permission_classes = [IsAuthenticated]
+    max_days = 400
+
+    def get(self, request):
+        today = timezone.localdate()
+        dates = {}
+        for name, default in (("date_from", today - timedelta(days=today.weekday())),
+                              ("date_to", today + timedelta(days=6 - today.weekday()))):
+            value = request.query_params.get(name)
+            if not value:
+                dates[name] = default
+                continue
+            try:
+                dates[name] = datetime.fromisoformat(value).date()
+            except ValueError:
+                return Response(
+                    {"detail": f"Неверный формат {name}. Используйте ISO format (например: 2024-01-01)"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        date_from, date_to = dates["date_from"], dates["date_to"]
+        if date_from > date_to:
+            return Response(
+                {"detail": "date_from должна быть не позже date_to"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (date_to - date_from).days > self.max_days:
+            return Response(
+                {"detail": f"Период не может превышать {self.max_days} дней"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        room_type = request.query_params.get("room_type")
+        if room_type and room_type not in [Room.LECTURE, Room.LAB]:
+            return Response(
+                {"detail": f"Тип аудитории должен быть '{Room.LECTURE}' или '{Room.LAB}'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        department_id = request.query_params.get("department_id")
+        if department_id:
+            try:
+                department_id = int(department_id)
+            except ValueError:
+                return Response(
+                    {"detail": "Параметр department_id должен быть числом"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        return Response(analytics.heatmap(date_from, date_to, room_type or None, department_id or None))
+
+
+class GridView(APIView):
+    """
+    Сетка расписания для табло и печати: строки — группы, аудитории или преподаватели, столбцы — пары (см. core.grid)
+
+    Query params:
+    - kind: group, room или teacher
+    - ids: номера строк через запятую (по умолчанию все, не больше grid.MAX_ROWS)
+    - date: день внутри недели (ISO date, по умолчанию сегодня)
+    - span: week (по умолчанию) или day
+    - format=html: готовая HTML-таблица для киосков; token= вместо входа, если задан GRID_KIOSK_TOKEN
+    """
+    permission_classes = [IsAuthenticatedOrKiosk]
+    renderer_classes = [FastJSONRenderer, StaticHTMLRenderer]
+
+    def get(self, request):
+        params = self._parse(request)
+        html = request.accepted_renderer.format == "html"
+        if isinstance(params, Response):
+            if html:
+                return Response(escape(params.data["detail"]), status=params.status_code)
+            return params
+        if html:
+            return Response(grid.render_html(*params))
+        return Response(grid.week_grid(*params))
+
+    def _parse(self, request):
+        kind = request.query_params.get("kind", "")
+        if kind not in grid.KINDS:
+            return Response(
+                {"detail": f"Параметр kind должен быть одним из: {', '.join(grid.KINDS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        span = request.query_params.get("span", "week")
+        if span not in grid.SPANS:
+            return Response(
+                {"detail": f"Параметр span должен быть одним из: {', '.join(grid.SPANS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        raw_ids = [i for i in request.query_params.get("ids", "").split(",") if i.strip()]
+        try:
+            ids = list(dict.fromkeys(int(i) for i in raw_ids)) or None
+        except ValueError:
+            return Response({"detail": "Параметр ids должен быть списком чисел через запятую"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if ids and len(ids) > grid.MAX_ROWS:
+            return Response({"detail": f"Не больше {grid.MAX_ROWS} строк в сетке"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        day, error = _parse_week_date(request)
+        if error:
+            return error
+        return kind, ids, day, span
+
+
+class SearchView(APIView):
+    """
+    Поиск по мере ввода по группам, преподавателям, аудиториям и дисциплинам (см. core.search)
+
+    Query params:
+    - q: начало имени или слова, либо часть имени
+    - types: group,teacher,room,discipline через запятую (по умолчанию все)
+    - limit: число результатов (по умолчанию 10, не больше 50)
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+        types = [t for t in request.query_params.get("types", "").split(",") if t] or list(search.TYPES)
+        unknown = set(types) - set(search.TYPES)
+        if unknown:
+            return Response(
+                {"detail": f"Неизвестные типы: {', '.join(sorted(unknown))}. Допустимые: {', '.join(search.TYPES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(int(request.query_params.get("limit", search.DEFAULT_LIMIT)), search.MAX_LIMIT)
+        except ValueError:
+            return Response({"detail": "Параметр limit должен быть числом"}, status=status.HTTP_400_BAD_REQUEST)
+        results = search.index.search(query, types=types, limit=max(limit, 1))
+        return Response({"query": query, "results": [entry.as_dict() for entry in results]})
+
+
+class SyncView(APIView):
+    """
+    Дельта-синхронизация для мобильных и офлайн-клиентов
+
+    Query params:
+    - since: токен из предыдущего ответа (без него — только текущий токен и reset)
+    - group_id: занятия только этой группы (опционально)
+    Если в ответе reset=true, клиенту нужна полная загрузка, после неё — since=token.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        since = request.query_params.get("since")
+        group_id = request.query_params.get("group_id")
+        try:
+            since = int(since) if since else None
+            group_id = int(group_id) if group_id else None
+        except ValueError:
+            return Response(
+                {"detail": "Параметры since и group_id должны быть числами"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if since is None:
+            return Response({"reset": True, "token": changelog.current_token()})
+        return Response(changelog.changes_since(since, group_id=group_id))
+
+
+class JobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Фоновые задачи: постановка в очередь и опрос состояния
+
+    POST {"kind": "...", "params": {...}} — только ADMIN_DB; выполняются процессами manage.py run_workers.
+    """
+    queryset = Job.objects.all().order_by("-created_at")
+    serializer_class = JobSerializer
+
+    def get_permissions(self):
+        if self.action == "create":
+            return [IsAdminDB()]
+        return [IsAuthenticated()]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if not IsAdminDB().has_permission(self.request, self):
+            qs = qs.filter(created_by=self.request.user)
+        return qs
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+
+class ScheduleSnapshotViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                              viewsets.GenericViewSet):
+    """
+    Опубликованные версии расписания и разница между ними (см. core.snapshots)
+
+    POST {"name", "department_id"?, "semester" | "date_from" + "date_to"} — только ADMIN_DB.
+    GET /snapshots/<id>/diff/?to=<id>|live&group_id= — что изменилось по сравнению со снимком.
+    """
+    queryset = ScheduleSnapshot.objects.all()
+    serializer_class = ScheduleSnapshotSerializer
+
+    def get_permissions(self):
+        if self.action == "create":
+            return [IsAdminDB()]
+        return [IsAuthenticated()]
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+    @action(detail=True, methods=["get"])
+    def diff(self, request, pk=None):
+        old = self.get_object()
+        target = request.query_params.get("to", snapshots.LIVE)
+        group_id = request.query_params.get("group_id")
+        try:
+            group_id = int(group_id) if group_id else None
+            new = None if target == snapshots.LIVE else int(target)
+        except ValueError:
+            return Response(
+                {"detail": f"Параметр to должен быть ID снимка или {snapshots.LIVE}, group_id — числом"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if new is not None:
+            new = ScheduleSnapshot.objects.filter(pk=new).first()
+            if new is None:
+                return Response({"detail": f"Снимок с ID {target} не найден"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            return Response(snapshots.diff(old, new, group_id=group_id))
+        except snapshots.ScopeMismatch as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ProfilingView(APIView):
+    """
+    Последние профили запросов из кольцевого буфера этого процесса (только ADMIN_DB)
+
+    Query params:
+    - limit: сколько профилей вернуть (по умолчанию 50)
+    Профилирование включается переменной окружения DJANGO_PROFILING=1.
+    """
+    permission_classes = [IsAdminDB]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", 50))
+        except ValueError:
+            return Response({"detail": "Параметр limit должен быть числом"}, status=status.HTTP_400_BAD_REQUEST)
+        profiles = list(profiling.buffer)[::-1][:max(limit, 0)]
+        return Response({"enabled": settings.PROFILING_ENABLED, "count": len(profiles), "requests": profiles})
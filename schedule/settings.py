@@ -31,6 +31,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Включается DJANGO_PROFILING=1, иначе исключается из цепочки при старте
+    "core.profiling.ProfilingMiddleware",
+    "core.metrics.MetricsMiddleware",
+    # Поиск N+1 и повторяющихся запросов, по умолчанию только при DEBUG
+    "core.querycheck.RepeatedQueriesMiddleware",
+    # gzip для ответов длиннее REST_FRAMEWORK["GZIP_MIN_LENGTH"]
+    "core.compression.CompressionMiddleware",
+    # Чтения безопасных запросов — на реплики из DATABASE_REPLICAS (см. core/routers.py)
+    "core.routers.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -40,6 +49,22 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Server-Timing и выборка профилей запросов (см. core/profiling.py)
+PROFILING_ENABLED = os.getenv("DJANGO_PROFILING", "0") == "1"
+PROFILING_SAMPLE_RATE = float(os.getenv("DJANGO_PROFILING_SAMPLE_RATE", "0.01"))
+
+# Метрики Prometheus на /metrics (см. core/metrics.py). Каталог нужен для
+# суммирования метрик нескольких процессов; токен — для защиты эндпоинта
+METRICS_DIR = os.getenv("DJANGO_METRICS_DIR", "")
+METRICS_TOKEN = os.getenv("DJANGO_METRICS_TOKEN", "")
+
+# Каталог файлов фоновой задачи import_schedule: пути path и report в params задачи
+# задаются относительно него, файлы вне каталога не читаются и не пишутся
+IMPORT_ROOT = os.getenv("DJANGO_IMPORT_ROOT", str(BASE_DIR / "imports"))
+
+# Токен табло в холлах: /api/grid/?format=html&token=... без входа (см. core/grid.py)
+GRID_KIOSK_TOKEN = os.getenv("DJANGO_GRID_KIOSK_TOKEN", "")
+
 ROOT_URLCONF = "schedule.urls"
 
 TEMPLATES = [
@@ -77,6 +102,39 @@ DATABASES = {
             "charset": "utf8mb4",
             "init_command": "SET sql_mode='STRICT_TRANS_TABLES', character_set_connection=utf8mb4, collation_connection=utf8mb4_unicode_ci",
         },
+        # Постоянные соединения с проверкой перед повторным использованием
+        "CONN_MAX_AGE": int(os.getenv("DJANGO_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
+    }
+}
+
+# Реплики для чтения: MYSQL_REPLICA_HOSTS=replica1.local,replica2.local (та же БД и учётные данные).
+# В тестах реплики зеркалируют основную БД
+for _number, _host in enumerate(filter(None, os.getenv("MYSQL_REPLICA_HOSTS", "").split(",")), start=1):
+    DATABASES[f"replica{_number}"] = {**DATABASES["default"], "HOST": _host.strip(), "TEST": {"MIRROR": "default"}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+# Сколько секунд после изменения клиент читает с основной БД (задержка репликации)
+REPLICA_PIN_SECONDS = int(os.getenv("DJANGO_REPLICA_PIN_SECONDS", "10"))
+
+# Админка больших таблиц (занятия, архив): фильтры с автодополнением, оценка числа
+# строк по статистике БД и постраничный просмотр по ключу (core.admin_tools)
+ADMIN_PERFORMANCE_MODE = os.getenv("DJANGO_ADMIN_PERFORMANCE_MODE", "1") == "1"
+
+# Отклонять занятия в аудиториях, где мест меньше, чем студентов в группе (core.capacity)
+LESSON_CAPACITY_CHECK = os.getenv("DJANGO_LESSON_CAPACITY_CHECK", "1") == "1"
+
+# Кэш производных данных расписания (аналитика, сетки). По умолчанию — память процесса;
+# через этот кэш другие воркеры узнают и об изменениях справочников, поэтому с кэшем
+# по умолчанию поисковый индекс (core.search, typeahead и поиск в админке) и сетка пар
+# в каждом процессе видят только изменения, сделанные в нём самом.
+# Для нескольких воркеров укажите общий бэкенд, например
+# DJANGO_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# DJANGO_CACHE_LOCATION=/var/tmp/schedule_cache
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", "schedule"),
     }
 }
 
@@ -108,6 +166,14 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    # Кодировщик JSON (см. core/renderers.py): "auto" — orjson, если установлен, иначе stdlib json
+    "JSON_BACKEND": os.getenv("DJANGO_JSON_BACKEND", "auto"),
+    # Минимальный размер ответа для сжатия gzip в байтах; None — без сжатия
+    "GZIP_MIN_LENGTH": 1024,
 }
 
 SIMPLE_JWT = {